@@ -0,0 +1,127 @@
+import argparse
+import copy
+import os
+import re
+import time
+from typing import Optional
+
+from docker.errors import APIError
+
+from cpk.types import Machine
+from .create import fields, validate_name
+from .. import AbstractCLICommand
+from ..logger import aavmlogger
+from ... import aavmconfig
+from ...exceptions import AAVMException
+from ...types import Arguments, AAVMMachine, MachineLinks
+from ...utils.cpuset import read_topology, get_allocations, allocate
+
+
+class CLICloneCommand(AbstractCLICommand):
+
+    KEY = 'clone'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent])
+        parser.add_argument(
+            "-n",
+            "--count",
+            type=int,
+            default=1,
+            help="Number of clones to create, clones are named '<destination>-<i>' when N > 1"
+        )
+        parser.add_argument(
+            "source",
+            type=str,
+            nargs=1,
+            help="Name of the machine to clone"
+        )
+        parser.add_argument(
+            "destination",
+            type=str,
+            nargs=1,
+            help="Name of the new machine"
+        )
+        return parser
+
+    @staticmethod
+    def execute(cpk_machine: Machine, parsed: argparse.Namespace) -> bool:
+        source_name = parsed.source[0].strip()
+        destination = parsed.destination[0].strip()
+        # check if the source machine exists
+        if source_name not in aavmconfig.machines:
+            aavmlogger.error(f"The machine '{source_name}' does not exist.")
+            return False
+        source = aavmconfig.machines[source_name]
+        # compile names of the new machines
+        if parsed.count < 1:
+            aavmlogger.error("The number of clones must be a positive integer.")
+            return False
+        names = [destination] if parsed.count == 1 else \
+            [f"{destination}-{i}" for i in range(1, parsed.count + 1)]
+        # validate names
+        for name in names:
+            if not re.match(fields["name"]["pattern"], name):
+                aavmlogger.error(f"Field 'Name' must be {fields['name']['pattern_human']}.")
+                return False
+            try:
+                validate_name(name)
+            except AAVMException as e:
+                aavmlogger.error(str(e))
+                return False
+        # commit the source's writable layer once, all the clones will share it
+        aavmlogger.info(f"Taking a snapshot of machine '{source.name}'...")
+        try:
+            image = source.commit(tag=f"clone-{int(time.time())}")
+        except APIError as e:
+            aavmlogger.error(str(e))
+            return False
+        aavmlogger.info(f"Snapshot '{image}' created.")
+        # CPU allocations are per machine, clones get CPUs of their own (if any is available)
+        allocations, topology = {}, None
+        if source.settings.cpuset is not None:
+            try:
+                topology = read_topology(source.machine)
+                allocations = get_allocations(source.machine)
+            except (AAVMException, APIError) as e:
+                aavmlogger.warning(f"The CPU topology of '{source.machine.name}' could not be "
+                                   f"read, the clones get no CPU allocation. The error "
+                                   f"reads:\n{str(e)}")
+        # make the new machines (metadata only)
+        for name in names:
+            settings = copy.deepcopy(source.settings)
+            # the snapshot only exists on the CPK machine the source runs on, clones stay there
+            settings.placement = "pinned"
+            settings.cpuset = None
+            if topology is not None:
+                try:
+                    settings.cpuset = allocate(topology, allocations,
+                                               len(source.settings.cpuset.cpus),
+                                               source.settings.cpuset.policy)
+                    allocations[name] = settings.cpuset
+                except AAVMException as e:
+                    aavmlogger.warning(f"Machine '{name}' could not be allocated CPUs, use "
+                                       f"'aavm cpuset allocate {name}' later. The error "
+                                       f"reads:\n{str(e)}")
+            machine = AAVMMachine(
+                schema=source.schema,
+                version=source.version,
+                name=name,
+                path=os.path.join(aavmconfig.path, "machines", name),
+                runtime=source.runtime,
+                description=source.description,
+                configuration=copy.deepcopy(source.configuration),
+                settings=settings,
+                links=MachineLinks(
+                    # the snapshot only exists on the CPK machine the source runs on
+                    machine=source.machine,
+                    container=None,
+                    image=image
+                )
+            )
+            machine.to_disk()
+            aavmlogger.info(f"Machine '{name}' created successfully.")
+        # ---
+        return True
@@ -0,0 +1,141 @@
+import argparse
+import os
+import re
+from collections import OrderedDict
+from functools import partial
+from typing import Optional, Tuple
+
+from termcolor import colored
+from terminaltables import SingleTable as Table
+
+from cpk.types import Machine
+from .. import AbstractCLICommand
+from ..logger import aavmlogger
+from ...exceptions import AAVMException
+from ...types import Arguments
+from ...utils.copy import COMPRESSIONS, split_target, tar_from_host, tar_from_machine, \
+    extract_to_host, copy_to_machines
+from ...utils.machine import select_machines
+from ...utils.misc import human_size
+
+
+class CLICopyCommand(AbstractCLICommand):
+
+    KEY = 'cp'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent])
+        parser.add_argument(
+            "-z",
+            "--compress",
+            default="auto",
+            choices=COMPRESSIONS,
+            help="Compression of the data sent to the machines, 'auto' compresses "
+                 "only when a remote CPK machine is involved"
+        )
+        parser.add_argument(
+            "-j",
+            "--workers",
+            default=16,
+            type=int,
+            help="Maximum number of machines written to concurrently"
+        )
+        parser.add_argument(
+            "source",
+            nargs=1,
+            help="Path on the host or MACHINE:PATH"
+        )
+        parser.add_argument(
+            "destinations",
+            nargs="+",
+            help="Path on the host or MACHINE:PATH, MACHINE can be a shell-style pattern "
+                 "(e.g., 'build-*:/opt/'). Paths ending with '/' are directories to copy "
+                 "into, other paths also rename the copy"
+        )
+        return parser
+
+    @staticmethod
+    def execute(cpk_machine: Machine, parsed: argparse.Namespace) -> bool:
+        source_spec, source = _parse_location(parsed.source[0])
+        destinations = [_parse_location(d) for d in parsed.destinations]
+        try:
+            source_machine = None
+            if source_spec is not None:
+                matches = select_machines([source_spec])
+                if len(matches) != 1:
+                    raise AAVMException(f"The source must be a single machine, "
+                                        f"'{source_spec}' matches {len(matches)}.")
+                source_machine = matches[0]
+            # machine -> host
+            if all(spec is None for spec, _ in destinations):
+                if source_machine is None:
+                    raise AAVMException("Either the source or the destination must be a "
+                                        "machine.")
+                if len(destinations) > 1:
+                    raise AAVMException("Only one destination is allowed on the host.")
+                destination = os.path.abspath(destinations[0][1])
+                extract_to_host(tar_from_machine(source_machine, source, None, "none"),
+                                source, destination)
+                aavmlogger.info(f"Copied '{source_machine.name}:{source}' to "
+                                f"'{destination}'.")
+                return True
+            if any(spec is None for spec, _ in destinations):
+                raise AAVMException("Destinations must be either all machines or a single "
+                                    "path on the host.")
+            # * -> machines, destinations sharing the same path share the same stream
+            groups = OrderedDict()
+            for spec, path in destinations:
+                for machine in select_machines([spec]):
+                    groups.setdefault(split_target(path), [])
+                    if machine not in groups[split_target(path)]:
+                        groups[split_target(path)].append(machine)
+        except AAVMException as e:
+            aavmlogger.error(str(e))
+            return False
+        # compress only when it pays off (i.e., data travels through the network)
+        compression = parsed.compress
+        if compression == "auto":
+            endpoints = [m.machine for ms in groups.values() for m in ms]
+            if source_machine is not None:
+                endpoints.append(source_machine.machine)
+            compression = "gzip" if any(not e.is_local for e in endpoints) else "none"
+        # copy
+        results = []
+        for (directory, name), machines in groups.items():
+            name = name or os.path.basename(source.rstrip("/").rstrip(os.sep))
+            stream = partial(tar_from_host, source, name, compression) \
+                if source_machine is None else \
+                partial(tar_from_machine, source_machine, source, name, compression)
+            aavmlogger.info(f"Copying to '{directory}/{name}' on {len(machines)} machine(s)...")
+            try:
+                results += copy_to_machines(stream, machines, directory, workers=parsed.workers)
+            except AAVMException as e:
+                aavmlogger.error(str(e))
+                return False
+        # summary
+        data = [["Machine", "Status", "Sent", "Duration"]]
+        for r in results:
+            data.append([
+                r.machine,
+                colored("OK", "green") if r.error is None else colored(r.error, "red"),
+                human_size(r.bytes),
+                f"{r.duration:.2f}s"
+            ])
+        table = Table(data)
+        table.title = f" Copy ({compression}) "
+        table.justify_columns[2] = 'right'
+        table.justify_columns[3] = 'right'
+        print()
+        print(table.table)
+        # ---
+        return all(r.error is None for r in results)
+
+
+def _parse_location(value: str) -> Tuple[Optional[str], str]:
+    # MACHINE:PATH or a path on the host
+    match = re.match(r"^([^/:.][^/:]*):(.*)$", value)
+    if match:
+        return match.group(1), match.group(2) or "/"
+    return None, value
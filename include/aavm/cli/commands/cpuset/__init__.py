@@ -0,0 +1,41 @@
+import argparse
+from typing import Optional, Dict, Type
+
+from aavm.cli import AbstractCLICommand
+from aavm.cli.commands.cpuset.allocate import CLICPUSetAllocateCommand
+from aavm.cli.commands.cpuset.release import CLICPUSetReleaseCommand
+from aavm.cli.commands.cpuset.report import CLICPUSetReportCommand
+from aavm.types import Arguments
+
+from cpk.types import Machine
+
+_supported_subcommands: Dict[str, Type[AbstractCLICommand]] = {
+    "alloc": CLICPUSetAllocateCommand,
+    "release": CLICPUSetReleaseCommand,
+    "report": CLICPUSetReportCommand,
+}
+
+
+class CLICPUSetCommand(AbstractCLICommand):
+
+    KEY = 'cpuset'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        # create a temporary parser used to select the subcommand
+        parser = argparse.ArgumentParser(parents=[parent], prog='aavm cpuset')
+        parser.add_argument(
+            'subcommand',
+            choices=_supported_subcommands.keys(),
+            help=f"Subcommand. Can be any of {', '.join(_supported_subcommands.keys())}"
+        )
+        parsed, _ = parser.parse_known_args(args)
+        # return subcommand's parser
+        subcommand = _supported_subcommands[parsed.subcommand]
+        return subcommand.parser(parser, args)
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        subcommand = _supported_subcommands[parsed.subcommand]
+        return subcommand.execute(machine, parsed)
@@ -0,0 +1,84 @@
+import argparse
+import math
+from typing import Optional
+
+from docker.errors import APIError
+
+from aavm import aavmconfig
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.exceptions import AAVMException
+from aavm.types import Arguments
+from aavm.utils.cpuset import read_topology, get_allocations, allocate
+from aavm.utils.misc import compile_cpuset
+from cpk.types import Machine
+
+
+class CLICPUSetAllocateCommand(AbstractCLICommand):
+    KEY = 'cpuset alloc'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "-n",
+            "--cpus",
+            default=None,
+            type=int,
+            help="Number of CPUs to allocate (defaults to the CPUs in the machine's resources)",
+        )
+        parser.add_argument(
+            "--policy",
+            default="exclusive",
+            choices=["exclusive", "shared"],
+            help="Whether the CPUs can be shared with other machines",
+        )
+        parser.add_argument(
+            "name",
+            type=str,
+            nargs=1,
+            help="Name of the machine to allocate CPUs to"
+        )
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        name = parsed.name[0].strip()
+        # check if the machine exists
+        if name not in aavmconfig.machines:
+            aavmlogger.error(f"The machine '{name}' does not exist.")
+            return False
+        machine = aavmconfig.machines[name]
+        # number of CPUs, fallback to the machine's CPU quota
+        ncpus = parsed.cpus
+        resources = machine.settings.resources
+        if ncpus is None and resources.cpu_quota is not None:
+            ncpus = math.ceil(resources.cpu_quota / (resources.cpu_period or 100000))
+        if ncpus is None or ncpus < 1:
+            aavmlogger.error("The machine has no CPU quota, use --cpus to specify how many "
+                             "CPUs to allocate.")
+            return False
+        # allocate CPUs on the host the machine is associated with
+        try:
+            topology = read_topology(machine.machine)
+            allocations = get_allocations(machine.machine, exclude=machine.name)
+            allocation = allocate(topology, allocations, ncpus, parsed.policy)
+        except (AAVMException, APIError) as e:
+            aavmlogger.error(str(e))
+            return False
+        machine.settings.cpuset = allocation
+        machine.to_disk()
+        cpus, mems = compile_cpuset(allocation.cpus), compile_cpuset(allocation.mems)
+        aavmlogger.info(f"Machine '{name}' was allocated the CPUs {cpus} on the "
+                        f"NUMA node(s) {mems} ({parsed.policy}).")
+        # apply to the existing container (if any)
+        container = machine.container
+        if container is not None:
+            try:
+                container.update(cpuset_cpus=cpus, cpuset_mems=mems)
+            except APIError as e:
+                aavmlogger.warning(f"The allocation could not be applied to the existing "
+                                   f"container, the error reads:\n{str(e)}")
+        # ---
+        return True
@@ -0,0 +1,58 @@
+import argparse
+from typing import Optional
+
+from docker.errors import APIError
+
+from aavm import aavmconfig
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.types import Arguments
+from aavm.utils.cpuset import read_topology
+from aavm.utils.misc import compile_cpuset
+from cpk.types import Machine
+
+
+class CLICPUSetReleaseCommand(AbstractCLICommand):
+    KEY = 'cpuset release'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "name",
+            type=str,
+            nargs=1,
+            help="Name of the machine to release the CPUs of"
+        )
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        name = parsed.name[0].strip()
+        # check if the machine exists
+        if name not in aavmconfig.machines:
+            aavmlogger.error(f"The machine '{name}' does not exist.")
+            return False
+        machine = aavmconfig.machines[name]
+        if machine.settings.cpuset is None:
+            aavmlogger.info(f"Machine '{name}' has no CPUs allocated. Nothing to do.")
+            return True
+        machine.settings.cpuset = None
+        machine.to_disk()
+        aavmlogger.info(f"CPUs of machine '{name}' released.")
+        # let the existing container (if any) float again on the CPUs of its profile (or all)
+        container = machine.container
+        if container is not None:
+            resources = machine.settings.resources
+            try:
+                topology = read_topology(machine.machine)
+                container.update(
+                    cpuset_cpus=resources.cpuset_cpus or compile_cpuset(topology.cpus),
+                    cpuset_mems=resources.cpuset_mems or compile_cpuset(list(topology.nodes))
+                )
+            except APIError as e:
+                aavmlogger.warning(f"The existing container could not be updated, "
+                                   f"the error reads:\n{str(e)}")
+        # ---
+        return True
@@ -0,0 +1,60 @@
+import argparse
+from typing import Optional
+
+from docker.errors import APIError
+from terminaltables import SingleTable as Table
+
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.types import Arguments
+from aavm.utils.cpuset import read_topology, get_allocations, get_usage
+from aavm.utils.misc import compile_cpuset
+from cpk.types import Machine
+
+
+class CLICPUSetReportCommand(AbstractCLICommand):
+    KEY = 'cpuset report'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        try:
+            topology = read_topology(machine)
+        except APIError as e:
+            aavmlogger.error(str(e))
+            return False
+        allocations = get_allocations(machine)
+        usage = get_usage(allocations)
+        # one row per NUMA node
+        data = [
+            ["Node", "CPUs", "Allocated", "Free", "Cores", "Machines"]
+        ]
+        for node in sorted(topology.nodes):
+            cpus = topology.nodes[node]
+            allocated = [c for c in cpus if usage[c]]
+            # one character per physical core: '.' free, '#' exclusive, '+' shared
+            cores = ""
+            for core in topology.cores(node):
+                policies = {allocations[n].policy for c in core for n in usage[c]}
+                cores += "#" if "exclusive" in policies else "+" if policies else "."
+            machines = sorted({n for c in cpus for n in usage[c]})
+            machines = [
+                f"{n}: {compile_cpuset([c for c in allocations[n].cpus if c in cpus])}"
+                for n in machines
+            ]
+            data.append([
+                str(node), compile_cpuset(cpus), str(len(allocated)),
+                str(len(cpus) - len(allocated)), cores, "\n".join(machines) or "-"
+            ])
+        table = Table(data)
+        table.title = f" CPU Allocations: {machine.name} "
+        print()
+        print(table.table)
+        print("Cores: '.' free, '#' exclusive, '+' shared")
+        # ---
+        return True
@@ -3,6 +3,9 @@ import os
 import re
 from typing import Optional
 
+from docker.errors import APIError
+from requests import RequestException
+
 from cpk.types import Machine
 from .. import AbstractCLICommand
 from ..logger import aavmlogger
@@ -10,6 +13,8 @@ from ... import aavmconfig
 from ...constants import MACHINE_SCHEMA_DEFAULT_VERSION, MACHINE_DEFAULT_VERSION
 from ...exceptions import AAVMException
 from ...types import Arguments, AAVMMachine, AAVMRuntime, MachineSettings, MachineLinks
+from ...utils.placement import PLACEMENT_POLICIES, candidate_machines, gather_capacity, place
+from ...utils.prefetch import prefetch_in_background
 
 EmptyValidator = lambda *_: _
 
@@ -56,10 +61,25 @@ class CLICreateCommand(AbstractCLICommand):
     def parser(parent: Optional[argparse.ArgumentParser] = None,
                args: Optional[Arguments] = None) -> argparse.ArgumentParser:
         parser = argparse.ArgumentParser(parents=[parent])
+        parser.add_argument(
+            "--placement",
+            default="pinned",
+            choices=PLACEMENT_POLICIES,
+            help="How to pick the CPK machine to run on: 'pinned' uses the one given with "
+                 "-H, 'spread' the one with the most free resources, 'binpack' the fullest "
+                 "one that still fits"
+        )
+        parser.add_argument(
+            "--no-prefetch",
+            dest="prefetch",
+            default=True,
+            action="store_false",
+            help="Do not start downloading the runtime in the background"
+        )
         return parser
 
     @staticmethod
-    def execute(machine: Optional[Machine], parsed: argparse.Namespace) -> bool:
+    def execute(cpk_machine: Optional[Machine], parsed: argparse.Namespace) -> bool:
         # attach validators
         fields["name"]["validator"] = validate_name
         fields["runtime"]["validator"] = AAVMRuntime.from_image_name
@@ -97,24 +117,43 @@ class CLICreateCommand(AbstractCLICommand):
                 # ---
                 done = True
                 machine_info[key] = res
+        # prefer the native variant of the runtime when we already know where it will run
+        arch = cpk_machine.get_architecture() \
+            if (cpk_machine is not None and parsed.placement == "pinned") else None
         # make new machine
         machine = AAVMMachine(
             schema=MACHINE_SCHEMA_DEFAULT_VERSION,
             version=MACHINE_DEFAULT_VERSION,
             name=machine_info["name"],
             path=os.path.join(aavmconfig.path, "machines", machine_info["name"]),
-            runtime=AAVMRuntime.from_image_name(machine_info["runtime"]),
+            runtime=AAVMRuntime.from_image_name(machine_info["runtime"], arch=arch),
             description=machine_info["description"],
             configuration={},
             settings=MachineSettings(
-                persistency=bool(machine_info["persistency"] in ["y", "Y"])
+                persistency=bool(machine_info.get("persistency", "n") in ["y", "Y"]),
+                placement=parsed.placement
             ),
             links=MachineLinks(
-                machine=machine,
+                machine=cpk_machine,
                 container=None
             )
         )
+        # pick a CPK machine (if requested)
+        if parsed.placement != "pinned":
+            aavmlogger.info("Looking for the best CPK machine for your new machine...")
+            hosts = gather_capacity(candidate_machines(cpk_machine))
+            host = place(machine, hosts, parsed.placement)
+            machine.links.machine = host.machine
+            aavmlogger.info(f"Machine '{machine.name}' placed on the CPK machine "
+                            f"'{host.machine.name}'.")
         machine.to_disk()
+        # start downloading the runtime so that it is there by the first start
+        if parsed.prefetch and machine.links.machine is not None:
+            try:
+                prefetch_in_background(machine.links.machine, machine.runtime)
+            except (APIError, RequestException) as e:
+                aavmlogger.warning(f"The runtime could not be prefetched, it will be needed "
+                                   f"on the first start. The error reads:\n{str(e)}")
         # ---
         aavmlogger.info(f"Machine '{machine_info['name']}' created successfully.")
         return True
@@ -0,0 +1,117 @@
+import argparse
+import json
+from typing import Optional
+
+from termcolor import colored
+from terminaltables import SingleTable as Table
+
+from cpk.types import Machine
+from .. import AbstractCLICommand
+from ..logger import aavmlogger
+from ... import aavmconfig
+from ...exceptions import AAVMException
+from ...types import Arguments
+from ...utils.exec import exec_on_machines, running_machines
+from ...utils.machine import select_machines
+
+
+class CLIExecCommand(AbstractCLICommand):
+
+    KEY = 'exec'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent])
+        parser.add_argument(
+            "--all",
+            default=False,
+            action="store_true",
+            help="Run the command on all the running machines"
+        )
+        parser.add_argument(
+            "-j",
+            "--workers",
+            default=8,
+            type=int,
+            help="Maximum number of machines the command runs on concurrently"
+        )
+        parser.add_argument("-u", "--user", default="", help="User to run the command as")
+        parser.add_argument("-w", "--workdir", default=None,
+                            help="Working directory inside the machines")
+        parser.add_argument(
+            "-e",
+            "--env",
+            default=[],
+            action="append",
+            help="Environment variable as KEY=VALUE (can be given multiple times)"
+        )
+        parser.add_argument(
+            "--json",
+            default=False,
+            action="store_true",
+            help="Capture the output and print a JSON summary instead"
+        )
+        parser.add_argument(
+            "names",
+            nargs="*",
+            help="Names (or shell-style patterns) of the machines, followed by '--' and "
+                 "the command to run"
+        )
+        # argparse drops the '--' and merges the command into `names`, keep track of it here
+        args = args or []
+        parser.set_defaults(exec_command=args[args.index("--") + 1:] if "--" in args else [])
+        return parser
+
+    @staticmethod
+    def execute(cpk_machine: Machine, parsed: argparse.Namespace) -> bool:
+        command = parsed.exec_command
+        names = parsed.names[:len(parsed.names) - len(command)]
+        if not command:
+            aavmlogger.error("No command given, use 'aavm exec <machine...> -- <command>'.")
+            return False
+        # select machines
+        if parsed.all and names:
+            aavmlogger.error("Use either --all or a list of machines, not both.")
+            return False
+        try:
+            machines = running_machines(list(aavmconfig.machines.values()),
+                                        workers=parsed.workers) \
+                if parsed.all else select_machines(names)
+        except AAVMException as e:
+            aavmlogger.error(str(e))
+            return False
+        if not machines:
+            aavmlogger.error("No machines to run the command on.")
+            return False
+        environment = dict(e.partition("=")[::2] for e in parsed.env)
+        # run
+        results = exec_on_machines(machines, command, workers=parsed.workers,
+                                   stream=not parsed.json, user=parsed.user,
+                                   workdir=parsed.workdir, environment=environment or None)
+        succeeded = all(r.exit_code == 0 for r in results)
+        # summary
+        if parsed.json:
+            print(json.dumps({
+                "command": command,
+                "succeeded": succeeded,
+                "results": [r.serialize() for r in results]
+            }, indent=4))
+            return succeeded
+        data = [["Machine", "Exit code", "Duration", "Error"]]
+        for r in results:
+            code = "-" if r.exit_code is None else str(r.exit_code)
+            data.append([
+                r.machine,
+                colored(code, "green" if r.exit_code == 0 else "red"),
+                f"{r.duration:.2f}s",
+                r.error or ""
+            ])
+        table = Table(data)
+        table.title = f" {sum(r.exit_code == 0 for r in results)}/{len(results)} succeeded "
+        table.justify_columns[1] = 'center'
+        table.justify_columns[2] = 'right'
+        print()
+        print(table.table)
+        # ---
+        return succeeded
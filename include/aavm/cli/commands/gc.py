@@ -0,0 +1,112 @@
+import argparse
+from typing import Optional
+
+from termcolor import colored
+from terminaltables import SingleTable as Table
+
+from cpk.types import Machine
+from .. import AbstractCLICommand
+from ..logger import aavmlogger
+from ... import aavmconfig
+from ...types import Arguments
+from ...utils.gc import GC_CATEGORIES, find_garbage, collect_garbage
+from ...utils.misc import human_size, ask_confirmation
+from ...utils.placement import candidate_machines
+
+
+class CLIGCCommand(AbstractCLICommand):
+
+    KEY = 'gc'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent])
+        parser.add_argument(
+            "--dry-run",
+            default=False,
+            action="store_true",
+            help="Only report what would be removed"
+        )
+        parser.add_argument(
+            "--all",
+            default=False,
+            action="store_true",
+            help="Look on all the CPK machines, not only the given one and those machines run on"
+        )
+        parser.add_argument(
+            "-j",
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of endpoints inspected and items removed concurrently"
+        )
+        parser.add_argument(
+            "-y",
+            "--yes",
+            default=False,
+            action="store_true",
+            help="Do not ask for confirmation"
+        )
+        return parser
+
+    @staticmethod
+    def execute(cpk_machine: Optional[Machine], parsed: argparse.Namespace) -> bool:
+        # endpoints to look at
+        if parsed.all:
+            endpoints = candidate_machines(cpk_machine)
+        else:
+            endpoints = [cpk_machine] if cpk_machine is not None else []
+            for machine in aavmconfig.machines.values():
+                if machine.links.machine is not None and machine.links.machine not in endpoints:
+                    endpoints.append(machine.links.machine)
+        aavmlogger.info(f"Looking for garbage on {len(endpoints)} CPK machine(s)...")
+        items, errors = find_garbage(endpoints, workers=parsed.workers)
+        for endpoint, error in errors.items():
+            aavmlogger.warning(f"CPK machine '{endpoint}' could not be inspected, "
+                               f"the error reads:\n{error}")
+        if not items:
+            aavmlogger.info("Nothing to clean up.")
+            return not errors
+        # show what we found
+        if parsed.dry_run or parsed.verbose:
+            data = [["Category", "CPK Machine", "Name", "Size"]]
+            for item in items:
+                data.append([GC_CATEGORIES[item.category], item.location, item.name,
+                             human_size(item.size)])
+            table = Table(data)
+            table.title = " Garbage "
+            print()
+            print(table.table)
+        data = [["Category", "Items", "Reclaimable"]]
+        for category, title in GC_CATEGORIES.items():
+            found = [i for i in items if i.category == category]
+            if found:
+                data.append([title, str(len(found)), human_size(sum(i.size for i in found))])
+        data.append([colored("Total", attrs=["bold"]), str(len(items)),
+                     colored(human_size(sum(i.size for i in items)), attrs=["bold"])])
+        table = Table(data)
+        table.title = " Reclaimable space "
+        print()
+        print(table.table)
+        print()
+        if parsed.dry_run:
+            aavmlogger.info("Dry run, nothing was removed.")
+            return True
+        # remove
+        if not parsed.yes:
+            granted = ask_confirmation(aavmlogger, f"{len(items)} item(s) will be removed")
+            if not granted:
+                aavmlogger.info("Nothing was removed.")
+                return False
+        collect_garbage(items, workers=parsed.workers)
+        failed = [i for i in items if i.error is not None]
+        for item in failed:
+            aavmlogger.error(f"{GC_CATEGORIES[item.category]}: '{item.name}' on "
+                             f"'{item.location}' could not be removed, the error reads:\n"
+                             f"{item.error}")
+        reclaimed = sum(i.size for i in items if i.error is None)
+        aavmlogger.info(f"Removed {len(items) - len(failed)} item(s), "
+                        f"{human_size(reclaimed)} reclaimed.")
+        # ---
+        return not failed and not errors
@@ -0,0 +1,53 @@
+import argparse
+from typing import Optional
+
+from docker.errors import APIError
+
+from cpk.types import Machine
+from .. import AbstractCLICommand
+from ..logger import aavmlogger
+from ... import aavmconfig
+from ...exceptions import AAVMException
+from ...types import Arguments
+
+
+class CLIHibernateCommand(AbstractCLICommand):
+
+    KEY = 'hibernate'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent])
+        parser.add_argument(
+            "name",
+            type=str,
+            nargs=1,
+            help="Name of the machine to hibernate"
+        )
+        return parser
+
+    @staticmethod
+    def execute(cpk_machine: Machine, parsed: argparse.Namespace) -> bool:
+        parsed.machine = parsed.name[0].strip()
+        # check if the machine exists
+        if parsed.machine not in aavmconfig.machines:
+            aavmlogger.error(f"The machine '{parsed.machine}' does not exist.")
+            return False
+        # get the machine
+        machine = aavmconfig.machines[parsed.machine]
+        if machine.hibernated:
+            aavmlogger.info(f"The machine '{machine.name}' is already hibernated. Nothing to do.")
+            return True
+        # hibernate machine
+        aavmlogger.info(f"Hibernating machine '{machine.name}'...")
+        try:
+            machine.hibernate()
+        except (AAVMException, APIError) as e:
+            aavmlogger.error(str(e))
+            return False
+        aavmlogger.info(f"Machine hibernated, its state was stored in the image "
+                        f"'{machine.links.image}'. Use 'aavm resume {machine.name}' to wake it "
+                        f"up.")
+        # ---
+        return True
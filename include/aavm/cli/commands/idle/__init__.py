@@ -0,0 +1,41 @@
+import argparse
+from typing import Optional, Dict, Type
+
+from aavm.cli import AbstractCLICommand
+from aavm.cli.commands.idle.set import CLIIdleSetCommand
+from aavm.cli.commands.idle.unset import CLIIdleUnsetCommand
+from aavm.cli.commands.idle.watch import CLIIdleWatchCommand
+from aavm.types import Arguments
+
+from cpk.types import Machine
+
+_supported_subcommands: Dict[str, Type[AbstractCLICommand]] = {
+    "set": CLIIdleSetCommand,
+    "unset": CLIIdleUnsetCommand,
+    "watch": CLIIdleWatchCommand,
+}
+
+
+class CLIIdleCommand(AbstractCLICommand):
+
+    KEY = 'idle'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        # create a temporary parser used to select the subcommand
+        parser = argparse.ArgumentParser(parents=[parent], prog='aavm idle')
+        parser.add_argument(
+            'subcommand',
+            choices=_supported_subcommands.keys(),
+            help=f"Subcommand. Can be any of {', '.join(_supported_subcommands.keys())}"
+        )
+        parsed, _ = parser.parse_known_args(args)
+        # return subcommand's parser
+        subcommand = _supported_subcommands[parsed.subcommand]
+        return subcommand.parser(parser, args)
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        subcommand = _supported_subcommands[parsed.subcommand]
+        return subcommand.execute(machine, parsed)
@@ -0,0 +1,71 @@
+import argparse
+from typing import Optional
+
+from aavm import aavmconfig
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.types import Arguments, IdlePolicy
+from cpk.types import Machine
+
+IDLE_ACTIONS_PAST = {
+    "pause": "paused",
+    "stop": "stopped",
+}
+
+
+class CLIIdleSetCommand(AbstractCLICommand):
+    KEY = 'idle set'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "--action",
+            default="pause",
+            choices=list(IDLE_ACTIONS_PAST),
+            help="What to do with the machine once idle",
+        )
+        parser.add_argument(
+            "--after",
+            default=30,
+            type=float,
+            help="Minutes the machine needs to be idle for before the action is taken",
+        )
+        parser.add_argument(
+            "--cpu",
+            default=1.0,
+            type=float,
+            help="CPU usage (in percentage) below which the machine is considered idle",
+        )
+        parser.add_argument(
+            "name",
+            type=str,
+            nargs=1,
+            help="Name of the machine to set the idle policy for"
+        )
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        name = parsed.name[0].strip()
+        # check if the machine exists
+        if name not in aavmconfig.machines:
+            aavmlogger.error(f"The machine '{name}' does not exist.")
+            return False
+        # validate policy
+        if parsed.after <= 0 or parsed.cpu < 0:
+            aavmlogger.error("The options --after and --cpu must be positive numbers.")
+            return False
+        # update machine
+        machine = aavmconfig.machines[name]
+        machine.settings.idle = IdlePolicy(action=parsed.action, after=parsed.after,
+                                           cpu=parsed.cpu)
+        machine.to_disk()
+        aavmlogger.info(f"Machine '{name}' will be {IDLE_ACTIONS_PAST[parsed.action]} after "
+                        f"{parsed.after} minutes of CPU usage below {parsed.cpu}% and no exec "
+                        f"sessions.\n"
+                        f"Policies are applied by the watcher, run it with,\n\n"
+                        f"\t$ aavm idle watch\n")
+        # ---
+        return True
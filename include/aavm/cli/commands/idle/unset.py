@@ -0,0 +1,39 @@
+import argparse
+from typing import Optional
+
+from aavm import aavmconfig
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.types import Arguments
+from cpk.types import Machine
+
+
+class CLIIdleUnsetCommand(AbstractCLICommand):
+    KEY = 'idle unset'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "name",
+            type=str,
+            nargs=1,
+            help="Name of the machine to remove the idle policy from"
+        )
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        name = parsed.name[0].strip()
+        # check if the machine exists
+        if name not in aavmconfig.machines:
+            aavmlogger.error(f"The machine '{name}' does not exist.")
+            return False
+        # update machine
+        machine = aavmconfig.machines[name]
+        machine.settings.idle = None
+        machine.to_disk()
+        aavmlogger.info(f"Idle policy removed from machine '{name}'.")
+        # ---
+        return True
@@ -0,0 +1,44 @@
+import argparse
+import time
+from typing import Optional
+
+from aavm import aavmconfig
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.types import Arguments
+from aavm.utils.idle import IdleWatcher
+from cpk.types import Machine
+
+
+class CLIIdleWatchCommand(AbstractCLICommand):
+    KEY = 'idle watch'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "--interval",
+            default=60,
+            type=float,
+            help="Seconds between two consecutive samples",
+        )
+        parser.add_argument(
+            "-j",
+            "--workers",
+            default=8,
+            type=int,
+            help="Maximum number of machines sampled concurrently",
+        )
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        watcher = IdleWatcher(workers=max(1, parsed.workers))
+        aavmlogger.info("Watching for idle machines, press Ctrl-C to stop.")
+        while True:
+            t0 = time.time()
+            # reload machines from disk to pick up new machines and policies
+            aavmconfig.reload()
+            watcher.step(list(aavmconfig.machines.values()))
+            time.sleep(max(0.0, parsed.interval - (time.time() - t0)))
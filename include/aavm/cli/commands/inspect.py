@@ -1,5 +1,6 @@
 import argparse
 import os.path
+import time
 from typing import Optional
 
 from terminaltables import SingleTable as Table
@@ -9,7 +10,9 @@ from .. import AbstractCLICommand
 from ..logger import aavmlogger
 from ... import aavmconfig
 from ...types import Arguments
-from ...utils.tables import table_machine, table_configuration
+from ...utils.misc import parse_duration
+from ...utils.tables import table_machine, table_configuration, table_resources, \
+    table_usage
 
 
 class CLIInspectCommand(AbstractCLICommand):
@@ -20,6 +23,18 @@ class CLIInspectCommand(AbstractCLICommand):
     def parser(parent: Optional[argparse.ArgumentParser] = None,
                args: Optional[Arguments] = None) -> argparse.ArgumentParser:
         parser = argparse.ArgumentParser(parents=[parent])
+        parser.add_argument(
+            "--usage",
+            default=False,
+            action="store_true",
+            help="Show the resource usage recorded by 'aavm sampler'"
+        )
+        parser.add_argument(
+            "--since",
+            default=None,
+            type=str,
+            help="Only consider usage recorded in the given time window (e.g., 12h, 7d)"
+        )
         parser.add_argument(
             "name",
             type=str,
@@ -46,6 +61,14 @@ class CLIInspectCommand(AbstractCLICommand):
         machine_table.title = " Machine "
         print()
         print(machine_table.table)
+        # show resources info
+        data = table_resources(machine)
+        resources_table = Table(data)
+        resources_table.inner_heading_row_border = False
+        resources_table.justify_columns[0] = 'right'
+        resources_table.title = " Resources "
+        print()
+        print(resources_table.table)
         # show configuration info
         data = table_configuration(machine.configuration)
         config_table = Table(data)
@@ -54,5 +77,22 @@ class CLIInspectCommand(AbstractCLICommand):
         config_table.title = " Configuration "
         print()
         print(config_table.table)
+        # show usage history
+        if parsed.usage:
+            try:
+                since = (time.time() - parse_duration(parsed.since)) if parsed.since else None
+            except ValueError as e:
+                aavmlogger.error(str(e))
+                return False
+            data = table_usage(machine, since=since)
+            if data is None:
+                aavmlogger.info(f"No usage recorded for machine '{machine.name}'. "
+                                f"Run 'aavm sampler' to record it.")
+                return True
+            usage_table = Table(data)
+            usage_table.justify_columns = {i: 'right' for i in range(1, 6)}
+            usage_table.title = " Usage "
+            print()
+            print(usage_table.table)
         # ---
         return True
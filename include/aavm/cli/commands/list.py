@@ -8,6 +8,8 @@ from cpk.types import Machine
 from .. import AbstractCLICommand
 from ... import aavmconfig
 from ...types import Arguments
+from ...utils.capacity import gather_usage
+from ...utils.misc import human_size
 
 
 class CLIListCommand(AbstractCLICommand):
@@ -27,12 +29,41 @@ class CLIListCommand(AbstractCLICommand):
             ["#", "Name", "Description", "Runtime", "Status"]
         ]
         for i, machine in enumerate(aavmconfig.machines.values()):
-            status = colored("Running", "green") if machine.running \
+            # NOTE: hibernated machines are resolved from disk, without talking to Docker
+            status = colored("Hibernated", "blue") if machine.hibernated \
+                else colored("Running", "green") if machine.running \
                 else colored(machine.status.title(), "red")
             data.append([str(i), machine.name, machine.description, machine.runtime.image, status])
         table = Table(data)
         table.title = " Machines "
         print()
         print(table.table)
+        # make a table with the capacity of the CPK machines in use
+        endpoints = []
+        for machine in aavmconfig.machines.values():
+            if machine.links.machine is not None and not machine.hibernated and \
+                    machine.links.machine not in endpoints:
+                endpoints.append(machine.links.machine)
+        if endpoints:
+            data = [
+                ["CPK Machine", "Running", "CPUs (committed / available)",
+                 "Memory (committed / available)"]
+            ]
+            for endpoint, usage in zip(endpoints, gather_usage(endpoints)):
+                if usage is None:
+                    data.append([endpoint.name, "-", colored("Unreachable", "red"), "-"])
+                    continue
+                color = "green" if usage.admits(0, 0) else "red"
+                data.append([
+                    endpoint.name,
+                    str(usage.running),
+                    colored(f"{usage.cpus:.2f} / {usage.available_cpus:.2f}", color),
+                    colored(f"{human_size(usage.committed_memory)} / "
+                            f"{human_size(usage.available_memory)}", color)
+                ])
+            table = Table(data)
+            table.title = " Endpoints "
+            print()
+            print(table.table)
         # ---
         return True
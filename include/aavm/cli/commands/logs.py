@@ -0,0 +1,73 @@
+import argparse
+import time
+from typing import Optional
+
+from cpk.types import Machine
+from .. import AbstractCLICommand
+from ..logger import aavmlogger
+from ...exceptions import AAVMException
+from ...types import Arguments
+from ...utils.logs import stream_logs
+from ...utils.machine import select_machines
+from ...utils.misc import parse_duration
+
+
+class CLILogsCommand(AbstractCLICommand):
+
+    KEY = 'logs'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        # '-f' follows the logs here (like 'docker logs -f'), it is taken away from the common
+        # '-f/--force', which has no meaning for this command
+        parser = argparse.ArgumentParser(parents=[parent], conflict_handler="resolve")
+        parser.add_argument(
+            "-f",
+            "--follow",
+            default=False,
+            action="store_true",
+            help="Follow the logs"
+        )
+        parser.add_argument(
+            "-n",
+            "--tail",
+            default=None,
+            type=int,
+            help="Number of lines to show from the end of the logs (default: all)"
+        )
+        parser.add_argument(
+            "--since",
+            default=None,
+            type=str,
+            help="Only show logs newer than the given duration (e.g., 10m, 2h)"
+        )
+        parser.add_argument(
+            "-t",
+            "--timestamps",
+            default=False,
+            action="store_true",
+            help="Show timestamps"
+        )
+        parser.add_argument(
+            "names",
+            nargs="+",
+            help="Names (or shell-style patterns) of the machines to show the logs of"
+        )
+        return parser
+
+    @staticmethod
+    def execute(cpk_machine: Machine, parsed: argparse.Namespace) -> bool:
+        try:
+            machines = select_machines(parsed.names)
+            since = (time.time() - parse_duration(parsed.since)) if parsed.since else None
+        except (AAVMException, ValueError) as e:
+            aavmlogger.error(str(e))
+            return False
+        try:
+            stream_logs(machines, follow=parsed.follow, tail=parsed.tail, since=since,
+                        timestamps=parsed.timestamps)
+        except KeyboardInterrupt:
+            pass
+        # ---
+        return True
@@ -0,0 +1,71 @@
+import argparse
+from typing import Optional
+
+from cpk.types import Machine
+from .. import AbstractCLICommand
+from ..logger import aavmlogger
+from ... import aavmconfig
+from ...types import Arguments
+from ...utils.exporter import MetricsCollector, serve
+
+
+class CLIMetricsCommand(AbstractCLICommand):
+
+    KEY = 'metrics'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent])
+        parser.add_argument(
+            "--listen",
+            default="127.0.0.1",
+            help="Address to listen on"
+        )
+        parser.add_argument(
+            "-p",
+            "--port",
+            default=9465,
+            type=int,
+            help="Port to listen on"
+        )
+        parser.add_argument(
+            "--ttl",
+            default=15,
+            type=float,
+            help="Seconds between two collections, they run in the background and scrapes "
+                 "get the last one without talking to Docker"
+        )
+        parser.add_argument(
+            "-j",
+            "--workers",
+            default=16,
+            type=int,
+            help="Maximum number of concurrent Docker API calls per endpoint"
+        )
+        parser.add_argument(
+            "--once",
+            default=False,
+            action="store_true",
+            help="Print the metrics once and exit"
+        )
+        return parser
+
+    @staticmethod
+    def execute(cpk_machine: Machine, parsed: argparse.Namespace) -> bool:
+        collector = MetricsCollector(ttl=max(0.0, parsed.ttl), workers=max(1, parsed.workers))
+        if parsed.once:
+            print(collector.text(), end="")
+            return True
+        if not aavmconfig.settings.metrics:
+            aavmlogger.warning("Recording of command durations and pulls is disabled, set "
+                               "'metrics' to true in the aavm settings to enable it.")
+        aavmlogger.info(f"Serving metrics on http://{parsed.listen}:{parsed.port}/metrics, "
+                        f"press Ctrl-C to stop.")
+        collector.start()
+        try:
+            serve(collector, parsed.listen, parsed.port)
+        except KeyboardInterrupt:
+            pass
+        # ---
+        return True
@@ -1,11 +1,14 @@
 import argparse
+import time
 from typing import Optional
 
 from cpk.types import Machine
 from .. import AbstractCLICommand
 from ..logger import aavmlogger
-from ... import aavmconfig
+from ...exceptions import AAVMException
 from ...types import Arguments
+from ...utils.machine import select_machines, remove_machines
+from ...utils.misc import ask_confirmation, human_time
 
 
 class CLIRemoveCommand(AbstractCLICommand):
@@ -14,23 +17,70 @@ class CLIRemoveCommand(AbstractCLICommand):
     @staticmethod
     def parser(parent: Optional[argparse.ArgumentParser] = None,
                args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        # '-y/--yes' skips the confirmation (as in 'aavm gc'), '-f/--force' drops the machines
+        # even when their containers cannot be removed
         parser = argparse.ArgumentParser(parents=[parent])
         parser.add_argument(
-            "name",
-            type=str,
-            nargs=1,
-            help="Name of the machine to remove"
+            "-t",
+            "--timeout",
+            default=2,
+            type=int,
+            help="Seconds running machines are given to stop before they are killed"
+        )
+        parser.add_argument(
+            "-j",
+            "--workers",
+            default=16,
+            type=int,
+            help="Maximum number of machines removed concurrently"
+        )
+        parser.add_argument(
+            "-y",
+            "--yes",
+            default=False,
+            action="store_true",
+            help="Do not ask for confirmation"
+        )
+        parser.add_argument(
+            "names",
+            nargs="+",
+            help="Names (or shell-style patterns, e.g., 'ci-*') of the machines to remove"
         )
         return parser
 
     @staticmethod
     def execute(cpk_machine: Machine, parsed: argparse.Namespace) -> bool:
-        parsed.machine = parsed.name[0].strip()
-        # check if the machine exists
-        if parsed.machine not in aavmconfig.machines:
-            aavmlogger.error(f"The machine '{parsed.machine}' does not exist.")
+        # select machines
+        try:
+            machines = select_machines([n.strip() for n in parsed.names])
+        except AAVMException as e:
+            aavmlogger.error(str(e))
             return False
-        # TODO: make sure the machine is OFF
-        # TODO: remove the machine
+        # ask for confirmation
+        if not parsed.yes:
+            names = ", ".join(m.name for m in machines[:10])
+            if len(machines) > 10:
+                names += f" and {len(machines) - 10} more"
+            granted = ask_confirmation(
+                aavmlogger, f"The machine(s) {names} will be removed together with their "
+                            f"containers, this cannot be undone")
+            if not granted:
+                aavmlogger.info("Nothing was removed.")
+                return False
+        # remove
+        aavmlogger.info(f"Removing {len(machines)} machine(s)...")
+        stime = time.time()
+        errors = remove_machines(machines, timeout=parsed.timeout, force=parsed.force,
+                                 workers=parsed.workers)
+        failed = {name: error for name, error in errors.items() if error is not None}
+        for name, error in failed.items():
+            aavmlogger.error(f"Machine '{name}' could not be removed: {error}")
+        if failed and not parsed.force:
+            aavmlogger.info("Use -f/--force to remove the machines even if their containers "
+                            "could not be removed ('aavm gc' can clean them up later).")
+        removed = len(machines) - len(failed)
+        if removed:
+            aavmlogger.info(f"{removed} machine(s) removed in "
+                            f"{human_time(time.time() - stime, compact=True)}.")
         # ---
-        return True
+        return not failed
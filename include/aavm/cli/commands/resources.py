@@ -0,0 +1,190 @@
+import argparse
+import copy
+from typing import Optional
+
+from docker.errors import APIError
+from terminaltables import SingleTable as Table
+
+from cpk.types import Machine
+from .. import AbstractCLICommand
+from ..logger import aavmlogger
+from ... import aavmconfig
+from ...exceptions import AAVMException
+from ...types import Arguments, MachineResources
+from ...utils.capacity import get_info
+from ...utils.docker import RUNNING_STATUSES
+from ...utils.resources import get_profile, parse_size, validate_resources
+from ...utils.tables import table_resources
+
+
+class CLIResourcesCommand(AbstractCLICommand):
+
+    KEY = 'resources'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent])
+        parser.add_argument(
+            "-p",
+            "--profile",
+            default=None,
+            help="Start from a named resource profile (e.g., small, medium, large)"
+        )
+        parser.add_argument(
+            "--clear",
+            default=False,
+            action="store_true",
+            help="Remove all resource limits"
+        )
+        parser.add_argument(
+            "--cpus",
+            default=None,
+            type=float,
+            help="Number of CPUs (sets the CPU quota over a 100ms period)"
+        )
+        parser.add_argument("--cpu-quota", default=None, type=int, help="CPU CFS quota")
+        parser.add_argument("--cpu-period", default=None, type=int, help="CPU CFS period")
+        parser.add_argument("--cpu-shares", default=None, type=int,
+                            help="CPU shares (relative weight)")
+        parser.add_argument("--cpuset-cpus", default=None,
+                            help="CPUs in which to allow execution (e.g., 0-3,8)")
+        parser.add_argument("--cpuset-mems", default=None,
+                            help="Memory nodes in which to allow execution (e.g., 0,1)")
+        parser.add_argument("--memory", default=None, help="Memory limit (e.g., 4g)")
+        parser.add_argument("--memory-swap", default=None,
+                            help="Memory + swap limit (e.g., 8g), -1 for unlimited swap")
+        parser.add_argument("--blkio-weight", default=None, type=int,
+                            help="Block I/O relative weight, between 10 and 1000")
+        parser.add_argument("--shm-size", default=None, help="Size of /dev/shm (e.g., 256m)")
+        parser.add_argument(
+            "--tmpfs",
+            default=[],
+            action="append",
+            help="Size of one of the runtime's tmpfs mounts as PATH=SIZE (e.g., /tmp=1g)"
+        )
+        parser.add_argument(
+            "--ulimit",
+            default=[],
+            action="append",
+            help="Ulimit as NAME=SOFT[:HARD] (e.g., nofile=1024:4096)"
+        )
+        parser.add_argument(
+            "name",
+            type=str,
+            nargs=1,
+            help="Name of the machine to show or change the resources of"
+        )
+        return parser
+
+    @staticmethod
+    def execute(cpk_machine: Machine, parsed: argparse.Namespace) -> bool:
+        name = parsed.name[0].strip()
+        # check if the machine exists
+        if name not in aavmconfig.machines:
+            aavmlogger.error(f"The machine '{name}' does not exist.")
+            return False
+        # get the machine
+        machine = aavmconfig.machines[name]
+        # compile new resources
+        try:
+            resources = _compile_resources(machine, parsed)
+        except (AAVMException, ValueError) as e:
+            aavmlogger.error(str(e))
+            return False
+        # nothing to change, show the current resources
+        if resources is None:
+            _print_resources(machine)
+            return True
+        # validate against the capacity of the host
+        try:
+            validate_resources(resources, get_info(machine.machine))
+        except AAVMException as e:
+            aavmlogger.error(str(e))
+            return False
+        # update machine
+        previous = machine.settings.resources
+        machine.settings.resources = resources
+        if parsed.profile or parsed.clear:
+            machine.settings.profile = parsed.profile
+        machine.to_disk()
+        aavmlogger.info(f"Resources of machine '{name}' updated.")
+        # apply changes to the existing container (if any)
+        container = machine.container
+        if container is not None:
+            changed = {k for k, v in resources.serialize().items()
+                       if getattr(previous, k) != v}
+            live = {k: v for k, v in resources.update_config().items() if k in changed}
+            if live and container.status in RUNNING_STATUSES + ["created", "exited"]:
+                try:
+                    container.update(**live)
+                    aavmlogger.info(f"Applied to the running container: {', '.join(live)}.")
+                except APIError as e:
+                    aavmlogger.warning(f"The changes could not be applied to the existing "
+                                       f"container, the error reads:\n{str(e)}")
+            # limits that were removed can only be dropped by recreating the container
+            offline = changed.difference(live)
+            if offline:
+                aavmlogger.warning(f"Changes to {', '.join(sorted(offline))} cannot be applied "
+                                   f"to an existing container. Stop the machine and run,\n\n"
+                                   f"\t$ aavm reset {name}\n\nto recreate its container.")
+        _print_resources(machine)
+        # ---
+        return True
+
+
+def _compile_resources(machine, parsed: argparse.Namespace) -> Optional[MachineResources]:
+    options = ["cpus", "cpu_quota", "cpu_period", "cpu_shares", "cpuset_cpus", "cpuset_mems",
+               "memory", "memory_swap", "blkio_weight", "shm_size", "tmpfs", "ulimit"]
+    given = [o for o in options if getattr(parsed, o) not in [None, []]]
+    if not given and not parsed.profile and not parsed.clear:
+        return None
+    # base resources
+    if parsed.clear:
+        resources = MachineResources()
+    elif parsed.profile:
+        resources = get_profile(parsed.profile)
+    else:
+        resources = copy.deepcopy(machine.settings.resources)
+    # cpu
+    if parsed.cpus is not None:
+        resources.cpu_period = parsed.cpu_period or 100000
+        resources.cpu_quota = int(parsed.cpus * resources.cpu_period)
+    for field in ["cpu_quota", "cpu_period", "cpu_shares", "cpuset_cpus", "cpuset_mems",
+                  "blkio_weight"]:
+        if getattr(parsed, field) is not None:
+            setattr(resources, field, getattr(parsed, field))
+    # memory
+    if parsed.memory is not None:
+        resources.mem_limit = parse_size(parsed.memory)
+    if parsed.memory_swap is not None:
+        resources.memswap_limit = -1 if parsed.memory_swap.strip() == "-1" else \
+            parse_size(parsed.memory_swap)
+    if parsed.shm_size is not None:
+        resources.shm_size = parse_size(parsed.shm_size)
+    # tmpfs (only the runtime's mounts can be resized)
+    mounts = {**machine.runtime.configuration.get("tmpfs", {}),
+              **machine.configuration.get("tmpfs", {})}
+    for tmpfs in parsed.tmpfs:
+        path, _, size = tmpfs.partition("=")
+        if path not in mounts:
+            raise AAVMException(f"Path '{path}' is not a tmpfs mount of this machine. "
+                                f"Valid paths are: {', '.join(mounts) or '(none)'}.")
+        resources.tmpfs[path] = parse_size(size)
+    # ulimits
+    for ulimit in parsed.ulimit:
+        ulimit_name, _, limits = ulimit.partition("=")
+        soft, _, hard = limits.partition(":")
+        resources.ulimits[ulimit_name] = [int(soft), int(hard or soft)]
+    # ---
+    return resources
+
+
+def _print_resources(machine):
+    data = table_resources(machine)
+    table = Table(data)
+    table.inner_heading_row_border = False
+    table.justify_columns[0] = 'right'
+    table.title = f" Resources: {machine.name} "
+    print()
+    print(table.table)
@@ -0,0 +1,37 @@
+import argparse
+from typing import Optional
+
+from cpk.types import Machine
+from .start import CLIStartCommand
+from .. import AbstractCLICommand
+from ..logger import aavmlogger
+from ... import aavmconfig
+from ...types import Arguments
+
+
+class CLIResumeCommand(AbstractCLICommand):
+
+    KEY = 'resume'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = CLIStartCommand.parser(parent, args)
+        parser.description = "Recreate and start the container of a hibernated machine"
+        return parser
+
+    @staticmethod
+    def execute(cpk_machine: Machine, parsed: argparse.Namespace) -> bool:
+        name = parsed.name[0].strip()
+        # check if the machine exists
+        if name not in aavmconfig.machines:
+            aavmlogger.error(f"The machine '{name}' does not exist.")
+            return False
+        # get the machine
+        machine = aavmconfig.machines[name]
+        if not machine.hibernated:
+            aavmlogger.error(f"The machine '{machine.name}' is not hibernated. "
+                             f"Use 'aavm start {machine.name}' instead.")
+            return False
+        # starting a hibernated machine recreates its container from the snapshot
+        return CLIStartCommand.execute(cpk_machine, parsed)
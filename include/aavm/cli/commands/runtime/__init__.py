@@ -2,20 +2,36 @@ import argparse
 from typing import Optional, Dict, Type
 
 from aavm.cli import AbstractCLICommand
+from aavm.cli.commands.runtime.audit import CLIRuntimeAuditCommand
+from aavm.cli.commands.runtime.bench import CLIRuntimeBenchCommand
+from aavm.cli.commands.runtime.build import CLIRuntimeBuildCommand
+from aavm.cli.commands.runtime.export import CLIRuntimeExportCommand
 from aavm.cli.commands.runtime.inspect import CLIRuntimeInspectCommand
 from aavm.cli.commands.runtime.fetch import CLIRuntimeFetchCommand
+from aavm.cli.commands.runtime.load import CLIRuntimeImportCommand
 from aavm.cli.commands.runtime.pull import CLIRuntimePullCommand
+from aavm.cli.commands.runtime.pool import CLIRuntimePoolCommand
 from aavm.cli.commands.runtime.remove import CLIRuntimeRemoveCommand
 from aavm.cli.commands.runtime.list import CLIRuntimeListCommand
+from aavm.cli.commands.runtime.serve import CLIRuntimeServeCommand
+from aavm.cli.commands.runtime.sync import CLIRuntimeSyncCommand
 from aavm.types import Arguments
 
 from cpk.types import Machine
 
 _supported_subcommands: Dict[str, Type[AbstractCLICommand]] = {
+    "audit": CLIRuntimeAuditCommand,
+    "bench": CLIRuntimeBenchCommand,
+    "build": CLIRuntimeBuildCommand,
+    "export": CLIRuntimeExportCommand,
     "fetch": CLIRuntimeFetchCommand,
+    "import": CLIRuntimeImportCommand,
     "inspect": CLIRuntimeInspectCommand,
     "pull": CLIRuntimePullCommand,
+    "pool": CLIRuntimePoolCommand,
     "rm": CLIRuntimeRemoveCommand,
+    "serve": CLIRuntimeServeCommand,
+    "sync": CLIRuntimeSyncCommand,
     "ls": CLIRuntimeListCommand,
 }
 
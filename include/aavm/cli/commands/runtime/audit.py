@@ -0,0 +1,125 @@
+import argparse
+from typing import Optional
+
+from docker.errors import APIError
+from termcolor import colored
+from terminaltables import SingleTable as Table
+
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.types import Arguments
+from aavm.utils.audit import audit_image, audit_history
+from aavm.utils.docker import sanitize_image_name
+from aavm.utils.misc import human_size
+from aavm.utils.runtime import get_known_runtimes
+from cpk.types import Machine
+
+
+class CLIRuntimeAuditCommand(AbstractCLICommand):
+    KEY = 'runtime audit'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "--quick",
+            default=False,
+            action="store_true",
+            help="Only use the image history (no wasted bytes, the layers are not read)",
+        )
+        parser.add_argument(
+            "--width",
+            type=int,
+            default=60,
+            help="Maximum width of the 'Created by' column",
+        )
+        parser.add_argument(
+            "runtime",
+            nargs=1,
+            help="Name of the runtime to audit, it must be downloaded",
+        )
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        parsed.runtime = sanitize_image_name(parsed.runtime[0])
+        # get list of runtimes available locally
+        aavmlogger.debug("Fetching list of known runtimes from disk...")
+        known_runtimes = get_known_runtimes(machine=machine)
+        matches = [r for r in known_runtimes if r.image == parsed.runtime]
+        if not matches:
+            aavmlogger.error(f"Runtime '{parsed.runtime}' not found.")
+            return False
+        runtime = matches[0]
+        if not runtime.downloaded:
+            aavmlogger.error(f"Runtime '{parsed.runtime}' is not downloaded. "
+                             f"Use 'aavm runtime pull' first.")
+            return False
+        # audit
+        image = runtime.image.compile()
+        client = machine.get_client()
+        try:
+            if parsed.quick:
+                audit = audit_history(client, image)
+            else:
+                aavmlogger.info(f"Reading the layers of '{image}', this might take a while...")
+                audit = audit_image(client, image)
+        except (APIError, ValueError) as e:
+            aavmlogger.error(f"Runtime '{image}' could not be audited, "
+                             f"the error reads:\n{str(e)}")
+            return False
+        # layers
+        data = [["#", "Size", "Wasted", "Component", "Created by"]]
+        for i, layer in enumerate(audit.layers):
+            if layer.size <= 0:
+                continue
+            command = layer.command
+            if len(command) > parsed.width:
+                command = command[:parsed.width - 3] + "..."
+            wasted = human_size(layer.wasted_bytes) if audit.scanned else "-"
+            data.append([
+                str(i),
+                human_size(layer.size),
+                colored(wasted, "red") if layer.wasted_bytes else wasted,
+                layer.component or "-",
+                command
+            ])
+        table = Table(data)
+        table.title = f" Layers: {image} "
+        table.justify_columns[1] = 'right'
+        table.justify_columns[2] = 'right'
+        print()
+        print(table.table)
+        # components
+        data = [["Component", "Layers", "Size", "Wasted"]]
+        for component, (layers, size, wasted) in audit.components().items():
+            data.append([
+                component or "(other)",
+                str(layers),
+                human_size(size),
+                human_size(wasted) if audit.scanned else "-"
+            ])
+        data.append([
+            "Total",
+            str(len(audit.layers)),
+            human_size(audit.size),
+            human_size(audit.wasted_bytes) if audit.scanned else "-"
+        ])
+        table = Table(data)
+        table.title = " Components "
+        table.inner_footing_row_border = True
+        print()
+        print(table.table)
+        # wasted bytes
+        if audit.wasted:
+            print()
+            aavmlogger.warning(
+                f"{human_size(audit.wasted_bytes)} "
+                f"({100 * audit.wasted_bytes / max(1, audit.size):.1f}%) of the runtime "
+                f"'{image}' are wasted: " +
+                ", ".join(f"{human_size(v)} in {k}"
+                          for k, v in sorted(audit.wasted.items(), key=lambda kv: -kv[1]))
+            )
+        # ---
+        return True
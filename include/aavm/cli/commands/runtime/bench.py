@@ -0,0 +1,117 @@
+import argparse
+import dataclasses
+from typing import Optional
+
+from docker.errors import DockerException
+from requests import RequestException
+from termcolor import colored
+from terminaltables import SingleTable as Table
+
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.types import Arguments
+from aavm.utils.bench import benchmark_image
+from aavm.utils.docker import sanitize_image_name
+from aavm.utils.misc import needs_emulation, configure_binfmt
+from aavm.utils.runtime import get_known_runtimes
+from cpk.types import Machine
+
+
+class CLIRuntimeBenchCommand(AbstractCLICommand):
+    KEY = 'runtime bench'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "-n",
+            "--iterations",
+            type=int,
+            default=200000,
+            help="Number of iterations of the CPU-bound workload",
+        )
+        parser.add_argument(
+            "-r",
+            "--repeat",
+            type=int,
+            default=3,
+            help="Number of runs per variant (the best one is reported)",
+        )
+        parser.add_argument(
+            "runtime",
+            nargs=1,
+            help="Name of the runtime to benchmark, all its downloaded variants are measured",
+        )
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        parsed.runtime = sanitize_image_name(parsed.runtime[0])
+        # get list of runtimes available locally
+        aavmlogger.debug("Fetching list of known runtimes from disk...")
+        known_runtimes = get_known_runtimes(machine=machine)
+        matches = [r for r in known_runtimes if r.image == parsed.runtime]
+        if not matches:
+            aavmlogger.error(f"Runtime '{parsed.runtime}' not found.")
+            return False
+        runtime = matches[0]
+        # find all the architecture variants of the runtime
+        variants = [r for r in known_runtimes
+                    if dataclasses.replace(r.image, arch=runtime.image.arch) == runtime.image]
+        missing = [r for r in variants if not r.downloaded]
+        variants = [r for r in variants if r.downloaded]
+        for r in missing:
+            aavmlogger.info(f"Variant '{r.image.compile()}' is not downloaded, skipping it.")
+        if not variants:
+            aavmlogger.error(f"None of the variants of the runtime '{parsed.runtime}' is "
+                             f"downloaded. Use 'aavm runtime pull' first.")
+            return False
+        # measure
+        machine_arch = machine.get_architecture()
+        client = machine.get_client()
+        # foreign variants only run if the machine can emulate them
+        foreign = {r.image.arch for r in variants if needs_emulation(machine_arch, r.image.arch)}
+        for arch in sorted(foreign):
+            configure_binfmt(machine_arch, arch, client, aavmlogger)
+        results, failed = {}, {}
+        for r in variants:
+            image = r.image.compile()
+            aavmlogger.info(f"Benchmarking '{image}'...")
+            try:
+                results[image] = benchmark_image(client, image, parsed.iterations, parsed.repeat)
+            except (DockerException, RequestException) as e:
+                # e.g., a ContainerError when a foreign variant cannot be emulated
+                failed[image] = str(e)
+                aavmlogger.warning(f"Variant '{image}' could not be benchmarked, "
+                                   f"the error reads:\n{str(e)}")
+        # reference is the native variant (if measured)
+        native = [r.image.compile() for r in variants if
+                  not needs_emulation(machine_arch, r.image.arch) and r.image.compile() in results]
+        reference = results[native[0]][1] if native else None
+        # show results
+        data = [["Variant", "Arch", "Emulated", "Startup", "Workload", "Slowdown"]]
+        for r in variants:
+            image = r.image.compile()
+            emulated = needs_emulation(machine_arch, r.image.arch)
+            if image in failed:
+                data.append([image, r.image.arch or "-",
+                             colored("Yes", "red") if emulated else colored("No", "green"),
+                             "-", "-", colored("Failed", "red")])
+                continue
+            startup, workload = results[image]
+            slowdown = f"{workload / reference:.1f}x" if reference else "-"
+            data.append([
+                image,
+                r.image.arch or "-",
+                colored("Yes", "red") if emulated else colored("No", "green"),
+                f"{startup:.2f}s",
+                f"{workload:.2f}s",
+                colored(slowdown, "red") if emulated else slowdown
+            ])
+        table = Table(data)
+        table.title = f" Benchmark ({machine.name}, {machine_arch}) "
+        print()
+        print(table.table)
+        # ---
+        return not failed
@@ -0,0 +1,130 @@
+import argparse
+import os
+from typing import Optional
+
+from termcolor import colored
+from terminaltables import SingleTable as Table
+
+from aavm import aavmconfig
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.exceptions import AAVMException
+from aavm.types import Arguments
+from aavm.utils.build import load_projects, build_all, dependency_graph
+from cpk.machine import FromEnvMachine
+from cpk.types import Machine
+
+_STATUS_COLORS = {"done": "green", "failed": "red", "skipped": "yellow"}
+
+
+class CLIRuntimeBuildCommand(AbstractCLICommand):
+    KEY = 'runtime build'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "-C",
+            "--workdir",
+            default=os.getcwd(),
+            help="Directory containing the runtime projects",
+        )
+        parser.add_argument(
+            "--archs",
+            default="amd64,arm64v8",
+            help="Comma-separated list of architectures to build for (ignored if -a is given)",
+        )
+        parser.add_argument(
+            "-j",
+            "--workers",
+            default=2,
+            type=int,
+            help="Maximum number of builds running concurrently",
+        )
+        parser.add_argument("--push", default=False, action="store_true",
+                            help="Push the images once built")
+        parser.add_argument("--pull", default=False, action="store_true",
+                            help="Pull the latest version of the external base images")
+        parser.add_argument("--no-cache", default=False, action="store_true",
+                            help="Do not use the Docker cache")
+        parser.add_argument(
+            "--steps",
+            default=False,
+            action="store_true",
+            help="Show the time spent on each step of each build",
+        )
+        parser.add_argument(
+            "projects",
+            nargs="*",
+            help="Names of the runtime projects to build (default: all)",
+        )
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        workdir = os.path.abspath(parsed.workdir)
+        try:
+            projects = load_projects(workdir)
+            graph = dependency_graph(projects)
+        except (AAVMException, ValueError, KeyError) as e:
+            aavmlogger.error(str(e))
+            return False
+        if parsed.projects:
+            unknown = set(parsed.projects).difference(graph)
+            if unknown:
+                aavmlogger.error(f"Unknown runtime projects: {', '.join(sorted(unknown))}.")
+                return False
+            projects = [p for p in projects if p.name in parsed.projects]
+        if not projects:
+            aavmlogger.error(f"No runtime projects found in '{workdir}'.")
+            return False
+        for p in projects:
+            aavmlogger.info(f"Runtime project '{p.name}' ({p.image}) is based on "
+                            f"'{p.base}'" + (f" (built by '{graph[p.name][0]}')"
+                                             if graph[p.name] else "") + ".")
+        archs = [parsed.arch] if parsed.arch else \
+            [a.strip() for a in parsed.archs.split(",") if a.strip()]
+        # arguments passed to cpk build
+        extra = [f for f, on in [("--push", parsed.push), ("--no-cache", parsed.no_cache)] if on]
+        if not isinstance(machine, FromEnvMachine):
+            extra += ["-H", machine.name]
+        # pulling a base that is built in-tree would replace the local build
+        pull = [p.name for p in projects if not graph[p.name]] if parsed.pull else []
+        # build
+        log_dir = os.path.join(aavmconfig.path, "cache", "build")
+        reports = build_all(projects, archs, log_dir, workers=parsed.workers, extra=extra,
+                            pull=pull)
+        # per-step report
+        if parsed.steps:
+            for r in [r for r in reports if r.steps]:
+                data = [["#", "Instruction", "Time", "Cached"]]
+                for s in r.steps:
+                    data.append([str(s.index), s.instruction[:60], f"{s.duration:.1f}s",
+                                 colored("Yes", "green") if s.cached else "No"])
+                table = Table(data)
+                table.title = f" {r.project} ({r.arch}) "
+                table.justify_columns[2] = 'right'
+                print()
+                print(table.table)
+        # summary
+        data = [["Project", "Arch", "Status", "Time", "Cache hits", "Slowest step"]]
+        for r in reports:
+            slowest = max(r.steps, key=lambda s: s.duration) if r.steps else None
+            data.append([
+                r.project,
+                r.arch,
+                colored(r.status.title(), _STATUS_COLORS.get(r.status, "white")),
+                f"{r.duration:.1f}s",
+                f"{r.cache_hits}/{len(r.steps)} ({r.cache_rate * 100:.0f}%)" if r.steps else "-",
+                f"#{slowest.index} ({slowest.duration:.1f}s) {slowest.instruction[:40]}"
+                if slowest else "-"
+            ])
+        table = Table(data)
+        table.title = " Runtime builds "
+        table.justify_columns[3] = 'right'
+        table.justify_columns[4] = 'right'
+        print()
+        print(table.table)
+        # ---
+        return all(r.status == "done" for r in reports)
@@ -0,0 +1,99 @@
+import argparse
+import os
+import sys
+from typing import Optional
+
+from docker.errors import APIError
+
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.exceptions import AAVMException
+from aavm.types import Arguments
+from aavm.utils.bundle import BUNDLE_COMPRESSIONS, export_bundle
+from aavm.utils.docker import sanitize_image_name
+from aavm.utils.misc import human_size, human_time
+from aavm.utils.runtime import get_known_runtimes
+from cpk.types import Machine
+
+
+class CLIRuntimeExportCommand(AbstractCLICommand):
+    KEY = 'runtime export'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "-o",
+            "--output",
+            required=True,
+            help="File to write the bundle to, use '-' for the standard output",
+        )
+        parser.add_argument(
+            "-z",
+            "--compress",
+            default="auto",
+            choices=BUNDLE_COMPRESSIONS,
+            help="Compression (auto: zstd if available, gzip otherwise)",
+        )
+        parser.add_argument(
+            "--level",
+            type=int,
+            default=None,
+            help="Compression level (default: 3 for zstd, 6 for gzip)",
+        )
+        parser.add_argument(
+            "-j",
+            "--threads",
+            type=int,
+            default=None,
+            help="Number of compression threads (default: all the cores)",
+        )
+        parser.add_argument(
+            "runtime",
+            nargs="+",
+            help="Name of the runtimes to export, they must be downloaded",
+        )
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        # get list of runtimes available locally
+        aavmlogger.debug("Fetching list of known runtimes from disk...")
+        known_runtimes = get_known_runtimes(machine=machine)
+        runtimes = []
+        for name in map(sanitize_image_name, parsed.runtime):
+            matches = [r for r in known_runtimes if r.image == name]
+            if not matches:
+                aavmlogger.error(f"Runtime '{name}' not found.")
+                return False
+            if not matches[0].downloaded:
+                aavmlogger.error(f"Runtime '{name}' is not downloaded. "
+                                 f"Use 'aavm runtime pull' first.")
+                return False
+            runtimes.append(matches[0])
+        # write the bundle next to its final destination, then move it in place
+        to_stdout = parsed.output == "-"
+        partial = f"{parsed.output}.partial"
+        aavmlogger.info(f"Exporting {len(runtimes)} runtime(s)...")
+        try:
+            if to_stdout:
+                report = export_bundle(machine.get_client(), runtimes, sys.stdout.buffer,
+                                       parsed.compress, parsed.level, parsed.threads)
+                sys.stdout.buffer.flush()
+            else:
+                with open(partial, "wb") as fout:
+                    report = export_bundle(machine.get_client(), runtimes, fout,
+                                           parsed.compress, parsed.level, parsed.threads)
+                os.replace(partial, parsed.output)
+        except (APIError, AAVMException, OSError) as e:
+            if not to_stdout and os.path.exists(partial):
+                os.remove(partial)
+            aavmlogger.error(f"The runtimes could not be exported, the error reads:\n{str(e)}")
+            return False
+        # ---
+        size = "" if to_stdout else f" -> {human_size(os.path.getsize(parsed.output))}"
+        aavmlogger.info(f"Exported {', '.join(report.runtimes)} ({report.compression}, "
+                        f"{human_size(report.images_bytes)}{size}) in "
+                        f"{human_time(report.duration, compact=True)}.")
+        return True
@@ -1,11 +1,14 @@
 import argparse
 from typing import Optional
 
+from docker.errors import APIError
+from requests import RequestException
 from termcolor import colored
 from terminaltables import SingleTable as Table
 
 from aavm.cli import AbstractCLICommand, aavmlogger
 from aavm.types import Arguments
+from aavm.utils.prefetch import prefetch_in_background
 from aavm.utils.runtime import fetch_remote_runtimes
 from cpk.types import Machine
 
@@ -23,6 +26,12 @@ class CLIRuntimeFetchCommand(AbstractCLICommand):
             default=False,
             help="Get runtimes of any architecture",
         )
+        parser.add_argument(
+            "--prefetch",
+            action="store_true",
+            default=False,
+            help="Start downloading the runtimes native to the machine in the background",
+        )
         # ---
         return parser
 
@@ -38,6 +47,19 @@ class CLIRuntimeFetchCommand(AbstractCLICommand):
         # store/update the runtimes on disk
         for runtime in runtimes:
             runtime.to_disk()
+        # start downloading the native runtimes that are not there yet
+        prefetching = set()
+        if parsed.prefetch:
+            for runtime in runtimes:
+                if runtime.downloaded or runtime.image.arch not in [None, arch]:
+                    continue
+                try:
+                    prefetch_in_background(machine, runtime)
+                except (APIError, RequestException) as e:
+                    aavmlogger.warning(f"Runtime '{runtime.image.compile()}' could not be "
+                                       f"prefetched, the error reads:\n{str(e)}")
+                    continue
+                prefetching.add(runtime.image)
         # show list of runtimes available
         data = [
             ["#", "Name", "Description", "Arch", "Downloaded"] if parsed.all else
@@ -52,7 +74,9 @@ class CLIRuntimeFetchCommand(AbstractCLICommand):
             if parsed.all:
                 row.append(runtime.image.arch)
             # whether it is downloaded already
-            downloaded = colored('Yes', 'green') if runtime.downloaded else colored('No', 'red')
+            downloaded = colored('Yes', 'green') if runtime.downloaded else \
+                colored('Downloading', 'yellow') if runtime.image in prefetching else \
+                colored('No', 'red')
             row.append(downloaded)
             # add row to table
             data += [row]
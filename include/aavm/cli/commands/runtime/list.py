@@ -6,6 +6,7 @@ from terminaltables import SingleTable as Table
 
 from aavm.cli import AbstractCLICommand, aavmlogger
 from aavm.types import Arguments
+from aavm.utils.registry import UpdateCheck, check_updates
 from aavm.utils.runtime import get_known_runtimes
 from cpk.types import Machine
 
@@ -23,6 +24,20 @@ class CLIRuntimeListCommand(AbstractCLICommand):
             default=False,
             help="List runtimes of any architecture",
         )
+        parser.add_argument(
+            "-u",
+            "--check-updates",
+            action="store_true",
+            default=False,
+            help="Check whether newer images were published for the downloaded runtimes",
+        )
+        parser.add_argument(
+            "-j",
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of registry requests issued concurrently",
+        )
         # ---
         return parser
 
@@ -36,11 +51,19 @@ class CLIRuntimeListCommand(AbstractCLICommand):
         if not parsed.all:
             runtimes = [r for r in runtimes if r.image.arch == arch]
         aavmlogger.debug(f"{len(runtimes)} runtimes known locally.")
+        # compare local and published digests
+        checks = {}
+        if parsed.check_updates:
+            aavmlogger.info("Checking for updates...")
+            checks = check_updates(machine.get_client(), [r for r in runtimes if r.downloaded],
+                                   workers=parsed.workers)
         # show list of runtimes available
         data = [
             ["#", "Name", "Description", "Arch", "Official", "Downloaded"] if
             parsed.all else ["#", "Name", "Description", "Official", "Downloaded"]
         ]
+        if parsed.check_updates:
+            data[0].append("Update")
         for i, runtime in enumerate(runtimes):
             # whether it is an official image and it is downloaded
             official = colored('Yes', 'green') if runtime.official else colored('No', 'red')
@@ -52,6 +75,9 @@ class CLIRuntimeListCommand(AbstractCLICommand):
                 row.append(runtime.image.arch)
             # add official and downloaded
             row.extend([official, downloaded])
+            # add update status
+            if parsed.check_updates:
+                row.append(_update_status(checks.get(runtime.image.compile(), None)))
             # add row to table
             data += [row]
         table = Table(data)
@@ -60,5 +86,21 @@ class CLIRuntimeListCommand(AbstractCLICommand):
         table.justify_columns[5 - int(not parsed.all)] = 'center'
         print()
         print(table.table)
+        # checks that failed
+        for check in checks.values():
+            if check.error:
+                aavmlogger.warning(f"Runtime '{check.image}' could not be checked against its "
+                                   f"registry, the error reads:\n{check.error}")
         # ---
         return True
+
+
+def _update_status(check: Optional[UpdateCheck]) -> str:
+    if check is None:
+        return "-"
+    suffix = " (index)" if check.source == "index" else ""
+    if check.outdated is None:
+        return colored("Unknown", "yellow")
+    if check.outdated:
+        return colored(f"Available{suffix}", "yellow")
+    return colored(f"Up to date{suffix}", "green")
@@ -0,0 +1,47 @@
+import argparse
+import sys
+from typing import Optional
+
+from docker.errors import APIError
+
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.exceptions import AAVMException
+from aavm.types import Arguments
+from aavm.utils.bundle import import_bundle
+from aavm.utils.misc import human_size, human_time
+from cpk.types import Machine
+
+
+class CLIRuntimeImportCommand(AbstractCLICommand):
+    KEY = 'runtime import'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "bundle",
+            nargs=1,
+            help="Bundle created with 'aavm runtime export', use '-' for the standard input",
+        )
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        bundle = parsed.bundle[0]
+        aavmlogger.info(f"Importing runtimes from '{bundle}'...")
+        try:
+            if bundle == "-":
+                report = import_bundle(machine.get_client(), sys.stdin.buffer)
+            else:
+                with open(bundle, "rb") as fin:
+                    report = import_bundle(machine.get_client(), fin)
+        except (APIError, AAVMException, OSError, ValueError) as e:
+            aavmlogger.error(f"The bundle could not be imported, the error reads:\n{str(e)}")
+            return False
+        # ---
+        aavmlogger.info(f"Imported {', '.join(report.runtimes) or 'no runtimes'} "
+                        f"({report.compression}, {human_size(report.images_bytes)}) in "
+                        f"{human_time(report.duration, compact=True)}.")
+        return True
@@ -0,0 +1,72 @@
+import argparse
+from typing import Optional
+
+from docker.errors import APIError
+
+from aavm import aavmconfig
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.types import Arguments
+from aavm.utils.docker import sanitize_image_name
+from aavm.utils.pool import fill_pool, pool_size, list_pool
+from aavm.utils.runtime import get_known_runtimes
+from cpk.types import Machine
+
+
+class CLIRuntimePoolCommand(AbstractCLICommand):
+    KEY = 'runtime pool'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "-n",
+            "--size",
+            type=int,
+            default=None,
+            help="Number of containers to keep ready for this runtime (0 disables the pool)",
+        )
+        parser.add_argument(
+            "runtime",
+            nargs=1,
+            help="Name of the runtime to manage the pool of",
+        )
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        # noinspection DuplicatedCode
+        parsed.runtime = sanitize_image_name(parsed.runtime[0])
+        # get list of runtimes available locally
+        aavmlogger.debug("Fetching list of known runtimes from disk...")
+        known_runtimes = get_known_runtimes()
+        aavmlogger.debug(f"{len(known_runtimes)} runtimes known locally.")
+        # check whether the given runtime is known
+        matches = [r for r in known_runtimes if r.image == parsed.runtime]
+        runtime = matches[0] if matches else None
+        # no matches?
+        if runtime is None:
+            aavmlogger.error(f"Runtime '{parsed.runtime}' not found.")
+            return False
+        # update size of the pool
+        if parsed.size is not None:
+            if parsed.size < 0:
+                aavmlogger.error("The size of the pool must be a non-negative integer.")
+                return False
+            aavmconfig.settings.pools[parsed.runtime] = parsed.size
+            if parsed.size == 0:
+                del aavmconfig.settings.pools[parsed.runtime]
+            aavmconfig.settings.to_disk()
+        # fill (or drain) the pool
+        size = pool_size(runtime)
+        try:
+            created = fill_pool(machine, runtime, size)
+        except APIError as e:
+            aavmlogger.error(str(e))
+            return False
+        available = len(list_pool(machine.get_client(), runtime))
+        aavmlogger.info(f"Pool of runtime '{parsed.runtime}': {available}/{size} containers "
+                        f"ready ({created} created).")
+        # ---
+        return True
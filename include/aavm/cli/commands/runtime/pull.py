@@ -1,11 +1,15 @@
 import argparse
+import dataclasses
 from typing import Optional
 
 from docker.errors import APIError
+from requests import RequestException
 
 from aavm.cli import AbstractCLICommand, aavmlogger
 from aavm.types import Arguments
-from aavm.utils.docker import pull_image, sanitize_image_name
+from aavm.utils.docker import sanitize_image_name
+from aavm.utils.misc import needs_emulation
+from aavm.utils.prefetch import pull_with_record, wait_for_pull
 from aavm.utils.runtime import get_known_runtimes
 from cpk.types import Machine
 
@@ -17,6 +21,18 @@ class CLIRuntimePullCommand(AbstractCLICommand):
     def parser(parent: Optional[argparse.ArgumentParser] = None,
                args: Optional[Arguments] = None) -> argparse.ArgumentParser:
         parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "--emulate",
+            default=False,
+            action="store_true",
+            help="Pull the given variant even if one native to the machine exists",
+        )
+        parser.add_argument(
+            "--background",
+            default=False,
+            action="store_true",
+            help="Pull as a background prefetch (no progress bar)",
+        )
         parser.add_argument(
             "runtime",
             nargs=1,
@@ -40,12 +56,33 @@ class CLIRuntimePullCommand(AbstractCLICommand):
         if match is None:
             aavmlogger.error(f"Runtime '{parsed.runtime}' not found.")
             return False
+        # prefer the variant native to the machine (if any)
+        machine_arch = machine.get_architecture()
+        if not parsed.emulate and match.image.arch not in [None, machine_arch]:
+            native = [r for r in known_runtimes if r.image.arch == machine_arch and
+                      dataclasses.replace(r.image, arch=match.image.arch) == match.image]
+            if native:
+                match = native[0]
+                parsed.runtime = match.image.compile(allow_defaults=True)
+                aavmlogger.info(f"Using the native variant '{parsed.runtime}' instead, "
+                                f"use --emulate to pull the original one.")
+        if needs_emulation(machine_arch, match.image.arch):
+            aavmlogger.warning(f"Runtime '{parsed.runtime}' is built for '{match.image.arch}' "
+                               f"and will run under emulation on this '{machine_arch}' machine.")
+        # someone else (e.g., a background prefetch) might be pulling it already, if so and
+        # that pull succeeds, there is nothing left to do
+        if not parsed.background:
+            record = wait_for_pull(machine, match)
+            if record is not None and record.status == "done":
+                aavmlogger.info(f"Runtime '{parsed.runtime}' successfully downloaded.")
+                return True
         # pull image
         try:
             aavmlogger.info(f"Downloading runtime '{parsed.runtime}'...")
-            pull_image(machine, parsed.runtime)
+            pull_with_record(machine, parsed.runtime, progress=not parsed.background,
+                             background=parsed.background)
             aavmlogger.info(f"Runtime '{parsed.runtime}' successfully downloaded.")
-        except APIError as e:
+        except (APIError, RequestException) as e:
             aavmlogger.error(str(e))
             return False
         # ---
@@ -0,0 +1,119 @@
+import argparse
+import socket
+from typing import Optional
+
+from docker.errors import APIError
+
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.constants import AAVM_RUNTIMES_INDEX_VERSION
+from aavm.types import Arguments
+from aavm.utils.mirror import REGISTRY_UPSTREAM, IndexCache, start_registry, stop_registry, \
+    serve_index, INDEX_CACHE_TTL
+from cpk.types import Machine
+
+
+class CLIRuntimeServeCommand(AbstractCLICommand):
+    KEY = 'runtime serve'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "-p",
+            "--port",
+            type=int,
+            default=5000,
+            help="Port the registry mirror is published on",
+        )
+        parser.add_argument(
+            "--upstream",
+            default=REGISTRY_UPSTREAM,
+            help="Registry the mirror pulls from on a miss",
+        )
+        parser.add_argument(
+            "--listen",
+            default="0.0.0.0",
+            help="Address the runtimes index is served on",
+        )
+        parser.add_argument(
+            "--index-port",
+            type=int,
+            default=8090,
+            help="Port the runtimes index is served on",
+        )
+        parser.add_argument(
+            "--ttl",
+            type=float,
+            default=INDEX_CACHE_TTL,
+            help="Seconds the upstream runtimes index is cached for",
+        )
+        parser.add_argument(
+            "--no-registry",
+            default=False,
+            action="store_true",
+            help="Only serve the runtimes index",
+        )
+        parser.add_argument(
+            "--down",
+            default=False,
+            action="store_true",
+            help="Remove the registry mirror (the cached layers are kept) and exit",
+        )
+        parser.add_argument(
+            "--purge",
+            default=False,
+            action="store_true",
+            help="Together with --down, also delete the cached layers",
+        )
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        client = machine.get_client()
+        if parsed.down:
+            try:
+                removed = stop_registry(client, purge=parsed.purge)
+            except APIError as e:
+                aavmlogger.error(f"The registry mirror could not be removed, "
+                                 f"the error reads:\n{str(e)}")
+                return False
+            aavmlogger.info("Registry mirror removed." if removed else
+                            "No registry mirror found on this machine.")
+            return True
+        # registry mirror
+        host = socket.getfqdn() if machine.is_local else machine.name
+        if not parsed.no_registry:
+            try:
+                start_registry(client, parsed.port, parsed.upstream)
+            except APIError as e:
+                aavmlogger.error(f"The registry mirror could not be started, "
+                                 f"the error reads:\n{str(e)}")
+                return False
+            aavmlogger.info(f"Registry mirror running on '{machine.name}', port {parsed.port}.")
+        # runtimes index
+        cache = IndexCache(ttl=parsed.ttl)
+        if cache.content() is None:
+            aavmlogger.warning("The runtimes index is not available yet (the upstream cannot "
+                               "be reached and there is no cached copy).")
+        index_url = f"http://{host}:{parsed.index_port}/{AAVM_RUNTIMES_INDEX_VERSION}.json"
+        aavmlogger.info(
+            f"Serving the runtimes index at {index_url}\n\n"
+            f"Point the other hosts to this one by adding to their ~/.aavm/settings.json,\n\n"
+            f"\t\"registry_mirror\": \"{host}:{parsed.port}\",\n"
+            f"\t\"runtimes_index\": \"{index_url}\"\n\n"
+            f"The mirror speaks plain HTTP, add '{host}:{parsed.port}' to the "
+            f"'insecure-registries' of their Docker daemons.\nPress Ctrl-C to stop serving "
+            f"the index (the registry mirror keeps running, use --down to remove it)."
+        )
+        try:
+            serve_index(cache, parsed.listen, parsed.index_port)
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            aavmlogger.error(f"The runtimes index could not be served, "
+                             f"the error reads:\n{str(e)}")
+            return False
+        # ---
+        return True
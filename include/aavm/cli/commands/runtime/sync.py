@@ -0,0 +1,110 @@
+import argparse
+from typing import Optional
+
+from docker.errors import APIError
+from termcolor import colored
+from terminaltables import SingleTable as Table
+
+from aavm.cli import AbstractCLICommand, aavmlogger
+from aavm.exceptions import AAVMException
+from aavm.types import Arguments
+from aavm.utils.docker import sanitize_image_name
+from aavm.utils.machine import select_endpoints
+from aavm.utils.misc import human_size, human_time
+from aavm.utils.runtime import get_known_runtimes
+from aavm.utils.sync import sync_images
+from cpk.types import Machine
+
+
+class CLIRuntimeSyncCommand(AbstractCLICommand):
+    KEY = 'runtime sync'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent], add_help=False)
+        parser.add_argument(
+            "--from",
+            dest="source",
+            required=True,
+            help="CPK machine to copy the runtimes from",
+        )
+        parser.add_argument(
+            "--to",
+            dest="targets",
+            nargs="+",
+            required=True,
+            help="CPK machines (or patterns, e.g., 'lab-*') to copy the runtimes to",
+        )
+        parser.add_argument(
+            "-j",
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of endpoints inspected concurrently",
+        )
+        parser.add_argument(
+            "runtime",
+            nargs="*",
+            help="Name of the runtimes to copy (default: all those downloaded on the source)",
+        )
+        # ---
+        return parser
+
+    @staticmethod
+    def execute(machine: Machine, parsed: argparse.Namespace) -> bool:
+        try:
+            source = select_endpoints([parsed.source])[0]
+            targets = [m for m in select_endpoints(parsed.targets) if m != source]
+        except AAVMException as e:
+            aavmlogger.error(str(e))
+            return False
+        if not targets:
+            aavmlogger.error("No target machines other than the source.")
+            return False
+        # runtimes available on the source
+        aavmlogger.debug("Fetching list of known runtimes from disk...")
+        known_runtimes = [r for r in get_known_runtimes(machine=source) if r.downloaded]
+        if parsed.runtime:
+            runtimes = []
+            for name in map(sanitize_image_name, parsed.runtime):
+                matches = [r for r in known_runtimes if r.image == name]
+                if not matches:
+                    aavmlogger.error(f"Runtime '{name}' is not downloaded on '{source.name}'.")
+                    return False
+                runtimes.append(matches[0])
+        else:
+            runtimes = known_runtimes
+        if not runtimes:
+            aavmlogger.info(f"No runtimes downloaded on '{source.name}', nothing to do.")
+            return True
+        images = sorted({r.image.compile() for r in runtimes})
+        # sync
+        aavmlogger.info(f"Copying {len(images)} runtime(s) from '{source.name}' to "
+                        f"{len(targets)} machine(s)...")
+        try:
+            results = sync_images(source, targets, images, workers=parsed.workers)
+        except (APIError, AAVMException) as e:
+            aavmlogger.error(f"The runtimes could not be read from '{source.name}', "
+                             f"the error reads:\n{str(e)}")
+            return False
+        # show results
+        data = [["Machine", "Runtimes", "Sent", "Already there", "Time", "Status"]]
+        for result in results:
+            data.append([
+                result.machine,
+                str(len(result.images)),
+                human_size(result.sent),
+                human_size(result.skipped),
+                human_time(result.duration, compact=True),
+                colored("Failed", "red") if result.error else colored("Done", "green")
+            ])
+        table = Table(data)
+        table.title = f" Sync from {source.name} "
+        print()
+        print(table.table)
+        for result in results:
+            if result.error:
+                aavmlogger.error(f"Machine '{result.machine}': {result.error}")
+        # ---
+        return all(result.error is None for result in results)
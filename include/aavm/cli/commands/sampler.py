@@ -0,0 +1,59 @@
+import argparse
+import time
+from typing import Optional
+
+from cpk.types import Machine
+from .. import AbstractCLICommand
+from ..logger import aavmlogger
+from ... import aavmconfig
+from ...types import Arguments
+from ...utils.usage import UsageSampler, USAGE_DEFAULT_CAPACITY
+
+
+class CLISamplerCommand(AbstractCLICommand):
+
+    KEY = 'sampler'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent])
+        parser.add_argument(
+            "--interval",
+            default=10,
+            type=float,
+            help="Seconds between two consecutive samples"
+        )
+        parser.add_argument(
+            "--capacity",
+            default=USAGE_DEFAULT_CAPACITY,
+            type=int,
+            help="Number of samples kept per machine (only used for new usage logs)"
+        )
+        parser.add_argument(
+            "-j",
+            "--workers",
+            default=8,
+            type=int,
+            help="Maximum number of machines sampled concurrently"
+        )
+        return parser
+
+    @staticmethod
+    def execute(cpk_machine: Machine, parsed: argparse.Namespace) -> bool:
+        sampler = UsageSampler(workers=max(1, parsed.workers), capacity=max(1, parsed.capacity))
+        aavmlogger.info(f"Recording the resource usage of all the running machines every "
+                        f"{parsed.interval} seconds, press Ctrl-C to stop.")
+        try:
+            while True:
+                t0 = time.time()
+                # reload machines from disk to pick up new machines
+                aavmconfig.reload()
+                sampler.step(list(aavmconfig.machines.values()), ts=t0)
+                time.sleep(max(0.0, parsed.interval - (time.time() - t0)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sampler.close()
+        # ---
+        return True
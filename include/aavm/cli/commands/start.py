@@ -1,11 +1,22 @@
 import argparse
+import time
 from typing import Optional
 
+from docker.errors import ImageNotFound
+
 from cpk.types import Machine
 from .. import AbstractCLICommand
 from ..logger import aavmlogger
 from ... import aavmconfig
-from ...types import Arguments
+from ...exceptions import AAVMException
+from ...types import Arguments, AAVMRuntime
+from ...utils.capacity import admit
+from ...utils.idle import wake_machine
+from ...utils.logs import stream_logs
+from ...utils.misc import configure_binfmt, needs_emulation
+from ...utils.placement import candidate_machines, gather_capacity, place
+from ...utils.pool import claim_pool_container, pool_size, refill_pool_in_background
+from ...utils.prefetch import wait_for_pull
 from ...utils.runtime import get_known_runtimes
 
 
@@ -23,6 +34,18 @@ class CLIStartCommand(AbstractCLICommand):
             action="store_true",
             help="Attach to the container and consume its logs"
         )
+        parser.add_argument(
+            "--wait",
+            default=0,
+            type=float,
+            help="Seconds to wait for capacity to free up on the CPK machine before giving up"
+        )
+        parser.add_argument(
+            "--emulate",
+            default=False,
+            action="store_true",
+            help="Keep the machine's runtime even if a variant native to the CPK machine exists"
+        )
         parser.add_argument(
             "name",
             type=str,
@@ -40,7 +63,15 @@ class CLIStartCommand(AbstractCLICommand):
             return False
         # get the machine
         machine = aavmconfig.machines[parsed.machine]
-        if (machine.links.machine is not None) and (machine.links.machine != cpk_machine):
+        if machine.settings.placement != "pinned":
+            # machines that were never materialized are (re)placed on their first start
+            if machine.links.container is None and machine.links.image is None:
+                hosts = gather_capacity(candidate_machines(cpk_machine), exclude=machine.name)
+                machine.links.machine = place(machine, hosts, machine.settings.placement).machine
+            cpk_machine = machine.links.machine
+            aavmlogger.info(f"Machine '{machine.name}' runs on the CPK machine "
+                            f"'{cpk_machine.name}' (placement: {machine.settings.placement}).")
+        elif (machine.links.machine is not None) and (machine.links.machine != cpk_machine):
             aavmlogger.error(f"Machine '{machine.name}' is already associated with the CPK "
                              f"machine '{cpk_machine.name}'. You can't run it on a different one.")
             return False
@@ -48,35 +79,93 @@ class CLIStartCommand(AbstractCLICommand):
         machine.links.machine = cpk_machine
         # try to get an existing container for this machine
         container = machine.container
-        if container is None:
+        if container is None and machine.links.image is not None:
+            # machines derived from a snapshot need the snapshot, not the runtime
+            try:
+                cpk_machine.get_client().images.get(machine.links.image)
+            except ImageNotFound:
+                aavmlogger.error(f"The machine '{machine.name}' is based on the image "
+                                 f"'{machine.links.image}' which was not found on the CPK "
+                                 f"machine '{cpk_machine.name}'.")
+                return False
+            # make container
+            container = machine.make_container()
+            machine.links.container = container.id
+            machine.links.hibernated = False
+        elif container is None:
+            # avoid emulation, switch to the native variant of the runtime (if any)
+            machine_arch = cpk_machine.get_architecture()
+            if not parsed.emulate and machine.runtime.image.arch not in [None, machine_arch]:
+                try:
+                    runtime = AAVMRuntime.from_image_name(
+                        machine.runtime.image.compile(), arch=machine_arch)
+                except AAVMException as e:
+                    aavmlogger.error(str(e))
+                    return False
+                if runtime.image != machine.runtime.image:
+                    machine.runtime = runtime
+            # foreign runtimes need binfmt/QEMU on the CPK machine
+            if needs_emulation(machine_arch, machine.runtime.image.arch):
+                aavmlogger.warning(f"The machine '{machine.name}' runs a '"
+                                   f"{machine.runtime.image.arch}' runtime on a "
+                                   f"'{machine_arch}' CPK machine, it will be emulated.")
+                configure_binfmt(machine_arch, machine.runtime.image.arch,
+                                 cpk_machine.get_client(), aavmlogger)
+            # the runtime might still be downloading (e.g., prefetched when the machine was made)
+            record = wait_for_pull(cpk_machine, machine.runtime)
+            if record is not None and record.status == "failed":
+                aavmlogger.warning(f"The last download of the runtime '{machine.runtime.image}' "
+                                   f"failed, the error reads:\n{record.error}")
             # make sure the runtime is downloaded
             aavmlogger.debug("Fetching list of available runtimes from the machine in use...")
             machine_runtimes = get_known_runtimes(machine=cpk_machine)
             aavmlogger.debug(f"{len(machine_runtimes)} runtimes found on the machine.")
-            machine_matches = [r for r in machine_runtimes if r.image == machine.runtime.image]
+            machine_matches = [r for r in machine_runtimes
+                               if r.image == machine.runtime.image and r.downloaded]
             if len(machine_matches) <= 0:
                 aavmlogger.error(f"The machine '{machine.name}' uses the runtime "
                                  f"'{machine.runtime.image}' which is currently not installed. "
                                  f"Use the following command to install it,\n\n"
                                  f"\t$ aavm runtime pull {machine.runtime.image}\n")
                 return False
-            # make container
-            container = machine.make_container()
+            # claim a pre-created container from the runtime's pool (if any)
+            container = claim_pool_container(machine) if pool_size(machine.runtime) else None
+            if container is not None:
+                refill_pool_in_background(cpk_machine, machine.runtime)
+            else:
+                # make container
+                container = machine.make_container()
             machine.links.container = container.id
-
-        # TODO: implement '--attach'
+            machine.links.hibernated = False
 
         # store machine back to disk to update association with container and CPK machine
         machine.to_disk()
 
         # container exists, start it
-        if container.status != "running":
+        started = None
+        if container.status == "paused":
+            wake_machine(machine, trigger="start")
+            aavmlogger.info(f"Machine '{machine.name}' resumed.")
+        elif container.status != "running":
+            # admission control, do not overcommit the CPK machine (-f/--force skips it)
+            if not parsed.force and not admit(cpk_machine, container, wait=parsed.wait):
+                aavmlogger.info("Use --wait to queue the start or --force to start anyway.")
+                return False
             aavmlogger.info("Starting machine...")
+            started = time.time()
             container.start()
             aavmlogger.info("Machine started, you should see it running with the container "
                             f"name '{container.name}'.")
         else:
             aavmlogger.info(f"The machine '{machine.name}' appears to be running already."
                             f" Nothing to do.")
+        # consume the logs (of this run, if we started it) until the machine stops or Ctrl-C
+        if parsed.attach:
+            aavmlogger.info("Attached, press Ctrl-C to detach.")
+            try:
+                stream_logs([machine], follow=True, since=int(started) if started else None,
+                            tail=None if started else 20)
+            except KeyboardInterrupt:
+                aavmlogger.info(f"Detached from machine '{machine.name}'.")
         # ---
         return True
@@ -0,0 +1,148 @@
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List
+
+from terminaltables import SingleTable as Table
+
+from cpk.types import Machine
+from .. import AbstractCLICommand
+from ..logger import aavmlogger
+from ... import aavmconfig
+from ...types import Arguments, AAVMMachine
+from ...utils.misc import human_size
+from ...utils.stats import StatsStream
+
+# sort key -> (sample field, descending)
+_SORT_KEYS = {
+    "name": ("name", False),
+    "runtime": ("runtime", False),
+    "cpu": ("cpu", True),
+    "memory": ("memory", True),
+    "net": ("net_rx", True),
+    "block": ("block_read", True),
+    "pids": ("pids", True),
+}
+
+
+class CLITopCommand(AbstractCLICommand):
+
+    KEY = 'top'
+
+    @staticmethod
+    def parser(parent: Optional[argparse.ArgumentParser] = None,
+               args: Optional[Arguments] = None) -> argparse.ArgumentParser:
+        parser = argparse.ArgumentParser(parents=[parent])
+        parser.add_argument(
+            "-s",
+            "--sort",
+            default="cpu",
+            choices=_SORT_KEYS.keys(),
+            help="Column to sort the machines by"
+        )
+        parser.add_argument(
+            "-i",
+            "--interval",
+            default=2.0,
+            type=float,
+            help="Seconds between two refreshes of the table"
+        )
+        parser.add_argument(
+            "--once",
+            default=False,
+            action="store_true",
+            help="Print a single JSON snapshot and exit"
+        )
+        parser.add_argument(
+            "names",
+            nargs="*",
+            help="Names of the machines to monitor (default: all the running ones)"
+        )
+        return parser
+
+    @staticmethod
+    def execute(cpk_machine: Machine, parsed: argparse.Namespace) -> bool:
+        # select machines
+        names = parsed.names or list(aavmconfig.machines.keys())
+        for name in names:
+            if name not in aavmconfig.machines:
+                aavmlogger.error(f"The machine '{name}' does not exist.")
+                return False
+        machines = [aavmconfig.machines[n] for n in names]
+        machines = [m for m in machines if m.links.container is not None and not m.hibernated]
+        # find the running containers (concurrently)
+        streams = _open_streams(machines)
+        if not streams:
+            aavmlogger.info("No running machines to monitor.")
+            return True
+        # wait for the first rates to be available (at most ~2 stats periods)
+        deadline = time.time() + 3.0
+        while time.time() < deadline and not all(s.ready for s in streams):
+            time.sleep(0.1)
+        # one-off snapshot
+        if parsed.once:
+            samples = _collect(streams, parsed.sort)
+            for sample in samples:
+                sample.pop("rates")
+            print(json.dumps(samples, indent=4))
+            return True
+        # refreshing only reads the latest sample of each stream, it never talks to docker
+        try:
+            while True:
+                samples = _collect(streams, parsed.sort)
+                print("\033[2J\033[H", end="")
+                print(_table(samples, parsed.sort).table)
+                if not any(s.alive for s in streams):
+                    break
+                time.sleep(max(0.5, parsed.interval))
+        except KeyboardInterrupt:
+            pass
+        # ---
+        return True
+
+
+def _open_streams(machines: List[AAVMMachine], workers: int = 8) -> List[StatsStream]:
+
+    def _open(machine: AAVMMachine) -> Optional[StatsStream]:
+        container = machine.container
+        if container is None or container.status != "running":
+            return None
+        stream = StatsStream(machine.name, machine.runtime.image.compile(), container)
+        stream.start()
+        return stream
+
+    if not machines:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(machines)))) as pool:
+        return [s for s in pool.map(_open, machines) if s is not None]
+
+
+def _collect(streams: List[StatsStream], sort: str) -> List[dict]:
+    samples = [dict(s.sample) for s in streams if s.sample is not None]
+    field, reverse = _SORT_KEYS[sort]
+    samples.sort(key=lambda s: s[field], reverse=reverse)
+    return samples
+
+
+def _table(samples: List[dict], sort: str) -> Table:
+    data = [
+        ["Name", "Runtime", "CPU %", "Memory", "Mem %", "Net I/O (rx/tx)",
+         "Block I/O (r/w)", "PIDs"]
+    ]
+    for s in samples:
+        data.append([
+            s["name"],
+            s["runtime"],
+            f"{s['cpu']:.2f}",
+            f"{human_size(s['memory'])} / {human_size(s['memory_limit'])}",
+            f"{s['memory_percent']:.2f}",
+            f"{human_size(s['net_rx'])}/s / {human_size(s['net_tx'])}/s",
+            f"{human_size(s['block_read'])}/s / {human_size(s['block_write'])}/s",
+            str(s["pids"])
+        ])
+    table = Table(data)
+    table.title = f" Machines (sorted by {sort}) "
+    for i in [2, 3, 4, 5, 6, 7]:
+        table.justify_columns[i] = 'right'
+    return table
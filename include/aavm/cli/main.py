@@ -10,32 +10,63 @@ import aavm
 from aavm.exceptions import AAVMException
 
 from aavm.cli.logger import aavmlogger, update_logger
+from aavm.cli.commands.clone import CLICloneCommand
 from aavm.cli.commands.create import CLICreateCommand
+from aavm.cli.commands.hibernate import CLIHibernateCommand
 from aavm.cli.commands.inspect import CLIInspectCommand
 from aavm.cli.commands.list import CLIListCommand
 from aavm.cli.commands.start import CLIStartCommand
 from aavm.cli.commands.stop import CLIStopCommand
 from aavm.cli.commands.restart import CLIRestartCommand
+from aavm.cli.commands.remove import CLIRemoveCommand
 # from aavm.cli.commands.clean import CLICleanCommand
 # from aavm.cli.commands.push import CLIPushCommand
 # from aavm.cli.commands.decorate import CLIDecorateCommand
 from aavm.cli.commands.reset import CLIResetCommand
+from aavm.cli.commands.resources import CLIResourcesCommand
+from aavm.cli.commands.exec import CLIExecCommand
+from aavm.cli.commands.cp import CLICopyCommand
+from aavm.cli.commands.logs import CLILogsCommand
+from aavm.cli.commands.metrics import CLIMetricsCommand
+from aavm.cli.commands.sampler import CLISamplerCommand
+from aavm.cli.commands.top import CLITopCommand
+from aavm.cli.commands.resume import CLIResumeCommand
 from aavm.cli.commands.runtime import CLIRuntimeCommand
+from aavm.cli.commands.idle import CLIIdleCommand
+from aavm.cli.commands.cpuset import CLICPUSetCommand
+from aavm.cli.commands.gc import CLIGCCommand
 
+from aavm.utils.metrics import timed
 from cpk.utils.machine import get_machine
 
 _supported_commands = {
     'create': CLICreateCommand,
+    'clone': CLICloneCommand,
     'inspect': CLIInspectCommand,
     'ls': CLIListCommand,
     'list': CLIListCommand,
     'start': CLIStartCommand,
     'stop': CLIStopCommand,
     'restart': CLIRestartCommand,
+    'remove': CLIRemoveCommand,
+    'rm': CLIRemoveCommand,
+    'hibernate': CLIHibernateCommand,
+    'resume': CLIResumeCommand,
     # 'decorate': CLIDecorateCommand,
     # 'machine': CLIMachineCommand,
     'reset': CLIResetCommand,
+    'resources': CLIResourcesCommand,
+    'exec': CLIExecCommand,
+    'cp': CLICopyCommand,
+    'logs': CLILogsCommand,
+    'metrics': CLIMetricsCommand,
+    'sampler': CLISamplerCommand,
+    'top': CLITopCommand,
+    'stats': CLITopCommand,
     'runtime': CLIRuntimeCommand,
+    'idle': CLIIdleCommand,
+    'cpuset': CLICPUSetCommand,
+    'gc': CLIGCCommand,
 }
 
 
@@ -70,8 +101,9 @@ def run():
     # avoid commands using `parsed.machine`
     parsed.machine = None
     # execute command
+    command_name = " ".join(filter(None, [command.KEY, getattr(parsed, "subcommand", None)]))
     try:
-        with machine:
+        with machine, timed("aavm_command_duration_seconds", {"command": command_name}):
             command.execute(machine, parsed)
     except AAVMException as e:
         aavmlogger.error(str(e))
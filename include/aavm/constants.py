@@ -42,3 +42,38 @@ BUILD_COMPATIBILITY_MAP = {
 }
 
 AAVM_CONFIG_DIR = os.path.abspath(os.path.join(str(Path.home()), ".aavm"))
+
+GiB = 1024 ** 3
+MiB = 1024 ** 2
+
+# seconds the result of `docker info` is cached for (per endpoint)
+ENDPOINT_INFO_CACHE_TTL = 300
+
+# built-in resource profiles (see MachineResources), users can define more in settings.json
+RESOURCE_PROFILES = {
+    "small": {
+        "cpu_period": 100000,
+        "cpu_quota": 100000,
+        "mem_limit": 1 * GiB,
+        "memswap_limit": 2 * GiB,
+        "shm_size": 64 * MiB,
+        "tmpfs": {"/tmp": 256 * MiB, "/run": 64 * MiB, "/run/lock": 8 * MiB},
+    },
+    "medium": {
+        "cpu_period": 100000,
+        "cpu_quota": 200000,
+        "mem_limit": 4 * GiB,
+        "memswap_limit": 8 * GiB,
+        "shm_size": 256 * MiB,
+        "tmpfs": {"/tmp": 1 * GiB, "/run": 128 * MiB, "/run/lock": 8 * MiB},
+    },
+    "large": {
+        "cpu_period": 100000,
+        "cpu_quota": 400000,
+        "mem_limit": 8 * GiB,
+        "memswap_limit": 16 * GiB,
+        "shm_size": 1 * GiB,
+        "tmpfs": {"/tmp": 4 * GiB, "/run": 256 * MiB, "/run/lock": 8 * MiB},
+        "ulimits": {"nofile": [65536, 65536]},
+    },
+}
@@ -23,6 +23,11 @@ def get_runtime_schema(schema: str) -> dict:
     return _get_schema(schema_fpath)
 
 
+def get_settings_schema(schema: str) -> dict:
+    schema_fpath = os.path.join(_SCHEMAS_DIR, "settings.json", f"{schema}.json")
+    return _get_schema(schema_fpath)
+
+
 def get_index_schema(schema: str) -> dict:
     schema_fpath = os.path.join(_SCHEMAS_DIR, "index", f"{schema}.json")
     return _get_schema(schema_fpath)
@@ -31,5 +36,6 @@ def get_index_schema(schema: str) -> dict:
 __all__ = [
     "get_machine_schema",
     "get_runtime_schema",
+    "get_settings_schema",
     "get_index_schema"
 ]
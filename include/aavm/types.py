@@ -1,20 +1,24 @@
+import copy
 import dataclasses
 import json
 import os
+import shutil
+import time
 from abc import ABC, abstractmethod
 from pathlib import Path
 from types import SimpleNamespace
 from typing import List, Dict, Optional, Any, Union, ClassVar
 
 import jsonschema
-from docker.errors import NotFound
+from docker.errors import NotFound, APIError
 from docker.models.containers import Container
+from requests import RequestException
 
 from aavm.cli import aavmlogger
 from aavm.exceptions import AAVMException
-from aavm.schemas import get_machine_schema, get_runtime_schema
+from aavm.schemas import get_machine_schema, get_runtime_schema, get_settings_schema
 from aavm.utils.docker import sanitize_image_name, merge_container_configs, RUNNING_STATUSES
-from aavm.utils.misc import aavm_label
+from aavm.utils.misc import aavm_label, aavm_owner, compile_cpuset, needs_emulation
 from cpk import cpkconfig
 from cpk.machine import FromEnvMachine
 from cpk.types import Machine as CPKMachine, DockerImageName, DockerImageRegistry
@@ -50,6 +54,8 @@ class AAVMRuntime(ISerializable):
     metadata: RuntimeMetadata = dataclasses.field(default_factory=dict)
     downloaded: Optional[bool] = None
     official: bool = False
+    # digest of the image manifest published for this runtime (if known)
+    digest: Optional[str] = None
 
     _registry: ClassVar[Dict[str, 'AAVMRuntime']] = {}
 
@@ -58,7 +64,7 @@ class AAVMRuntime(ISerializable):
         self._registry[self.image.compile(allow_defaults=True)] = self
 
     def serialize(self) -> dict:
-        return {
+        data = {
             "schema": self.schema,
             "version": self.version,
             "description": self.description,
@@ -67,6 +73,9 @@ class AAVMRuntime(ISerializable):
             "metadata": self.metadata,
             "official": self.official
         }
+        if self.digest is not None:
+            data["digest"] = self.digest
+        return data
 
     @classmethod
     def deserialize(cls, data: dict) -> 'AAVMRuntime':
@@ -84,12 +93,28 @@ class AAVMRuntime(ISerializable):
             maintainer=data["maintainer"],
             configuration={},
             metadata=data.get("metadata", {}),
-            official=data.get("official", False)
+            official=data.get("official", False),
+            digest=data.get("digest", None)
         )
 
     @classmethod
-    def from_image_name(cls, image: str) -> 'AAVMRuntime':
+    def from_image_name(cls, image: str, arch: Optional[str] = None) -> 'AAVMRuntime':
         image = sanitize_image_name(image)
+        # prefer the variant of the runtime built for the given (native) architecture
+        if arch is not None:
+            name = DockerImageName.from_image_name(image)
+            if name.arch is not None and name.arch != arch:
+                image_arch, name.arch = name.arch, arch
+                try:
+                    runtime = cls.from_image_name(name.compile(allow_defaults=True))
+                    aavmlogger.info(f"Using the native variant '{runtime.image.compile()}' of "
+                                    f"the runtime '{image}'.")
+                    return runtime
+                except AAVMException:
+                    if needs_emulation(arch, image_arch):
+                        aavmlogger.warning(f"The runtime '{image}' is built for '{image_arch}' "
+                                           f"and has no variant for '{arch}', it will run "
+                                           f"under emulation (expect it to be much slower).")
         if image in cls._registry:
             return cls._registry[image]
         # (attempt to) load from disk
@@ -177,15 +202,126 @@ class AAVMRuntime(ISerializable):
             json.dump(self.configuration, fout, indent=4)
 
 
+@dataclasses.dataclass
+class IdlePolicy(ISerializable):
+    # what to do with an idle machine, either 'pause' or 'stop'
+    action: str = "pause"
+    # minutes the machine needs to be idle for before the action is taken
+    after: float = 30
+    # CPU usage (in percentage) below which a machine is considered idle
+    cpu: float = 1.0
+
+    def serialize(self) -> dict:
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def deserialize(cls, data: dict) -> 'IdlePolicy':
+        return IdlePolicy(**data)
+
+
+@dataclasses.dataclass
+class MachineResources(ISerializable):
+    cpu_quota: Optional[int] = None
+    cpu_period: Optional[int] = None
+    cpu_shares: Optional[int] = None
+    cpuset_cpus: Optional[str] = None
+    cpuset_mems: Optional[str] = None
+    # memory sizes are in bytes
+    mem_limit: Optional[int] = None
+    memswap_limit: Optional[int] = None
+    blkio_weight: Optional[int] = None
+    shm_size: Optional[int] = None
+    # size (in bytes) of the runtime's tmpfs mounts, e.g., {"/tmp": 536870912}
+    tmpfs: Dict[str, int] = dataclasses.field(default_factory=dict)
+    # ulimits as name -> [soft, hard], e.g., {"nofile": [1024, 4096]}
+    ulimits: Dict[str, List[int]] = dataclasses.field(default_factory=dict)
+
+    # resources that Docker can change on an existing container
+    UPDATABLE: ClassVar[List[str]] = [
+        "cpu_quota", "cpu_period", "cpu_shares", "cpuset_cpus", "cpuset_mems", "mem_limit",
+        "memswap_limit", "blkio_weight"
+    ]
+
+    @property
+    def empty(self) -> bool:
+        return self == MachineResources()
+
+    @property
+    def updatable(self) -> bool:
+        return all(k in self.UPDATABLE for k in self.defined())
+
+    def defined(self) -> Dict[str, Any]:
+        return {k: v for k, v in dataclasses.asdict(self).items() if v not in [None, {}]}
+
+    def update_config(self) -> Dict[str, Any]:
+        # arguments for docker.models.containers.Container.update()
+        return {k: v for k, v in self.defined().items() if k in self.UPDATABLE}
+
+    def apply(self, container_cfg: ContainerConfiguration):
+        # arguments for docker.containers.create()
+        container_cfg.update(self.update_config())
+        if self.shm_size is not None:
+            container_cfg["shm_size"] = self.shm_size
+        # tmpfs mounts, replace the 'size' option and keep all the others
+        tmpfs = container_cfg.get("tmpfs", {})
+        for path, size in self.tmpfs.items():
+            options = [o for o in tmpfs.get(path, "").split(",") if o and
+                       not o.startswith("size=")]
+            tmpfs[path] = ",".join(options + [f"size={size}"])
+        if tmpfs:
+            container_cfg["tmpfs"] = tmpfs
+        # ulimits
+        if self.ulimits:
+            container_cfg["ulimits"] = container_cfg.get("ulimits", []) + [
+                {"name": name, "soft": soft, "hard": hard}
+                for name, (soft, hard) in self.ulimits.items()
+            ]
+
+    def serialize(self) -> dict:
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def deserialize(cls, data: dict) -> 'MachineResources':
+        return MachineResources(**data)
+
+
+@dataclasses.dataclass
+class CPUSetAllocation(ISerializable):
+    cpus: List[int]
+    mems: List[int]
+    # either 'exclusive' (cores are not shared with other machines) or 'shared'
+    policy: str = "exclusive"
+
+    def serialize(self) -> dict:
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def deserialize(cls, data: dict) -> 'CPUSetAllocation':
+        return CPUSetAllocation(**data)
+
+
 @dataclasses.dataclass
 class MachineSettings(ISerializable):
     persistency: bool = False
+    idle: Optional[IdlePolicy] = None
+    profile: Optional[str] = None
+    resources: MachineResources = dataclasses.field(default_factory=MachineResources)
+    cpuset: Optional[CPUSetAllocation] = None
+    # how the CPK machine to run on is chosen, either 'pinned', 'spread' or 'binpack'
+    placement: str = "pinned"
 
     def serialize(self) -> dict:
         return dataclasses.asdict(self)
 
     @classmethod
     def deserialize(cls, data: dict) -> 'MachineSettings':
+        data = dict(data)
+        if data.get("idle", None) is not None:
+            data["idle"] = IdlePolicy.deserialize(data["idle"])
+        if "resources" in data:
+            data["resources"] = MachineResources.deserialize(data["resources"])
+        if data.get("cpuset", None) is not None:
+            data["cpuset"] = CPUSetAllocation.deserialize(data["cpuset"])
         return MachineSettings(**data)
 
 
@@ -193,12 +329,16 @@ class MachineSettings(ISerializable):
 class MachineLinks(ISerializable):
     machine: CPKMachine
     container: Optional[str]
+    image: Optional[str] = None
+    hibernated: bool = False
 
     def serialize(self) -> dict:
         return {
             "machine": self.machine.name if not isinstance(self.machine, FromEnvMachine)
             else None,
-            "container": self.container
+            "container": self.container,
+            "image": self.image,
+            "hibernated": self.hibernated
         }
 
     @classmethod
@@ -245,6 +385,16 @@ class AAVMMachine(ISerializable):
     def container_name(self) -> str:
         return f"aavm-machine-{self.name}"
 
+    @property
+    def snapshot_repository(self) -> str:
+        # docker repositories must be lowercase
+        return f"aavm-machine-{self.name.lower()}"
+
+    @property
+    def image(self) -> str:
+        # machines derived from a snapshot (e.g., clones) are based on that image
+        return self.links.image or self.runtime.image.compile()
+
     @property
     def machine(self) -> CPKMachine:
         return self.links.machine
@@ -272,8 +422,15 @@ class AAVMMachine(ISerializable):
             return False
         return container.status == "running"
 
+    @property
+    def hibernated(self) -> bool:
+        return self.links.hibernated
+
     @property
     def status(self) -> str:
+        # hibernated machines have no container, no need to ask Docker
+        if self.hibernated:
+            return "hibernated"
         container = self.container
         if container is None:
             return "down"
@@ -307,6 +464,107 @@ class AAVMMachine(ISerializable):
         #     # recreate empty root
         #     self.make_root()
 
+    def commit(self, tag: str) -> str:
+        container = self.container
+        if container is None:
+            raise AAVMException(f"Machine '{self.name}' does not have a container, "
+                                f"start it at least once before committing it.")
+        repository = self.snapshot_repository
+        # commit the container's writable layer to a new image
+        aavmlogger.debug(f"Committing container '{container.name}' to "
+                         f"'{repository}:{tag}'...")
+        container.commit(repository=repository, tag=tag)
+        aavmlogger.debug(f"Container '{container.name}' committed.")
+        # ---
+        return f"{repository}:{tag}"
+
+    def hibernate(self):
+        from aavm import aavmconfig
+        container = self.container
+        if container is None:
+            raise AAVMException(f"Machine '{self.name}' does not have a container, "
+                                f"there is nothing to hibernate.")
+        # stop the container (if needed)
+        if container.status in RUNNING_STATUSES:
+            aavmlogger.debug(f"Stopping container '{container.name}'...")
+            container.stop()
+            aavmlogger.debug(f"Container '{container.name}' stopped.")
+        # commit the state of the container to an image
+        previous = self.links.image
+        image = self.commit(tag=f"hibernated-{int(time.time())}")
+        # remove the container
+        aavmlogger.debug(f"Removing container '{container.name}'...")
+        container.remove()
+        aavmlogger.debug(f"Container '{container.name}' removed.")
+        # annotate that the machine now lives in the image
+        self._container = None
+        self.links.container = None
+        self.links.image = image
+        self.links.hibernated = True
+        self.to_disk()
+        # the previous snapshot of this machine (if any) is now superseded
+        if previous and previous.startswith(f"{self.snapshot_repository}:hibernated-"):
+            others = [m for m in aavmconfig.machines.values()
+                      if m.name != self.name and m.links.image == previous]
+            if not others:
+                aavmlogger.debug(f"Removing superseded snapshot '{previous}'...")
+                try:
+                    self.machine.get_client().images.remove(previous)
+                except (NotFound, APIError) as e:
+                    aavmlogger.debug(f"Snapshot '{previous}' could not be removed, "
+                                     f"the error reads:\n{str(e)}")
+
+    def remove(self, timeout: int = 2, force: bool = False):
+        from aavm import aavmconfig
+        # remove the container (and its anonymous volumes)
+        if self.links.machine is not None:
+            try:
+                client = self.machine.get_client()
+                container = None
+                # containers created outside of the machine's links go as well
+                for ref in filter(None, [self.links.container, self.container_name]):
+                    try:
+                        container = client.containers.get(ref)
+                        break
+                    except NotFound:
+                        continue
+                if container is not None:
+                    if container.status in RUNNING_STATUSES:
+                        aavmlogger.debug(f"Stopping container '{container.name}'...")
+                        container.stop(timeout=timeout)
+                    aavmlogger.debug(f"Removing container '{container.name}'...")
+                    container.remove(v=True, force=True)
+                    aavmlogger.debug(f"Container '{container.name}' removed.")
+                # snapshots of this machine nobody else is based on
+                image = self.links.image
+                if image and image.startswith(f"{self.snapshot_repository}:"):
+                    # (machines might be removed concurrently, iterate over a copy)
+                    others = [m for m in list(aavmconfig.machines.values())
+                              if m.name != self.name and m.links.image == image]
+                    if not others:
+                        aavmlogger.debug(f"Removing snapshot '{image}'...")
+                        try:
+                            client.images.remove(image)
+                        except (NotFound, APIError) as e:
+                            aavmlogger.debug(f"Snapshot '{image}' could not be removed, "
+                                             f"the error reads:\n{str(e)}")
+            except NotFound:
+                pass
+            except (APIError, RequestException) as e:
+                if not force:
+                    raise AAVMException(f"The container of the machine '{self.name}' could "
+                                        f"not be removed, the error reads:\n{str(e)}")
+        # move the machine out of the way first, a half-deleted machine is never visible
+        machine_dir = os.path.join(aavmconfig.path, "machines", self.name)
+        trash = os.path.join(os.path.dirname(machine_dir),
+                             f".{self.name}.removed-{os.getpid()}-{int(time.time() * 1000)}")
+        if os.path.isdir(machine_dir):
+            os.rename(machine_dir, trash)
+            shutil.rmtree(trash, ignore_errors=True)
+        aavmconfig.machines.pop(self.name, None)
+        self._container = None
+        self.links.container = None
+
     # def make_root(self, exist_ok: bool = False):
     #     os.makedirs(self.root, exist_ok=exist_ok)
 
@@ -314,14 +572,21 @@ class AAVMMachine(ISerializable):
         # collect configurations from runtime and machine definition
         runtime_cfg = self.runtime.configuration
         machine_cfg = self.configuration
-        container_cfg = merge_container_configs(runtime_cfg, machine_cfg)
-        # add image from the runtime to the container configutation
-        container_cfg["image"] = self.runtime.image.compile()
+        container_cfg = merge_container_configs(copy.deepcopy(runtime_cfg), machine_cfg)
+        # apply the machine's resource profile
+        self.settings.resources.apply(container_cfg)
+        # apply the machine's cpuset allocation (this takes precedence over the profile)
+        if self.settings.cpuset is not None:
+            container_cfg["cpuset_cpus"] = compile_cpuset(self.settings.cpuset.cpus)
+            container_cfg["cpuset_mems"] = compile_cpuset(self.settings.cpuset.mems)
+        # add image from the runtime (or the machine's snapshot) to the container configutation
+        container_cfg["image"] = self.image
         # define container's name
         container_cfg["name"] = self.container_name
-        # add self.name label
+        # add self.name and owner labels
         container_cfg["labels"] = {
-            aavm_label("machine.name"): self.name
+            aavm_label("machine.name"): self.name,
+            aavm_label("machine.owner"): aavm_owner()
         }
         # make a new container for this machine
         config_str = json.dumps(container_cfg, indent=4)
@@ -532,11 +797,83 @@ class AAVMMachine(ISerializable):
         return config
 
 
+@dataclasses.dataclass
+class AAVMSettings(ISerializable):
+    schema: str = "1.0"
+    # number of pre-created containers to keep ready for each runtime
+    pools: Dict[str, int] = dataclasses.field(default_factory=dict)
+    # user-defined resource profiles (on top of the built-in ones)
+    profiles: Dict[str, dict] = dataclasses.field(default_factory=dict)
+    # how much CPU and memory can be committed on an endpoint (1.0 means no overcommit)
+    overcommit: float = 1.0
+    # resources accounted for machines that run without limits
+    default_cpus: float = 0.5
+    default_memory: int = 512 * 1024 ** 2
+    # record metrics (command durations, pulls) for the metrics exporter
+    metrics: bool = False
+    # registry mirror (pull-through cache) runtimes are pulled through, e.g., 'lab.local:5000'
+    registry_mirror: Optional[str] = None
+    # pull from the upstream registry when the mirror fails
+    registry_fallback: bool = True
+    # URL of the runtimes index, e.g., the one served by 'aavm runtime serve'
+    runtimes_index: Optional[str] = None
+    # bandwidth budget (bytes per second) shared by the pulls, exports and syncs aavm makes
+    bandwidth: Optional[int] = None
+
+    def serialize(self) -> dict:
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def deserialize(cls, data: dict) -> 'AAVMSettings':
+        return AAVMSettings(**data)
+
+    def to_disk(self):
+        from aavm.config import aavmconfig
+        os.makedirs(aavmconfig.path, exist_ok=True)
+        settings_file = os.path.join(aavmconfig.path, "settings.json")
+        with open(settings_file, "wt") as fout:
+            json.dump(self.serialize(), fout, indent=4)
+
+    # noinspection DuplicatedCode
+    @classmethod
+    def from_disk(cls, path: str) -> 'AAVMSettings':
+        settings_file = os.path.join(path, "settings.json")
+        # no settings file means default settings
+        if not os.path.exists(settings_file):
+            return AAVMSettings()
+        # load settings file
+        try:
+            with open(settings_file, "rt") as fin:
+                data = json.load(fin)
+        except json.JSONDecodeError as e:
+            raise AAVMException(f"File '{settings_file}' is not a valid JSON file. "
+                                f"Error reads: {e}")
+        # make sure the object we loaded is a dictionary
+        if not isinstance(data, dict):
+            raise AAVMException(f"File '{settings_file}' must contain a JSON-serialized "
+                                f"dictionary.")
+        # validate data against its declared schema
+        schema = get_settings_schema(data.get("schema", "1.0"))
+        try:
+            jsonschema.validate(data, schema=schema)
+        except jsonschema.ValidationError as e:
+            raise AAVMException(str(e))
+        # ---
+        return cls.deserialize(data)
+
+
 @dataclasses.dataclass
 class AAVMConfiguration:
     path: str
 
     _machines: Dict[str, AAVMMachine] = dataclasses.field(init=False, default=None)
+    _settings: AAVMSettings = dataclasses.field(init=False, default=None)
+
+    @property
+    def settings(self) -> AAVMSettings:
+        if self._settings is None:
+            self._settings = AAVMSettings.from_disk(self.path)
+        return self._settings
 
     @property
     def machines(self) -> Dict[str, AAVMMachine]:
@@ -545,6 +882,10 @@ class AAVMConfiguration:
             self._machines = load_machines(os.path.join(self.path, "machines"))
         return self._machines
 
+    def reload(self):
+        self._machines = None
+        self._settings = None
+
 
 class AAVMContainer(Container):
     pass
@@ -0,0 +1,184 @@
+import dataclasses
+import io
+import json
+import os
+import re
+import tarfile
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from docker import DockerClient
+
+from aavm.utils.streams import IteratorReader, STREAM_CHUNK_SIZE
+
+# files that have no business being in a runtime image
+WASTE_PATTERNS = [
+    ("apt lists", re.compile(r"^var/lib/apt/lists/")),
+    ("apt cache", re.compile(r"^var/cache/apt/")),
+    ("pip cache", re.compile(r"^(root|home/[^/]+)/\.cache/pip/")),
+    ("temporary files", re.compile(r"^(var/)?tmp/")),
+]
+# bytes stored in a layer but deleted or overwritten by a later one
+SHADOWED = "deleted later"
+
+# members of an image archive smaller than this are checked for being JSON documents
+_DOCUMENT_MAX_SIZE = 1024 ** 2
+_COMPONENT_RE = re.compile(r"aavm-component-install\s+([\w.-]+)")
+
+# files (path -> size), whiteouts and opaque directories of a layer
+_Layer = Tuple[Dict[str, int], List[str], List[str]]
+
+
+@dataclasses.dataclass
+class LayerAudit:
+    created_by: str
+    size: int
+    component: Optional[str] = None
+    wasted: Dict[str, int] = dataclasses.field(default_factory=dict)
+
+    @property
+    def wasted_bytes(self) -> int:
+        return sum(self.wasted.values())
+
+    @property
+    def command(self) -> str:
+        command = re.sub(r"^(\|\d+ (\S+=\S* )*)?/bin/sh -c (#\(nop\) )?", "", self.created_by)
+        return " ".join(command.split())
+
+
+@dataclasses.dataclass
+class ImageAudit:
+    image: str
+    layers: List[LayerAudit]
+    scanned: bool
+
+    @property
+    def size(self) -> int:
+        return sum(layer.size for layer in self.layers)
+
+    @property
+    def wasted_bytes(self) -> int:
+        return sum(layer.wasted_bytes for layer in self.layers)
+
+    @property
+    def wasted(self) -> Dict[str, int]:
+        wasted = defaultdict(int)
+        for layer in self.layers:
+            for category, size in layer.wasted.items():
+                wasted[category] += size
+        return dict(wasted)
+
+    def components(self) -> Dict[Optional[str], Tuple[int, int, int]]:
+        # component -> (layers, size, wasted bytes)
+        components = {}
+        for layer in self.layers:
+            layers, size, wasted = components.get(layer.component, (0, 0, 0))
+            components[layer.component] = \
+                (layers + 1, size + layer.size, wasted + layer.wasted_bytes)
+        return components
+
+
+def component_of(created_by: str) -> Optional[str]:
+    match = _COMPONENT_RE.search(created_by)
+    return match.group(1) if match else None
+
+
+def waste_category(path: str) -> Optional[str]:
+    for category, pattern in WASTE_PATTERNS:
+        if pattern.match(path):
+            return category
+    return None
+
+
+def audit_history(client: DockerClient, image: str) -> ImageAudit:
+    # cheap: sizes and components only, the history does not tell what is in a layer
+    history = reversed(client.api.history(image))
+    layers = [
+        LayerAudit(created_by=entry["CreatedBy"], size=entry["Size"],
+                   component=component_of(entry["CreatedBy"]))
+        for entry in history if entry["Size"] > 0
+    ]
+    return ImageAudit(image=image, layers=layers, scanned=False)
+
+
+def audit_image(client: DockerClient, image: str) -> ImageAudit:
+    # stream the image archive (as in 'docker save') and look inside every layer
+    documents, scans = {}, {}
+    chunks = client.api.get_image(image, chunk_size=STREAM_CHUNK_SIZE)
+    with tarfile.open(fileobj=IteratorReader(chunks), mode="r|") as tar:
+        for member in tar:
+            if not member.isreg():
+                continue
+            fin = tar.extractfile(member)
+            # manifests and configs
+            if member.size <= _DOCUMENT_MAX_SIZE:
+                data = fin.read()
+                if data[:1] == b"{" or data[:1] == b"[":
+                    try:
+                        documents[member.name] = json.loads(data)
+                        continue
+                    except ValueError:
+                        pass
+                fin = io.BytesIO(data)
+            # layers
+            try:
+                scans[member.name] = (member.size, _scan_layer(fin))
+            except tarfile.TarError:
+                continue
+    if "manifest.json" not in documents:
+        raise ValueError(f"The archive of the image '{image}' has no manifest.")
+    manifest = documents["manifest.json"][0]
+    config = documents[manifest["Config"]]
+    # match the non-empty entries of the history with the layers (same order)
+    names = iter(manifest["Layers"])
+    layers, stack = [], []
+    for entry in config.get("history", []):
+        if entry.get("empty_layer", False):
+            continue
+        size, layer = scans.get(next(names, None), (0, ({}, [], [])))
+        created_by = entry.get("created_by", "")
+        layers.append(LayerAudit(created_by=created_by, size=size,
+                                 component=component_of(created_by)))
+        stack.append(layer)
+    for layer, wasted in zip(layers, _wasted(stack)):
+        layer.wasted = wasted
+    # ---
+    return ImageAudit(image=image, layers=layers, scanned=True)
+
+
+def _scan_layer(fileobj) -> _Layer:
+    files, whiteouts, opaque = {}, [], []
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+        for member in tar:
+            path = os.path.normpath(member.name).lstrip("/")
+            dirname, basename = os.path.split(path)
+            if basename == ".wh..wh..opq":
+                opaque.append(dirname)
+            elif basename.startswith(".wh."):
+                whiteouts.append(os.path.join(dirname, basename[4:]))
+            elif not member.isdir():
+                files[path] = member.size if member.isreg() else 0
+    return files, whiteouts, opaque
+
+
+def _wasted(layers: List[_Layer]) -> List[Dict[str, int]]:
+    wasted = [defaultdict(int) for _ in layers]
+    # path -> index of the layer holding the copy that is currently visible
+    owner = {}
+    for i, (files, whiteouts, opaque) in enumerate(layers):
+        removed = set(whiteouts).union(p for p in files if p in owner)
+        prefixes = tuple(f"{d}/" if d else "" for d in opaque + whiteouts)
+        if prefixes:
+            removed.update(p for p in owner if p.startswith(prefixes))
+        for path in removed:
+            j = owner.pop(path, None)
+            if j is not None and layers[j][0][path]:
+                wasted[j][waste_category(path) or SHADOWED] += layers[j][0][path]
+        owner.update((p, i) for p in files)
+    # caches that made it to the final filesystem
+    for path, j in owner.items():
+        category = waste_category(path)
+        if category is not None:
+            wasted[j][category] += layers[j][0][path]
+    # ---
+    return [{k: v for k, v in w.items() if v > 0} for w in wasted]
@@ -0,0 +1,155 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Union, Callable, Dict
+
+# the more important a transfer, the higher its priority
+PRIORITY_BACKGROUND = 0
+PRIORITY_NORMAL = 1
+PRIORITY_INTERACTIVE = 2
+
+Priority = Union[int, Callable[[], int]]
+
+# waiters not seen for this long (seconds) gave up (or died)
+WAITER_TTL = 2.0
+# how often waiters poll the bucket (seconds)
+POLL_INTERVAL = 0.1
+# transfers we cannot slow down (i.e., pulls) can put the bucket in debt, up to this many
+# seconds worth of budget
+MAX_DEBT_SECONDS = 10.0
+
+_waiters_count = 0
+_waiters_lock = threading.Lock()
+
+
+def _waiter_id() -> str:
+    global _waiters_count
+    with _waiters_lock:
+        _waiters_count += 1
+        return f"{os.getpid()}:{threading.get_ident()}:{_waiters_count}"
+
+
+def _priority(priority: Priority) -> int:
+    return priority() if callable(priority) else priority
+
+
+class TokenBucket:
+    # a token bucket shared by all the aavm processes (and threads) through a file in the
+    # config directory, one token is one byte
+
+    def __init__(self, rate: int, path: str):
+        from aavm.utils.streams import STREAM_CHUNK_SIZE
+        self.rate = rate
+        # at least a chunk has to fit in the bucket
+        self.burst = max(rate, STREAM_CHUNK_SIZE)
+        self._path = path
+
+    @contextmanager
+    def _locked(self) -> Iterator[dict]:
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        with open(f"{self._path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = self._read()
+                # refill
+                now = time.time()
+                elapsed = max(0.0, now - state["updated"])
+                state["tokens"] = min(self.burst, state["tokens"] + elapsed * self.rate)
+                state["updated"] = now
+                # forget about the waiters that went away
+                state["waiters"] = {k: w for k, w in state["waiters"].items()
+                                    if now - w["seen"] < WAITER_TTL}
+                yield state
+                tmp = f"{self._path}.{os.getpid()}.tmp"
+                with open(tmp, "wt") as fout:
+                    json.dump(state, fout)
+                os.replace(tmp, self._path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self) -> dict:
+        try:
+            with open(self._path, "rt") as fin:
+                state = json.load(fin)
+            return {
+                "tokens": float(state["tokens"]),
+                "updated": float(state["updated"]),
+                "waiters": dict(state.get("waiters", {})),
+            }
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError, ValueError):
+            return {"tokens": float(self.burst), "updated": time.time(), "waiters": {}}
+
+    def acquire(self, n: int, priority: Priority = PRIORITY_NORMAL):
+        # blocks until `n` bytes can be transferred, waiters with a higher priority go first
+        wid = _waiter_id()
+        while n > 0:
+            take = min(n, self.burst)
+            while True:
+                prio = _priority(priority)
+                with self._locked() as state:
+                    waiters: Dict[str, dict] = state["waiters"]
+                    ahead = any(w["priority"] > prio for k, w in waiters.items() if k != wid)
+                    if not ahead and state["tokens"] >= take:
+                        state["tokens"] -= take
+                        waiters.pop(wid, None)
+                        break
+                    waiters[wid] = {"priority": prio, "seen": time.time()}
+                    missing = max(0.0, take - state["tokens"])
+                time.sleep(min(POLL_INTERVAL, max(0.01, missing / self.rate)))
+            n -= take
+
+    def charge(self, n: int):
+        # accounts for bytes that were transferred without asking first
+        with self._locked() as state:
+            state["tokens"] = max(-self.rate * MAX_DEBT_SECONDS, state["tokens"] - n)
+
+
+def get_bucket() -> Optional[TokenBucket]:
+    from aavm import aavmconfig
+    rate = aavmconfig.settings.bandwidth
+    if not rate:
+        return None
+    return TokenBucket(rate, os.path.join(aavmconfig.path, "bandwidth", "bucket.json"))
+
+
+def shaped(chunks: Iterator[bytes], priority: Priority = PRIORITY_NORMAL) -> Iterator[bytes]:
+    # paces a stream of chunks to the bandwidth budget (if any)
+    bucket = get_bucket()
+    if bucket is None:
+        yield from chunks
+        return
+    for chunk in chunks:
+        bucket.acquire(len(chunk), priority)
+        yield chunk
+
+
+class PullShaper:
+    # the Docker engine downloads the layers, we cannot slow it down. Pulls wait for the
+    # budget before they start and what they download is charged to the bucket afterwards,
+    # so that other transfers (and the next pulls) back off while a pull is running.
+
+    def __init__(self, priority: Priority = PRIORITY_NORMAL):
+        self._bucket = get_bucket()
+        self._priority = priority
+        self._prepaid = 0
+        self._seen: Dict[str, int] = {}
+
+    def admit(self):
+        if self._bucket is None:
+            return
+        self._prepaid = self._bucket.burst
+        self._bucket.acquire(self._prepaid, self._priority)
+
+    def update(self, layer_id: str, current: int):
+        if self._bucket is None:
+            return
+        delta = max(0, current - self._seen.get(layer_id, 0))
+        self._seen[layer_id] = max(current, self._seen.get(layer_id, 0))
+        # the first bytes were paid for on admission
+        paid = min(self._prepaid, delta)
+        self._prepaid -= paid
+        if delta - paid > 0:
+            self._bucket.charge(delta - paid)
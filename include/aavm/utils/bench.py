@@ -0,0 +1,25 @@
+import time
+from typing import Tuple
+
+from docker import DockerClient
+
+# a CPU-bound loop that only needs a POSIX shell, emulation slows it down the most
+_WORKLOAD = 'i=0; while [ $i -lt {n} ]; do i=$((i+1)); done'
+
+
+def _timed_run(client: DockerClient, image: str, script: str) -> float:
+    stime = time.perf_counter()
+    client.containers.run(image, entrypoint=["/bin/sh", "-c"], command=[script], remove=True)
+    return time.perf_counter() - stime
+
+
+def benchmark_image(client: DockerClient, image: str, iterations: int = 200000,
+                    repeat: int = 3) -> Tuple[float, float]:
+    # returns the (best) time it takes to start a container and to run the workload in it
+    startup, workload = [], []
+    for _ in range(max(1, repeat)):
+        empty = _timed_run(client, image, "true")
+        full = _timed_run(client, image, _WORKLOAD.format(n=iterations))
+        startup.append(empty)
+        workload.append(max(0.0, full - empty))
+    return min(startup), min(workload)
@@ -0,0 +1,195 @@
+import dataclasses
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait, Future
+from typing import List, Dict, Optional, Tuple
+
+from aavm.cli import aavmlogger
+from aavm.exceptions import AAVMException
+
+_STEP_LINE = re.compile(r"^Step (\d+)/(\d+) : (.*)$")
+_CACHE_LINE = " ---> Using cache"
+
+# (project name, arch)
+BuildNode = Tuple[str, str]
+
+
+@dataclasses.dataclass
+class RuntimeProject:
+    name: str
+    path: str
+    # image produced by the project and image it is based on (both without arch)
+    image: str
+    base: str
+
+
+@dataclasses.dataclass
+class BuildStep:
+    index: int
+    instruction: str
+    duration: float = 0.0
+    cached: bool = False
+
+
+@dataclasses.dataclass
+class BuildReport:
+    project: str
+    arch: str
+    status: str = "pending"
+    duration: float = 0.0
+    steps: List[BuildStep] = dataclasses.field(default_factory=list)
+    log: Optional[str] = None
+
+    @property
+    def cache_hits(self) -> int:
+        return sum(s.cached for s in self.steps)
+
+    @property
+    def cache_rate(self) -> float:
+        return (self.cache_hits / len(self.steps)) if self.steps else 0.0
+
+
+def _dockerfile_args(dockerfile: str) -> Dict[str, str]:
+    args = {}
+    with open(dockerfile, "rt") as fin:
+        for line in fin:
+            match = re.match(r"^\s*ARG\s+([A-Z0-9_]+)=(\S+)\s*$", line)
+            if match:
+                args.setdefault(match.group(1), match.group(2).strip("\"'"))
+    return args
+
+
+def load_project(path: str) -> RuntimeProject:
+    project_file = os.path.join(path, "project.cpk")
+    dockerfile = os.path.join(path, "Dockerfile")
+    if not os.path.isfile(project_file) or not os.path.isfile(dockerfile):
+        raise AAVMException(f"Path '{path}' is not a runtime project.")
+    with open(project_file, "rt") as fin:
+        project = json.load(fin)
+    args = _dockerfile_args(dockerfile)
+    base = f"{args.get('BASE_ORGANIZATION', 'library')}/" \
+           f"{args.get('BASE_REPOSITORY', '')}:{args.get('BASE_TAG', 'latest')}"
+    return RuntimeProject(
+        name=os.path.basename(os.path.abspath(path)),
+        path=os.path.abspath(path),
+        image=f"{project['organization']}/{project['name']}:{project['tag']}",
+        base=base
+    )
+
+
+def load_projects(root: str) -> List[RuntimeProject]:
+    projects = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if os.path.isfile(os.path.join(path, "project.cpk")):
+            projects.append(load_project(path))
+    return projects
+
+
+def dependency_graph(projects: List[RuntimeProject]) -> Dict[str, List[str]]:
+    # project -> projects it is based on (through the BASE_* args of its Dockerfile)
+    by_image = {p.image: p.name for p in projects}
+    graph = {p.name: [by_image[p.base]] if p.base in by_image else [] for p in projects}
+    # detect cycles
+    state: Dict[str, int] = {}
+
+    def _visit(node: str):
+        if state.get(node) == 1:
+            raise AAVMException(f"Runtime projects have a circular dependency on '{node}'.")
+        if state.get(node) == 2:
+            return
+        state[node] = 1
+        for dep in graph[node]:
+            _visit(dep)
+        state[node] = 2
+
+    for n in graph:
+        _visit(n)
+    return graph
+
+
+def build_node(project: RuntimeProject, arch: str, report: BuildReport, log_dir: str,
+               extra: List[str]):
+    os.makedirs(log_dir, exist_ok=True)
+    report.log = os.path.join(log_dir, f"{project.name}-{arch}.log")
+    cmd = [sys.executable, "-m", "cpk.cli.main", "build", "-C", project.path, "-a", arch,
+           *extra]
+    aavmlogger.debug(f"Running: {' '.join(cmd)}")
+    stime = last = time.time()
+    step: Optional[BuildStep] = None
+    report.status = "building"
+    with open(report.log, "wt") as flog:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                universal_newlines=True, bufsize=1)
+        for line in proc.stdout:
+            flog.write(line)
+            now = time.time()
+            match = _STEP_LINE.match(line.strip())
+            if match:
+                # a new step starts, the previous one is over
+                if step is not None:
+                    step.duration = now - last
+                step = BuildStep(index=int(match.group(1)), instruction=match.group(3))
+                report.steps.append(step)
+                last = now
+            elif step is not None and line.startswith(_CACHE_LINE):
+                step.cached = True
+        proc.wait()
+    if step is not None:
+        step.duration = time.time() - last
+    report.duration = time.time() - stime
+    report.status = "done" if proc.returncode == 0 else "failed"
+
+
+def build_all(projects: List[RuntimeProject], archs: List[str], log_dir: str,
+              workers: int = 2, extra: Optional[List[str]] = None,
+              pull: Optional[List[str]] = None) -> List[BuildReport]:
+    graph = dependency_graph(projects)
+    by_name = {p.name: p for p in projects}
+    # only wait for bases that are part of this build
+    nodes: Dict[BuildNode, List[BuildNode]] = {
+        (p.name, arch): [(d, arch) for d in graph[p.name] if d in by_name]
+        for p in projects for arch in archs
+    }
+    reports = {node: BuildReport(project=node[0], arch=node[1]) for node in nodes}
+    running: Dict[Future, BuildNode] = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while True:
+            # schedule everything whose bases are built, skip whatever depends on a failure
+            for node, deps in nodes.items():
+                report = reports[node]
+                if report.status != "pending":
+                    continue
+                if any(reports[d].status in ["failed", "skipped"] for d in deps):
+                    report.status = "skipped"
+                    aavmlogger.warning(f"Skipping {node[0]} ({node[1]}), its base failed.")
+                elif all(reports[d].status == "done" for d in deps):
+                    aavmlogger.info(f"Building {node[0]} ({node[1]})...")
+                    report.status = "queued"
+                    # only the given projects pull their base image
+                    flags = (extra or []) + (["--pull"] if node[0] in (pull or []) else [])
+                    future = pool.submit(build_node, by_name[node[0]], node[1], report,
+                                         log_dir, flags)
+                    running[future] = node
+            if not running:
+                break
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                report = reports[node]
+                if future.exception() is not None:
+                    report.status = "failed"
+                    aavmlogger.error(f"Build of {node[0]} ({node[1]}) crashed, the error "
+                                     f"reads:\n{str(future.exception())}")
+                elif report.status == "failed":
+                    aavmlogger.error(f"Build of {node[0]} ({node[1]}) failed, see "
+                                     f"'{report.log}'.")
+                else:
+                    aavmlogger.info(f"Built {node[0]} ({node[1]}) in {report.duration:.1f}s, "
+                                    f"cache hits {report.cache_hits}/{len(report.steps)}.")
+    # ---
+    return list(reports.values())
@@ -0,0 +1,238 @@
+import collections
+import dataclasses
+import gzip
+import io
+import json
+import os
+import tarfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, BinaryIO, Optional, Dict
+
+import jsonschema
+from docker import DockerClient
+
+from aavm.exceptions import AAVMException
+from aavm.schemas import get_runtime_schema
+from aavm.types import AAVMRuntime
+from aavm.utils.bandwidth import shaped
+from aavm.utils.docker import save_images
+from aavm.utils.streams import produce, IteratorReader, STREAM_CHUNK_SIZE
+
+BUNDLE_VERSION = "1.0"
+BUNDLE_COMPRESSIONS = ["auto", "zstd", "gzip", "none"]
+# members of the bundle holding the runtime descriptors and the images
+BUNDLE_AAVM_DIR = "aavm"
+BUNDLE_IMAGES_DIR = "images"
+# size of the blocks compressed independently (and concurrently) by the gzip fallback
+GZIP_BLOCK_SIZE = 4 * 1024 ** 2
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+@dataclasses.dataclass
+class BundleReport:
+    runtimes: List[str]
+    compression: str
+    # uncompressed bytes of the images (shared layers are stored once)
+    images_bytes: int = 0
+    duration: float = 0.0
+
+
+def _zstandard():
+    # zstd is optional, 'pip install zstandard' to enable it
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def resolve_compression(compression: str) -> str:
+    if compression not in BUNDLE_COMPRESSIONS:
+        raise ValueError(f"Compression '{compression}' not supported. "
+                         f"Valid choices are: {', '.join(BUNDLE_COMPRESSIONS)}")
+    if compression in ["auto", "zstd"]:
+        if _zstandard() is not None:
+            return "zstd"
+        if compression == "zstd":
+            raise AAVMException("Compression 'zstd' needs the Python package 'zstandard', "
+                                "install it with 'pip3 install zstandard'.")
+        return "gzip"
+    return compression
+
+
+def _gzip_member(block: bytes, level: int) -> bytes:
+    # a complete gzip member (wbits=31), the header has no timestamp so that equal inputs give
+    # equal outputs (gzip.compress(..., mtime=0) needs Python 3.8)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(block) + compressor.flush()
+
+
+class ParallelGzipWriter(io.RawIOBase):
+    # compresses fixed-size blocks concurrently (zlib releases the GIL) and writes them, in
+    # order, as consecutive gzip members, any gzip reader decompresses them as a single stream
+
+    def __init__(self, fout: BinaryIO, level: int = 6, threads: Optional[int] = None):
+        super(ParallelGzipWriter, self).__init__()
+        self._fout = fout
+        self._level = level
+        self._threads = threads or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(max_workers=self._threads)
+        self._pending = collections.deque()
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        while len(self._buffer) >= GZIP_BLOCK_SIZE:
+            self._submit(bytes(self._buffer[:GZIP_BLOCK_SIZE]))
+            del self._buffer[:GZIP_BLOCK_SIZE]
+        return len(data)
+
+    def _submit(self, block: bytes):
+        self._pending.append(self._pool.submit(_gzip_member, block, self._level))
+        # keep memory bounded, a couple of blocks per thread in flight at most
+        while len(self._pending) > 2 * self._threads:
+            self._fout.write(self._pending.popleft().result())
+
+    def close(self):
+        if not self.closed:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._fout.write(self._pending.popleft().result())
+            self._pool.shutdown()
+        super(ParallelGzipWriter, self).close()
+
+
+def _compressor(fout: BinaryIO, compression: str, level: Optional[int],
+                threads: Optional[int]) -> BinaryIO:
+    if compression == "zstd":
+        # threads=-1 uses all the cores
+        cctx = _zstandard().ZstdCompressor(level=level or 3, threads=threads or -1)
+        return cctx.stream_writer(fout, closefd=False)
+    if compression == "gzip":
+        return ParallelGzipWriter(fout, level=level or 6, threads=threads)
+    return fout
+
+
+def _sniff(fin: io.BufferedReader) -> str:
+    magic = fin.peek(4)[:4]
+    if magic == _ZSTD_MAGIC:
+        return "zstd"
+    return "gzip" if magic[:2] == _GZIP_MAGIC else "none"
+
+
+def _decompressor(fin: io.BufferedReader, compression: str) -> BinaryIO:
+    if compression == "zstd":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise AAVMException("This bundle is compressed with zstd, install the Python "
+                                "package 'zstandard' with 'pip3 install zstandard'.")
+        return zstandard.ZstdDecompressor().stream_reader(fin, read_size=STREAM_CHUNK_SIZE)
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fin, mode="rb")
+    return fin
+
+
+def _add_json(tar: tarfile.TarFile, name: str, data):
+    content = json.dumps(data, indent=4).encode("utf-8")
+    info = tarfile.TarInfo(name)
+    info.size = len(content)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(content))
+
+
+def export_bundle(client: DockerClient, runtimes: List[AAVMRuntime], fout: BinaryIO,
+                  compression: str = "auto", level: Optional[int] = None,
+                  threads: Optional[int] = None) -> BundleReport:
+    stime = time.time()
+    compression = resolve_compression(compression)
+    images = sorted({r.image.compile() for r in runtimes})
+    report = BundleReport(runtimes=images, compression=compression)
+    zout = _compressor(fout, compression, level, threads)
+    with tarfile.open(fileobj=zout, mode="w|", bufsize=STREAM_CHUNK_SIZE) as tar:
+        # descriptors go first so that import knows what it is loading before the images
+        _add_json(tar, f"{BUNDLE_AAVM_DIR}/bundle.json", {
+            "version": BUNDLE_VERSION,
+            "created": int(stime),
+            "runtimes": images,
+        })
+        for runtime in runtimes:
+            prefix = f"{BUNDLE_AAVM_DIR}/runtimes/{runtime.image.compile(allow_defaults=True)}"
+            _add_json(tar, f"{prefix}/runtime.json", runtime.serialize())
+            _add_json(tar, f"{prefix}/configuration.json", runtime.configuration)
+        # re-stream the members of the images archive, nothing is staged on disk
+        chunks = shaped(save_images(client, images))
+        with tarfile.open(fileobj=IteratorReader(chunks), mode="r|") as tin:
+            for member in tin:
+                member.name = f"{BUNDLE_IMAGES_DIR}/{member.name}"
+                if member.islnk():
+                    member.linkname = f"{BUNDLE_IMAGES_DIR}/{member.linkname}"
+                tar.addfile(member, tin.extractfile(member) if member.isfile() else None)
+                report.images_bytes += member.size
+    if zout is not fout:
+        zout.close()
+    report.duration = time.time() - stime
+    # ---
+    return report
+
+
+def _load_runtime(data: dict, configuration: dict) -> AAVMRuntime:
+    # never trust descriptors coming from a file
+    try:
+        jsonschema.validate(data, schema=get_runtime_schema(data["schema"]))
+    except (KeyError, jsonschema.ValidationError) as e:
+        raise AAVMException(f"Invalid runtime descriptor in bundle, the error reads:\n{e}")
+    runtime = AAVMRuntime.deserialize(data)
+    runtime.configuration = configuration
+    return runtime
+
+
+def import_bundle(client: DockerClient, fin: BinaryIO) -> BundleReport:
+    stime = time.time()
+    if not isinstance(fin, io.BufferedReader):
+        fin = io.BufferedReader(fin, buffer_size=STREAM_CHUNK_SIZE)
+    compression = _sniff(fin)
+    zin = _decompressor(fin, compression)
+    documents: Dict[str, dict] = {}
+    report = BundleReport(runtimes=[], compression=compression)
+
+    # the images are re-packed on the fly into the archive 'images.load' expects
+    def _write(fout: BinaryIO):
+        with tarfile.open(fileobj=zin, mode="r|") as tin, \
+                tarfile.open(fileobj=fout, mode="w|", bufsize=STREAM_CHUNK_SIZE) as tout:
+            for member in tin:
+                root, _, name = member.name.partition("/")
+                if root == BUNDLE_AAVM_DIR and member.isfile():
+                    documents[name] = json.load(tin.extractfile(member))
+                elif root == BUNDLE_IMAGES_DIR and name:
+                    member.name = name
+                    if member.islnk():
+                        member.linkname = member.linkname.partition("/")[2]
+                    tout.addfile(member, tin.extractfile(member) if member.isfile() else None)
+                    report.images_bytes += member.size
+
+    for status in client.api.load_image(shaped(produce(_write))) or []:
+        if "error" in status:
+            raise AAVMException(f"The images could not be loaded, the error reads:\n"
+                                f"{status['error']}")
+    if "bundle.json" not in documents:
+        raise AAVMException("The given file is not a runtime bundle.")
+    # store the descriptors only once the images are in
+    for name, data in documents.items():
+        if not name.startswith("runtimes/") or not name.endswith("/runtime.json"):
+            continue
+        configuration = documents.get(name[:-len("runtime.json")] + "configuration.json", {})
+        runtime = _load_runtime(data, configuration)
+        runtime.to_disk()
+        report.runtimes.append(runtime.image.compile())
+    report.duration = time.time() - stime
+    # ---
+    return report
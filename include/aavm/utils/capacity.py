@@ -0,0 +1,149 @@
+import dataclasses
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Tuple, Optional, List
+
+from docker.errors import NotFound, DockerException
+from requests import RequestException
+
+from aavm.cli import aavmlogger
+from aavm.constants import ENDPOINT_INFO_CACHE_TTL
+from aavm.utils.misc import human_size, parse_cpuset
+from cpk.types import Machine
+
+# subset of `docker info` worth caching
+_INFO_KEYS = ["ID", "Name", "Architecture", "NCPU", "MemTotal", "ServerVersion"]
+
+
+@dataclasses.dataclass
+class EndpointUsage:
+    ncpus: int
+    memory: int
+    # resources committed to running machines
+    cpus: float = 0.0
+    committed_memory: int = 0
+    running: int = 0
+    overcommit: float = 1.0
+
+    @property
+    def available_cpus(self) -> float:
+        return self.ncpus * self.overcommit - self.cpus
+
+    @property
+    def available_memory(self) -> int:
+        return int(self.memory * self.overcommit) - self.committed_memory
+
+    def admits(self, cpus: float, memory: int) -> bool:
+        return cpus <= self.available_cpus and memory <= self.available_memory
+
+    def describe(self) -> str:
+        return f"{self.cpus:.2f}/{self.ncpus * self.overcommit:.2f} CPUs, " \
+               f"{human_size(self.committed_memory)}/" \
+               f"{human_size(self.memory * self.overcommit)} of memory"
+
+
+def get_info(machine: Machine, max_age: float = ENDPOINT_INFO_CACHE_TTL) -> Dict[str, Any]:
+    from aavm import aavmconfig
+    cache_dir = os.path.join(aavmconfig.path, "cache", "endpoints")
+    cache_file = os.path.join(cache_dir, f"{machine.name}.json")
+    # use the cached value if fresh enough
+    if os.path.isfile(cache_file) and time.time() - os.path.getmtime(cache_file) < max_age:
+        try:
+            with open(cache_file, "rt") as fin:
+                return json.load(fin)
+        except json.JSONDecodeError:
+            pass
+    # ask the endpoint
+    info = machine.get_client().info()
+    info = {k: info[k] for k in _INFO_KEYS if k in info}
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_file, "wt") as fout:
+        json.dump(info, fout, indent=4)
+    return info
+
+
+def host_config_demand(host_config: Dict[str, Any]) -> Tuple[Optional[float], Optional[int]]:
+    # CPUs and memory (in bytes) reserved by a container, None means unlimited
+    cpus = None
+    if host_config.get("NanoCpus"):
+        cpus = host_config["NanoCpus"] / 1e9
+    elif host_config.get("CpuQuota", 0) > 0:
+        cpus = host_config["CpuQuota"] / (host_config.get("CpuPeriod") or 100000)
+    elif host_config.get("CpusetCpus"):
+        cpus = float(len(parse_cpuset(host_config["CpusetCpus"])))
+    memory = host_config.get("Memory") or None
+    return cpus, memory
+
+
+def get_usage(machine: Machine, exclude: Optional[str] = None,
+              workers: int = 8) -> EndpointUsage:
+    from aavm import aavmconfig
+    settings = aavmconfig.settings
+    info = get_info(machine)
+    usage = EndpointUsage(ncpus=info["NCPU"], memory=info["MemTotal"],
+                          overcommit=settings.overcommit)
+    # one call to list all the running aavm containers on the endpoint
+    client = machine.get_client()
+    containers = [
+        c["Id"] for c in client.api.containers(filters={"name": "aavm-machine-"})
+        if c["Id"] != exclude
+    ]
+
+    def _demand(container_id: str) -> Tuple[float, int]:
+        try:
+            host_config = client.api.inspect_container(container_id)["HostConfig"]
+        except NotFound:
+            return 0.0, 0
+        cpus, memory = host_config_demand(host_config)
+        return (settings.default_cpus if cpus is None else cpus,
+                settings.default_memory if memory is None else memory)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for cpus, memory in pool.map(_demand, containers):
+            usage.cpus += cpus
+            usage.committed_memory += memory
+            usage.running += 1
+    # ---
+    return usage
+
+
+def gather_usage(machines: List[Machine], workers: int = 8) -> List[Optional[EndpointUsage]]:
+
+    def _usage(machine: Machine) -> Optional[EndpointUsage]:
+        try:
+            return get_usage(machine, workers=workers)
+        except (DockerException, RequestException, OSError) as e:
+            aavmlogger.warning(f"CPK machine '{machine.name}' is not reachable, "
+                               f"the error reads:\n{str(e)}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(machines)))) as pool:
+        return list(pool.map(_usage, machines))
+
+
+def container_demand(container) -> Tuple[float, int]:
+    from aavm import aavmconfig
+    settings = aavmconfig.settings
+    cpus, memory = host_config_demand(container.attrs.get("HostConfig", {}))
+    return (settings.default_cpus if cpus is None else cpus,
+            settings.default_memory if memory is None else memory)
+
+
+def admit(machine: Machine, container, wait: float = 0, interval: float = 5) -> bool:
+    # returns True if the container fits on the endpoint (waiting up to `wait` seconds)
+    cpus, memory = container_demand(container)
+    stop = time.time() + wait
+    while True:
+        usage = get_usage(machine, exclude=container.id)
+        if usage.admits(cpus, memory):
+            return True
+        if time.time() >= stop:
+            aavmlogger.error(f"Not enough capacity on the CPK machine '{machine.name}', the "
+                             f"machine needs {cpus:.2f} CPUs and {human_size(memory)} of "
+                             f"memory, committed: {usage.describe()}.")
+            return False
+        aavmlogger.info(f"Waiting for capacity on '{machine.name}' "
+                        f"(committed: {usage.describe()})...")
+        time.sleep(min(interval, max(0.0, stop - time.time())))
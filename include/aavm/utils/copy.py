@@ -0,0 +1,146 @@
+import dataclasses
+import os
+import posixpath
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple, BinaryIO, Callable
+
+from docker.errors import APIError, NotFound
+
+from aavm.exceptions import AAVMException
+from aavm.types import AAVMMachine
+from aavm.utils.docker import get_client
+from aavm.utils.idle import wake_machine
+from aavm.utils.streams import produce, IteratorReader, Tee, STREAM_CHUNK_SIZE
+
+COMPRESSIONS = ["auto", "none", "gzip"]
+
+
+@dataclasses.dataclass
+class CopyResult:
+    machine: str
+    bytes: int = 0
+    duration: float = 0.0
+    error: Optional[str] = None
+
+
+def split_target(path: str) -> Tuple[str, str]:
+    # 'dir/' -> ('dir', '') copies into 'dir', 'dir/name' -> ('dir', 'name') also renames
+    if path.endswith("/"):
+        return path.rstrip("/") or "/", ""
+    return posixpath.dirname(path) or "/", posixpath.basename(path)
+
+
+def _container_id(machine: AAVMMachine) -> str:
+    if machine.links.container is None or machine.hibernated:
+        raise AAVMException(f"Machine '{machine.name}' has no container.")
+    # paused containers cannot be read from/written to
+    wake_machine(machine, trigger="cp")
+    return machine.links.container
+
+
+def _rename(name: str, root: str, new_root: Optional[str]) -> str:
+    # replaces the top-level entry of an archive member
+    if not new_root:
+        return name
+    head, sep, rest = name.partition("/")
+    return new_root + sep + rest if head == root else name
+
+
+def tar_from_host(source: str, name: str, compression: str) -> Iterator[bytes]:
+    if not os.path.exists(source):
+        raise AAVMException(f"Path '{source}' does not exist.")
+
+    def _write(fout: BinaryIO):
+        mode = "w|gz" if compression == "gzip" else "w|"
+        with tarfile.open(fileobj=fout, mode=mode, bufsize=STREAM_CHUNK_SIZE) as tar:
+            tar.add(source, arcname=name)
+
+    return produce(_write)
+
+
+def tar_from_machine(machine: AAVMMachine, source: str, name: Optional[str],
+                     compression: str) -> Iterator[bytes]:
+    api = get_client(machine.machine).api
+    try:
+        chunks, _ = api.get_archive(_container_id(machine), source,
+                                    chunk_size=STREAM_CHUNK_SIZE)
+    except NotFound:
+        raise AAVMException(f"Path '{source}' not found in machine '{machine.name}'.")
+    root = posixpath.basename(source.rstrip("/"))
+    # nothing to rewrite, hand the daemon's tar stream over as-is
+    if (not name or name == root) and compression == "none":
+        return iter(chunks)
+
+    # re-pack the stream on the fly (renamed and/or compressed), no temporary files
+    def _write(fout: BinaryIO):
+        mode = "w|gz" if compression == "gzip" else "w|"
+        with tarfile.open(fileobj=IteratorReader(chunks), mode="r|") as tin, \
+                tarfile.open(fileobj=fout, mode=mode, bufsize=STREAM_CHUNK_SIZE) as tout:
+            for member in tin:
+                member.name = _rename(member.name, root, name)
+                tout.addfile(member, tin.extractfile(member) if member.isfile() else None)
+
+    return produce(_write)
+
+
+def extract_to_host(chunks: Iterator[bytes], source: str, destination: str):
+    directory, name = split_target(destination)
+    if os.path.isdir(destination):
+        directory, name = destination, ""
+    if not os.path.isdir(directory):
+        raise AAVMException(f"Directory '{directory}' does not exist.")
+    root = posixpath.basename(source.rstrip("/"))
+    base = os.path.realpath(directory)
+
+    def _inside(path: str) -> bool:
+        return os.path.commonpath([os.path.realpath(path), base]) == base
+
+    with tarfile.open(fileobj=IteratorReader(chunks), mode="r|") as tar:
+        for member in tar:
+            member.name = _rename(member.name, root, name)
+            # never trust paths coming from a machine
+            if not _inside(os.path.join(base, member.name)) or \
+                    (member.islnk() and not _inside(os.path.join(base, member.linkname))):
+                raise AAVMException(f"Refusing to extract '{member.name}' outside of "
+                                    f"'{directory}'.")
+            tar.extract(member, base, set_attrs=False)
+
+
+def copy_to_machines(source: Callable[[], Iterator[bytes]], machines: List[AAVMMachine],
+                     directory: str, workers: int = 16) -> List[CopyResult]:
+    # the stream is built once per batch of (up to) `workers` machines and fanned out to
+    # all the machines of the batch concurrently
+    results = []
+    for first in range(0, len(machines), max(1, workers)):
+        batch = machines[first:first + max(1, workers)]
+        tee = Tee(source(), len(batch))
+        with ThreadPoolExecutor(max_workers=len(batch)) as pool:
+            results += list(pool.map(lambda i: _copy(tee, i, batch[i], directory),
+                                     range(len(batch))))
+    return results
+
+
+def _copy(tee: Tee, i: int, machine: AAVMMachine, directory: str) -> CopyResult:
+    result = CopyResult(machine=machine.name)
+    stime = time.time()
+    try:
+        api = get_client(machine.machine).api
+        stream = tee.consumer(i)
+
+        def _counted():
+            for chunk in stream:
+                result.bytes += len(chunk)
+                yield chunk
+
+        if not api.put_archive(_container_id(machine), directory, _counted()):
+            result.error = "rejected by the daemon"
+    except (APIError, AAVMException) as e:
+        result.error = getattr(e, "explanation", None) or str(e)
+    finally:
+        tee.close(i)
+    result.duration = time.time() - stime
+    if result.error is None and tee.error is not None:
+        result.error = str(tee.error)
+    return result
@@ -0,0 +1,148 @@
+import dataclasses
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from aavm.cli import aavmlogger
+from aavm.exceptions import AAVMException
+from aavm.types import CPUSetAllocation
+from aavm.utils.misc import parse_cpuset
+from cpk.types import Machine
+
+# prints one line per NUMA node ('node <id> <cpulist>') and one per CPU ('cpu <id> <siblings>')
+_TOPOLOGY_SCRIPT = \
+    'for n in /sys/devices/system/node/node[0-9]*; do ' \
+    '  [ -f "$n/cpulist" ] && echo "node ${n##*/node} $(cat $n/cpulist)"; ' \
+    'done; ' \
+    'for c in /sys/devices/system/cpu/cpu[0-9]*; do ' \
+    '  [ -f "$c/topology/thread_siblings_list" ] && ' \
+    '    echo "cpu ${c##*/cpu} $(cat $c/topology/thread_siblings_list)"; ' \
+    'done; ' \
+    'true'
+
+
+@dataclasses.dataclass
+class HostTopology:
+    # NUMA node -> CPUs
+    nodes: Dict[int, List[int]]
+    # CPU -> hardware threads sharing the same physical core (itself included)
+    siblings: Dict[int, List[int]]
+
+    @property
+    def cpus(self) -> List[int]:
+        return sorted(c for cpus in self.nodes.values() for c in cpus)
+
+    def node_of(self, cpu: int) -> int:
+        for node, cpus in self.nodes.items():
+            if cpu in cpus:
+                return node
+        raise KeyError(cpu)
+
+    def cores(self, node: int) -> List[List[int]]:
+        # group the CPUs of a node by physical core
+        cores, seen = [], set()
+        for cpu in sorted(self.nodes[node]):
+            if cpu in seen:
+                continue
+            core = [c for c in self.siblings.get(cpu, [cpu]) if c in self.nodes[node]]
+            seen.update(core)
+            cores.append(sorted(core))
+        return cores
+
+    @classmethod
+    def parse(cls, output: str, ncpus: int) -> 'HostTopology':
+        nodes, siblings = {}, {}
+        for line in output.splitlines():
+            kind, _, rest = line.strip().partition(" ")
+            key, _, cpulist = rest.partition(" ")
+            if kind == "node" and cpulist:
+                nodes[int(key)] = parse_cpuset(cpulist)
+            elif kind == "cpu" and cpulist:
+                siblings[int(key)] = parse_cpuset(cpulist)
+        # hosts without NUMA information have a single node with all the CPUs
+        if not nodes:
+            nodes = {0: list(range(ncpus))}
+        return HostTopology(nodes=nodes, siblings=siblings)
+
+
+def read_topology(machine: Machine) -> HostTopology:
+    client = machine.get_client()
+    ncpus = client.info()["NCPU"]
+    if machine.is_local:
+        output = subprocess.check_output(["sh", "-c", _TOPOLOGY_SCRIPT]).decode("utf-8")
+    else:
+        # sysfs inside a container shows the host's topology
+        aavmlogger.debug(f"Reading CPU topology of '{machine.name}' through a container...")
+        output = client.containers.run(
+            image="alpine",
+            command=["sh", "-c", _TOPOLOGY_SCRIPT],
+            remove=True
+        ).decode("utf-8")
+    return HostTopology.parse(output, ncpus)
+
+
+def get_allocations(cpk_machine: Machine, exclude: Optional[str] = None) -> \
+        Dict[str, CPUSetAllocation]:
+    from aavm import aavmconfig
+    return {
+        m.name: m.settings.cpuset for m in aavmconfig.machines.values()
+        if m.settings.cpuset is not None and m.machine == cpk_machine and m.name != exclude
+    }
+
+
+def get_usage(allocations: Dict[str, CPUSetAllocation]) -> Dict[int, List[str]]:
+    usage = defaultdict(list)
+    for name, allocation in allocations.items():
+        for cpu in allocation.cpus:
+            usage[cpu].append(name)
+    return usage
+
+
+def allocate(topology: HostTopology, allocations: Dict[str, CPUSetAllocation], ncpus: int,
+             policy: str = "exclusive") -> CPUSetAllocation:
+    usage = get_usage(allocations)
+    if ncpus > len(topology.cpus):
+        raise AAVMException(f"Requested {ncpus} CPUs but the host only has "
+                            f"{len(topology.cpus)}.")
+    # exclusive machines own whole physical cores, the siblings of their CPUs are not handed
+    # out to anybody else (even when the machine does not use them)
+    owned = {s for n, a in allocations.items() if a.policy == "exclusive"
+             for c in a.cpus for s in topology.siblings.get(c, [c])}
+    # exclusive machines get cores nobody else uses, shared machines can use any CPU that
+    # is not owned by an exclusive machine
+    taken = owned if policy == "shared" else set(usage) | owned
+
+    def candidates(node: int) -> List[int]:
+        # CPUs of a node, whole free physical cores first, then the least used ones (exclusive
+        # machines only get whole free cores)
+        if policy == "exclusive":
+            cores = [core for core in topology.cores(node) if not taken.intersection(core)]
+        else:
+            cores = [[c for c in core if c not in taken] for core in topology.cores(node)]
+        cores = [core for core in cores if core]
+        cores.sort(key=lambda core: (sum(len(usage[c]) for c in core),
+                                     -len(core), core[0]))
+        return [c for core in cores for c in core]
+
+    per_node = {node: candidates(node) for node in topology.nodes}
+    fitting = [node for node, cpus in per_node.items() if len(cpus) >= ncpus]
+    if fitting:
+        # exclusive: best-fit node (fewest free CPUs), shared: least loaded node
+        if policy == "exclusive":
+            node = min(fitting, key=lambda n: (len(per_node[n]), n))
+        else:
+            node = min(fitting, key=lambda n: (
+                sum(len(usage[c]) for c in topology.nodes[n]) / len(topology.nodes[n]), n))
+        cpus = per_node[node][:ncpus]
+    else:
+        # span multiple nodes, starting from the ones with more room
+        cpus = []
+        for node in sorted(per_node, key=lambda n: -len(per_node[n])):
+            cpus += per_node[node][:ncpus - len(cpus)]
+        if len(cpus) < ncpus:
+            raise AAVMException(f"Not enough free CPUs on the host, requested {ncpus}, "
+                                f"available {len(cpus)}.")
+    mems = sorted({topology.node_of(c) for c in cpus})
+    # ---
+    return CPUSetAllocation(cpus=sorted(cpus), mems=mems, policy=policy)
+
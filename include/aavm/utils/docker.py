@@ -1,6 +1,17 @@
+import inspect
+import struct
+import threading
+import time
+from typing import Dict, Optional, Callable, List, Iterator, Tuple
+
 from docker import DockerClient
+from docker.errors import APIError
+from docker.utils import version_lt
+from requests import RequestException
 
+from aavm.exceptions import AAVMException
 from aavm.utils.progress_bar import ProgressBar
+from aavm.utils.streams import STREAM_CHUNK_SIZE
 from cpk.types import Machine, DockerImageName
 
 ALL_STATUSES = [
@@ -15,27 +26,107 @@ UNSTABLE_STATUSES = [
 RUNNING_STATUSES = [
     "running", "paused"
 ]
+# saving multiple images with a single request needs at least this Docker API version
+SAVE_IMAGES_MIN_API_VERSION = "1.23"
+# one-shot stats (no wait for a second sample) need at least this Docker API version
+ONE_SHOT_STATS_MIN_API_VERSION = "1.41"
+# header of a frame of the Docker multiplexed stream: stream type (1 byte), 3 bytes of
+# padding, payload size (4 bytes, big endian)
+FRAME_HEADER = struct.Struct(">BxxxL")
+STDOUT, STDERR = 1, 2
+
+
+# one client (and connection pool) per CPK machine, shared by the threads of a process
+_clients: Dict[str, DockerClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(machine: Machine) -> DockerClient:
+    key = f"{machine.name}@{machine.base_url}"
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = machine.get_client()
+        return _clients[key]
+
+
+def tag_image(client: DockerClient, source: str, image: str):
+    # 'org/repo:tag' -> repository 'org/repo' and tag 'tag' (registries can have a port)
+    repository, tag = image, None
+    if ":" in image.rsplit("/", 1)[-1]:
+        repository, tag = image.rsplit(":", 1)
+    client.api.tag(source, repository, tag)
+
+
+def pull_image(machine: Machine, image: str, progress: bool = True,
+               callback: Optional[Callable[[float], None]] = None, priority=None):
+    from aavm import aavmconfig
+    from aavm.cli import aavmlogger
+    from aavm.utils.bandwidth import PullShaper, PRIORITY_NORMAL
+    from aavm.utils.mirror import mirror_image
+    settings = aavmconfig.settings
+    # wait for our turn within the bandwidth budget (if any)
+    shaper = PullShaper(PRIORITY_NORMAL if priority is None else priority)
+    shaper.admit()
+    mirrored = mirror_image(image, settings.registry_mirror) \
+        if settings.registry_mirror else None
+    if mirrored is not None:
+        client: DockerClient = machine.get_client()
+        try:
+            aavmlogger.debug(f"Pulling '{image}' through the mirror as '{mirrored}'...")
+            _pull(machine, mirrored, progress, labels={"runtime": image, "source": "mirror"},
+                  callback=callback, shaper=shaper)
+            # the image is known by its upstream name, the mirror's name stays, dropping it
+            # would drop the digest the image was pulled by (see registry.local_digests)
+            tag_image(client, mirrored, image)
+            return
+        except (APIError, RequestException) as e:
+            if not settings.registry_fallback:
+                raise
+            aavmlogger.warning(f"Image '{image}' could not be pulled through the mirror "
+                               f"'{settings.registry_mirror}', pulling it from the upstream "
+                               f"registry instead. The error reads:\n{str(e)}")
+    _pull(machine, image, progress, labels={"runtime": image, "source": "upstream"},
+          callback=callback, shaper=shaper)
 
 
 # noinspection DuplicatedCode
-def pull_image(machine: Machine, image: str, progress: bool = True):
+def _pull(machine: Machine, image: str, progress: bool, labels: Dict[str, str],
+          callback: Optional[Callable[[float], None]] = None, shaper=None):
+    from aavm.utils.metrics import record
     client: DockerClient = machine.get_client()
     layers = set()
     pulled = set()
+    # size of the layers that were actually downloaded
+    downloaded: Dict[str, int] = {}
+    stime = time.time()
     pbar = ProgressBar() if progress else None
     for line in client.api.pull(image, stream=True, decode=True):
+        # errors (e.g., unknown manifest) come through the stream
+        if "error" in line:
+            raise APIError(line["error"])
         if "id" not in line or "status" not in line:
             continue
         layer_id = line["id"]
         layers.add(layer_id)
         if line["status"] in ["Already exists", "Pull complete"]:
             pulled.add(layer_id)
+        if line["status"] == "Downloading":
+            detail = line.get("progressDetail", None) or {}
+            downloaded[layer_id] = detail.get("total", 0)
+            if shaper is not None:
+                shaper.update(layer_id, detail.get("current", 0))
         # update progress bar
+        percentage = max(0.0, min(1.0, len(pulled) / max(1.0, len(layers)))) * 100.0
         if progress:
-            percentage = max(0.0, min(1.0, len(pulled) / max(1.0, len(layers)))) * 100.0
             pbar.update(percentage)
+        if callback is not None:
+            callback(percentage)
     if progress:
         pbar.done()
+    # ---
+    labels = {**labels, "endpoint": machine.name}
+    record(counters={"aavm_pull_bytes_total": (labels, sum(downloaded.values()))},
+           observations={"aavm_pull_duration_seconds": (labels, time.time() - stime)})
 
 
 def remove_image(machine: Machine, image: str):
@@ -43,6 +134,82 @@ def remove_image(machine: Machine, image: str):
     client.images.remove(image)
 
 
+def save_images(client: DockerClient, images: List[str]) -> Iterator[bytes]:
+    # a single archive for all the images, layers shared between them are stored once
+    api = client.api
+    if len(images) == 1:
+        return api.get_image(images[0], chunk_size=STREAM_CHUNK_SIZE)
+    if version_lt(api.api_version, SAVE_IMAGES_MIN_API_VERSION):
+        raise AAVMException(f"Saving multiple images at once requires Docker API "
+                            f"{SAVE_IMAGES_MIN_API_VERSION} or newer, the endpoint "
+                            f"speaks {api.api_version}.")
+    # NOTE: the Docker SDK only saves one image at a time (APIClient.get_image), this is
+    #       the same request with multiple names, the only place the SDK internals are used
+    res = api._get(api._url("/images/get"), params={"names": images}, stream=True)
+    return api._stream_raw_result(res, chunk_size=STREAM_CHUNK_SIZE, decode=False)
+
+
+def supports_one_shot_stats(client: DockerClient) -> bool:
+    # the SDK has 'one_shot' since docker-py 6 (we support older ones), the daemon since 1.41
+    api = client.api
+    return "one_shot" in inspect.signature(api.stats).parameters and \
+        not version_lt(api.api_version, ONE_SHOT_STATS_MIN_API_VERSION)
+
+
+def _read_exactly(raw, view: memoryview) -> bool:
+    # fills `view` from the response, returns False if the stream ends first
+    filled = 0
+    while filled < len(view):
+        n = raw.readinto(view[filled:])
+        if not n:
+            return False
+        filled += n
+    return True
+
+
+def container_logs(client: DockerClient, container: str, tty: bool = False,
+                   follow: bool = False, timestamps: bool = False, tail: Optional[int] = None,
+                   since: Optional[float] = None) -> Iterator[Tuple[int, bytes]]:
+    # (stream, data) pairs, containers with a TTY only have stdout
+    api = client.api
+    params = {"stdout": 1, "stderr": 1, "follow": int(follow), "timestamps": int(timestamps),
+              "tail": "all" if tail is None else str(tail)}
+    if since is not None:
+        params["since"] = since
+    # NOTE: APIClient.logs() demultiplexes the frames but drops the stream they come from, this
+    #       is the same request with the frames read as they are, the only place the SDK
+    #       internals are used for logs
+    res = api._get(api._url("/containers/{0}/logs", container), params=params, stream=True)
+    api._raise_for_status(res)
+    if follow:
+        # the logs can be quiet for longer than the client's timeout
+        api._disable_socket_timeout(api._get_raw_response_socket(res))
+    raw = res.raw
+    buffer = bytearray(64 * 1024)
+    try:
+        if tty:
+            view = memoryview(buffer)
+            while True:
+                n = raw.readinto(view)
+                if not n:
+                    return
+                yield STDOUT, bytes(view[:n])
+        # demultiplex frames, the header and the payloads are read into reusable buffers
+        header = bytearray(FRAME_HEADER.size)
+        header_view = memoryview(header)
+        while _read_exactly(raw, header_view):
+            stream, size = FRAME_HEADER.unpack_from(header)
+            if size > len(buffer):
+                buffer = bytearray(size)
+            view = memoryview(buffer)[:size]
+            if not _read_exactly(raw, view):
+                return
+            # this is the only copy, one per frame, the buffer is reused by the next frame
+            yield stream, bytes(view)
+    finally:
+        res.close()
+
+
 def merge_container_configs(*args) -> dict:
     out = {}
     for arg in args:
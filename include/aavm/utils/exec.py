@@ -0,0 +1,123 @@
+import dataclasses
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict
+
+from docker.errors import APIError, NotFound, DockerException
+from requests import RequestException
+
+from aavm.cli import aavmlogger
+from aavm.exceptions import AAVMException
+from aavm.types import AAVMMachine
+from aavm.utils.docker import get_client, RUNNING_STATUSES
+from aavm.utils.idle import wake_machine
+from aavm.utils.logs import LogPrinter, STDOUT, STDERR, LOGS_QUEUE_SIZE
+
+
+@dataclasses.dataclass
+class ExecResult:
+    machine: str
+    exit_code: Optional[int] = None
+    duration: float = 0.0
+    error: Optional[str] = None
+    stdout: Optional[str] = None
+    stderr: Optional[str] = None
+
+    def serialize(self) -> dict:
+        return {k: v for k, v in dataclasses.asdict(self).items()
+                if k not in ["stdout", "stderr"] or v is not None}
+
+
+def exec_on_machine(machine: AAVMMachine, command: List[str], out: Optional[queue.Queue],
+                    user: str = "", workdir: Optional[str] = None,
+                    environment: Optional[Dict[str, str]] = None) -> ExecResult:
+    # output is streamed to `out` (if given) or captured
+    result = ExecResult(machine=machine.name)
+    stdout, stderr = [], []
+    stime = time.time()
+    try:
+        if machine.links.container is None or machine.hibernated:
+            raise NotFound("the machine has no container")
+        api = get_client(machine.machine).api
+        state = api.inspect_container(machine.links.container)["State"]
+        if state.get("Paused", False):
+            wake_machine(machine, trigger="exec")
+        elif not state.get("Running", False):
+            raise APIError("the machine is not running")
+        exec_id = api.exec_create(machine.links.container, command, stdout=True, stderr=True,
+                                  user=user, workdir=workdir, environment=environment)["Id"]
+        for chunk_out, chunk_err in api.exec_start(exec_id, stream=True, demux=True):
+            for stream, chunk, captured in [(STDOUT, chunk_out, stdout),
+                                            (STDERR, chunk_err, stderr)]:
+                if not chunk:
+                    continue
+                if out is not None:
+                    out.put((machine.name, stream, chunk))
+                else:
+                    captured.append(chunk)
+        result.exit_code = api.exec_inspect(exec_id)["ExitCode"]
+    except (DockerException, RequestException, AAVMException) as e:
+        result.error = e.explanation if getattr(e, "explanation", None) else str(e)
+    result.duration = time.time() - stime
+    if out is None:
+        result.stdout = b"".join(stdout).decode("utf-8", errors="replace")
+        result.stderr = b"".join(stderr).decode("utf-8", errors="replace")
+    # ---
+    return result
+
+
+def running_machines(machines: List[AAVMMachine], workers: int = 8) -> List[AAVMMachine]:
+    # paused machines count as running, exec wakes them up
+    endpoints: Dict[str, List[AAVMMachine]] = {}
+    for machine in machines:
+        if machine.links.container is not None and not machine.hibernated:
+            endpoints.setdefault(machine.machine.name, []).append(machine)
+
+    # one listing per endpoint instead of one inspection per machine
+    def _running(group: List[AAVMMachine]) -> List[AAVMMachine]:
+        endpoint = group[0].machine
+        try:
+            containers = get_client(endpoint).api.containers(
+                filters={"status": RUNNING_STATUSES})
+        except (DockerException, RequestException) as e:
+            aavmlogger.warning(f"CPK machine '{endpoint.name}' is not reachable, "
+                               f"the error reads:\n{str(e)}")
+            return []
+        ids = [c["Id"] for c in containers]
+        return [m for m in group if any(i.startswith(m.links.container) for i in ids)]
+
+    groups = list(endpoints.values())
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(groups)))) as pool:
+        running = {id(m) for found in pool.map(_running, groups) for m in found}
+    # ---
+    return [m for m in machines if id(m) in running]
+
+
+def exec_on_machines(machines: List[AAVMMachine], command: List[str], workers: int = 8,
+                     stream: bool = True, **kwargs) -> List[ExecResult]:
+    chunks: Optional[queue.Queue] = queue.Queue(maxsize=LOGS_QUEUE_SIZE) if stream else None
+    printer = LogPrinter([m.name for m in machines], prefix=True)
+
+    def _run(machine: AAVMMachine) -> ExecResult:
+        # one machine failing does not stop the others
+        # noinspection PyBroadException
+        try:
+            return exec_on_machine(machine, command, chunks, **kwargs)
+        except Exception as e:
+            return ExecResult(machine=machine.name, error=str(e))
+        finally:
+            if chunks is not None:
+                chunks.put((machine.name, STDOUT, None))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(machines)))) as pool:
+        futures = [pool.submit(_run, m) for m in machines]
+        # print the output of all the machines as it comes (bounded queue, backpressure)
+        running = len(machines) if stream else 0
+        while running > 0:
+            name, kind, data = chunks.get()
+            if data is None:
+                running -= 1
+                continue
+            printer.write(name, kind, data)
+        return [f.result() for f in futures]
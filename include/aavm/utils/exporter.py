@@ -0,0 +1,317 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, List, Optional, Tuple, Any
+
+from docker.errors import DockerException
+from requests import RequestException
+
+from aavm.cli import aavmlogger
+from aavm.utils.docker import supports_one_shot_stats
+from aavm.utils.metrics import MetricsRegistry, HISTOGRAM_BUCKETS, read_journal, Labels
+from aavm.utils.misc import aavm_label, ThreadingHTTPServer
+from aavm.utils.stats import memory_usage, network_bytes, block_bytes
+from cpk.types import Machine
+
+CONTAINER_NAME_PREFIX = "aavm-machine-"
+
+# re-inspect containers at least this often (seconds), even if their state did not change
+INSPECT_MAX_AGE = 300
+
+_HELP = {
+    "aavm_machine_info": ("gauge", "Static information about a machine"),
+    "aavm_machine_state": ("gauge", "State of the machine's container (1 for the current one)"),
+    "aavm_machine_up": ("gauge", "Whether the machine is running"),
+    "aavm_machine_start_time_seconds": ("gauge", "When the machine was last started"),
+    "aavm_machine_uptime_seconds": ("gauge", "Seconds since the machine was last started"),
+    "aavm_machine_restarts_total": ("counter", "Restarts of the machine's container"),
+    "aavm_machine_cpu_seconds_total": ("counter", "CPU time consumed by the machine"),
+    "aavm_machine_memory_bytes": ("gauge", "Memory used by the machine (without page cache)"),
+    "aavm_machine_memory_limit_bytes": ("gauge", "Memory available to the machine"),
+    "aavm_machine_network_receive_bytes_total": ("counter", "Bytes received by the machine"),
+    "aavm_machine_network_transmit_bytes_total": ("counter", "Bytes sent by the machine"),
+    "aavm_machine_block_read_bytes_total": ("counter", "Bytes read from block devices"),
+    "aavm_machine_block_write_bytes_total": ("counter", "Bytes written to block devices"),
+    "aavm_endpoint_up": ("gauge", "Whether the CPK machine (Docker endpoint) is reachable"),
+    "aavm_docker_api_duration_seconds": ("histogram", "Latency of the Docker API calls"),
+    "aavm_pull_duration_seconds": ("histogram", "Duration of the runtime pulls"),
+    "aavm_pull_bytes_total": ("counter", "Bytes downloaded by the runtime pulls"),
+    "aavm_command_duration_seconds": ("histogram", "Duration of the aavm CLI commands"),
+    "aavm_exporter_collect_duration_seconds": ("gauge", "Duration of the last collection"),
+    "aavm_exporter_collect_timestamp_seconds": ("gauge", "When the last collection finished"),
+}
+
+
+def parse_docker_time(value: str) -> Optional[float]:
+    # e.g., 2021-04-01T10:12:13.123456789Z (Python only handles microseconds)
+    if not value or value.startswith("0001-"):
+        return None
+    value = value.rstrip("Z")
+    seconds, _, fraction = value.partition(".")
+    stamp = datetime.strptime(seconds, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+    return stamp.timestamp() + (float(f"0.{fraction}") if fraction else 0.0)
+
+
+def machine_name_of(container: Dict[str, Any]) -> str:
+    labels = container.get("Labels", None) or {}
+    name = labels.get(aavm_label("machine.name"), None)
+    if name:
+        return name
+    # containers claimed from a pool do not carry the label (labels are immutable)
+    cname = (container.get("Names", None) or ["/"])[0].lstrip("/")
+    return cname[len(CONTAINER_NAME_PREFIX):] if cname.startswith(CONTAINER_NAME_PREFIX) \
+        else cname
+
+
+class Sample:
+
+    def __init__(self):
+        self.gauges: List[Tuple[str, Labels, float]] = []
+        self.registry = MetricsRegistry()
+
+    def gauge(self, name: str, labels: Labels, value: float):
+        self.gauges.append((name, labels, value))
+
+
+class MetricsCollector:
+
+    def __init__(self, ttl: float = 15, workers: int = 16):
+        self._ttl = ttl
+        self._workers = workers
+        self._lock = threading.Lock()
+        self._text: Optional[str] = None
+        self._collected: float = 0
+        self._background: Optional[threading.Thread] = None
+        # docker API latencies measured by the exporter itself
+        self._api = MetricsRegistry()
+        self._api_lock = threading.Lock()
+        # container ID -> (endpoint, state, inspected at, inspect data)
+        self._inspects: Dict[str, Tuple[str, str, float, dict]] = {}
+
+    def start(self):
+        # collect every `ttl` seconds in the background, scrapes get the last snapshot and never
+        # wait for Docker (except for the very first one)
+        self._background = threading.Thread(target=self._loop, daemon=True)
+        self._background.start()
+
+    def _loop(self):
+        while True:
+            stime = time.time()
+            # noinspection PyBroadException
+            try:
+                self._refresh()
+            except Exception as e:
+                aavmlogger.error(f"Metrics could not be collected, the error reads:\n{str(e)}")
+            # collections never overlap, a slow one delays the next
+            time.sleep(max(0.0, self._ttl - (time.time() - stime)))
+
+    def _refresh(self):
+        with self._lock:
+            self._text = self._collect()
+            self._collected = time.time()
+
+    def text(self) -> str:
+        if self._background is not None:
+            text = self._text
+            if text is not None:
+                return text
+            # the first collection is still running, wait for it
+            with self._lock:
+                if self._text is not None:
+                    return self._text
+        # on demand, concurrent calls share the cached result
+        with self._lock:
+            if self._text is None or time.time() - self._collected >= self._ttl:
+                self._text = self._collect()
+                self._collected = time.time()
+            return self._text
+
+    def _api_call(self, endpoint: Machine, call: str, fcn, *args, **kwargs):
+        stime = time.time()
+        try:
+            return fcn(*args, **kwargs)
+        finally:
+            with self._api_lock:
+                self._api.observe("aavm_docker_api_duration_seconds",
+                                  {"endpoint": endpoint.name, "call": call}, time.time() - stime)
+
+    def _collect(self) -> str:
+        from aavm import aavmconfig
+        stime = time.time()
+        aavmconfig.reload()
+        sample = Sample()
+        machines = aavmconfig.machines
+        # static info and hibernated machines come from disk
+        endpoints: Dict[str, Machine] = {}
+        for machine in machines.values():
+            endpoint = machine.links.machine
+            labels = {"machine": machine.name, "runtime": machine.runtime.image.compile(),
+                      "endpoint": endpoint.name if endpoint else ""}
+            sample.gauge("aavm_machine_info", labels, 1)
+            if endpoint is not None and not machine.hibernated:
+                endpoints[endpoint.name] = endpoint
+            elif machine.hibernated:
+                sample.gauge("aavm_machine_state",
+                             {"machine": machine.name, "state": "hibernated"}, 1)
+                sample.gauge("aavm_machine_up", {"machine": machine.name}, 0)
+        # one list call per endpoint, endpoints are queried concurrently
+        with ThreadPoolExecutor(max_workers=max(1, min(self._workers, len(endpoints) or 1))) \
+                as pool:
+            for _ in pool.map(lambda e: self._collect_endpoint(e, sample), endpoints.values()):
+                pass
+        # merge metrics recorded by the other aavm processes
+        sample.registry.merge(read_journal())
+        with self._api_lock:
+            sample.registry.merge(self._api)
+        sample.gauge("aavm_exporter_collect_duration_seconds", {}, time.time() - stime)
+        sample.gauge("aavm_exporter_collect_timestamp_seconds", {}, time.time())
+        # ---
+        return render(sample)
+
+    def _collect_endpoint(self, endpoint: Machine, sample: Sample):
+        # noinspection PyBroadException
+        try:
+            client = endpoint.get_client()
+            containers = self._api_call(endpoint, "containers", client.api.containers,
+                                        all=True, filters={"name": CONTAINER_NAME_PREFIX})
+        except (DockerException, RequestException, OSError) as e:
+            aavmlogger.warning(f"CPK machine '{endpoint.name}' is not reachable, "
+                               f"the error reads:\n{str(e)}")
+            sample.gauge("aavm_endpoint_up", {"endpoint": endpoint.name}, 0)
+            return
+        sample.gauge("aavm_endpoint_up", {"endpoint": endpoint.name}, 1)
+        now = time.time()
+        # one-shot stats do not wait for a second sample, the counters do not need it
+        one_shot = {"one_shot": True} if supports_one_shot_stats(client) else {}
+
+        def _inspect(container: dict) -> Optional[dict]:
+            cid, state = container["Id"], container.get("State", "")
+            cached = self._inspects.get(cid, None)
+            # only inspect containers that are new, changed state or were inspected long ago
+            if cached is not None and cached[1] == state and now - cached[2] < INSPECT_MAX_AGE:
+                return cached[3]
+            try:
+                data = self._api_call(endpoint, "inspect", client.api.inspect_container, cid)
+            except (DockerException, RequestException) as e:
+                # the container might be gone already
+                aavmlogger.debug(f"Container '{cid[:12]}' could not be inspected, "
+                                 f"the error reads:\n{str(e)}")
+                return None
+            self._inspects[cid] = (endpoint.name, state, now, data)
+            return data
+
+        def _stats(container: dict) -> Optional[dict]:
+            if container.get("State", "") != "running":
+                return None
+            try:
+                return self._api_call(endpoint, "stats", client.api.stats, container["Id"],
+                                      stream=False, **one_shot)
+            except (DockerException, RequestException) as e:
+                aavmlogger.debug(f"Stats of container '{container['Id'][:12]}' could not be "
+                                 f"read, the error reads:\n{str(e)}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self._workers) as pool:
+            inspects = list(pool.map(_inspect, containers))
+            stats = list(pool.map(_stats, containers))
+        for container, inspect, stat in zip(containers, inspects, stats):
+            name = machine_name_of(container)
+            state = container.get("State", "unknown")
+            labels = {"machine": name}
+            sample.gauge("aavm_machine_state", {**labels, "state": state}, 1)
+            sample.gauge("aavm_machine_up", labels, int(state == "running"))
+            if inspect is not None:
+                sample.gauge("aavm_machine_restarts_total", labels,
+                             inspect.get("RestartCount", 0))
+                started = parse_docker_time(inspect.get("State", {}).get("StartedAt", ""))
+                if started is not None and state in ["running", "paused"]:
+                    sample.gauge("aavm_machine_start_time_seconds", labels, started)
+                    sample.gauge("aavm_machine_uptime_seconds", labels, now - started)
+            if stat is not None:
+                cpu = stat.get("cpu_stats", {}).get("cpu_usage", {}).get("total_usage", 0)
+                memory, limit = memory_usage(stat)
+                rx, tx = network_bytes(stat)
+                read, write = block_bytes(stat)
+                sample.gauge("aavm_machine_cpu_seconds_total", labels, cpu / 1e9)
+                sample.gauge("aavm_machine_memory_bytes", labels, memory)
+                sample.gauge("aavm_machine_memory_limit_bytes", labels, limit)
+                sample.gauge("aavm_machine_network_receive_bytes_total", labels, rx)
+                sample.gauge("aavm_machine_network_transmit_bytes_total", labels, tx)
+                sample.gauge("aavm_machine_block_read_bytes_total", labels, read)
+                sample.gauge("aavm_machine_block_write_bytes_total", labels, write)
+        # forget containers that do not exist anymore
+        ids = {c["Id"] for c in containers}
+        for cid, (cached_endpoint, *_) in list(self._inspects.items()):
+            if cached_endpoint == endpoint.name and cid not in ids:
+                self._inspects.pop(cid, None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _series(name: str, labels: Labels, value: float) -> str:
+    labels_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    value = str(int(value)) if isinstance(value, int) else repr(float(value))
+    return f"{name}{{{labels_str}}} {value}" if labels_str else f"{name} {value}"
+
+
+def render(sample: Sample) -> str:
+    lines = []
+    families: Dict[str, List[str]] = {}
+    # gauges (and counters read from docker)
+    for name, labels, value in sample.gauges:
+        families.setdefault(name, []).append(_series(name, labels, value))
+    # counters
+    for name, series in sample.registry.counters.items():
+        for key, value in series.items():
+            families.setdefault(name, []).append(_series(name, dict(key), value))
+    # histograms
+    for name, series in sample.registry.histograms.items():
+        for key, histogram in series.items():
+            labels = dict(key)
+            out = families.setdefault(name, [])
+            for bound, count in zip(HISTOGRAM_BUCKETS, histogram.buckets):
+                out.append(_series(f"{name}_bucket", {**labels, "le": f"{bound:g}"}, count))
+            out.append(_series(f"{name}_bucket", {**labels, "le": "+Inf"}, histogram.count))
+            out.append(_series(f"{name}_sum", labels, histogram.sum))
+            out.append(_series(f"{name}_count", labels, histogram.count))
+    for name, series in families.items():
+        kind, description = _HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(series)
+    return "\n".join(lines) + "\n"
+
+
+def serve(collector: MetricsCollector, host: str, port: int):
+
+    class _Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split("?")[0] not in ["/metrics", "/"]:
+                self.send_error(404)
+                return
+            # noinspection PyBroadException
+            try:
+                body = collector.text().encode("utf-8")
+            except Exception as e:
+                aavmlogger.error(f"Metrics could not be collected, the error reads:\n{str(e)}")
+                self.send_error(500)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            aavmlogger.debug(f"{self.address_string()} - {fmt % args}")
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
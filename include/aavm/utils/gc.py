@@ -0,0 +1,239 @@
+import dataclasses
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Set, Tuple
+
+from docker.errors import APIError, NotFound
+from requests import RequestException
+
+from aavm.exceptions import AAVMException
+from aavm.types import AAVMRuntime
+from aavm.utils.docker import get_client, sanitize_image_name, RUNNING_STATUSES, \
+    UNSTABLE_STATUSES
+from aavm.utils.mirror import mirror_image
+from aavm.utils.misc import aavm_label, aavm_owner
+from aavm.utils.runtime import get_known_runtimes
+from cpk.types import Machine
+
+MACHINE_CONTAINER_PREFIX = "aavm-machine-"
+SNAPSHOT_REPOSITORY_PREFIX = "aavm-machine-"
+
+# categories, in the order they are collected (containers hold on to images)
+GC_CATEGORIES = {
+    "containers": "Orphaned containers",
+    "runtimes": "Unused runtimes",
+    "snapshots": "Orphaned snapshots",
+    "dangling": "Dangling images",
+    "descriptors": "Stale runtime descriptors",
+}
+
+
+@dataclasses.dataclass
+class GarbageItem:
+    category: str
+    # CPK machine the item lives on, None for files in the config directory
+    endpoint: Optional[Machine]
+    name: str
+    # container ID, image ID or path
+    ref: str
+    size: int
+    # image tags to remove, images are removed by ID when none is given
+    tags: List[str] = dataclasses.field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def location(self) -> str:
+        return self.endpoint.name if self.endpoint is not None else "local"
+
+
+def _normalize(image: str) -> Optional[str]:
+    # 'afdaniele/aavm:tag' and 'docker.io/afdaniele/aavm:tag' are the same image
+    try:
+        return sanitize_image_name(image)
+    except ValueError:
+        return None
+
+
+def _is_untagged(tags: Optional[List[str]]) -> bool:
+    return not tags or all(t == "<none>:<none>" for t in tags)
+
+
+def referenced_images(endpoint: Machine) -> Set[str]:
+    from aavm import aavmconfig
+    # images machines (might) need on the given endpoint, machines that are not pinned to an
+    # endpoint might be (re)placed anywhere
+    referenced = set()
+    for machine in aavmconfig.machines.values():
+        if machine.links.image is not None:
+            referenced.add(_normalize(machine.links.image))
+        linked = machine.links.machine
+        if linked is None or linked.name == endpoint.name or \
+                machine.settings.placement != "pinned":
+            referenced.add(machine.runtime.image.compile(allow_defaults=True))
+    # runtimes with a pool are in use as well
+    referenced.update(_normalize(r) for r, size in aavmconfig.settings.pools.items() if size)
+    referenced.discard(None)
+    return referenced
+
+
+def scan_endpoint(endpoint: Machine, runtimes: List[AAVMRuntime]) -> List[GarbageItem]:
+    from aavm import aavmconfig
+    api = get_client(endpoint).api
+    # one call each, sizes come from 'df' (listing containers with sizes is much slower)
+    containers = api.containers(all=True)
+    images = api.images()
+    usage = api.df()
+    container_sizes = {c["Id"]: c.get("SizeRw", 0) or 0 for c in usage.get("Containers") or []}
+    image_sizes = {i["Id"]: max(0, i.get("Size", 0) - max(0, i.get("SharedSize", 0) or 0))
+                   for i in usage.get("Images") or []}
+    items = []
+    # containers of machines that no longer exist (or no longer own them), only those created
+    # from this config directory are considered, endpoints can be shared with other hosts
+    owned = {m.links.container for m in aavmconfig.machines.values() if m.links.container}
+    owner = aavm_owner()
+    orphans = set()
+    for container in containers:
+        names = [n.lstrip("/") for n in container.get("Names") or []]
+        name = names[0] if names else container["Id"][:12]
+        if not name.startswith(MACHINE_CONTAINER_PREFIX):
+            continue
+        if (container.get("Labels") or {}).get(aavm_label("machine.owner")) != owner:
+            continue
+        if any(container["Id"].startswith(c) for c in owned):
+            continue
+        # somebody is still using it
+        if container.get("State") in RUNNING_STATUSES + UNSTABLE_STATUSES:
+            continue
+        orphans.add(container["Id"])
+        items.append(GarbageItem(
+            category="containers",
+            endpoint=endpoint,
+            name=name,
+            ref=container["Id"],
+            size=container_sizes.get(container["Id"], 0)
+        ))
+    # images still used by the containers that are staying
+    in_use = {c["ImageID"] for c in containers if c["Id"] not in orphans}
+    known = {r.image.compile(allow_defaults=True) for r in runtimes}
+    referenced = referenced_images(endpoint)
+    # runtimes pulled through the mirror keep the mirror's name as well
+    mirror = aavmconfig.settings.registry_mirror
+    mirrored = {_normalize(m): k for k, m in
+                ((k, mirror_image(k, mirror) if mirror else None) for k in known) if m}
+
+    def _runtime(tag: str) -> Optional[str]:
+        name = _normalize(tag)
+        return mirrored.get(name, name)
+
+    for image in images:
+        if image["Id"] in in_use:
+            continue
+        tags = [t for t in image.get("RepoTags") or [] if t != "<none>:<none>"]
+        size = image_sizes.get(image["Id"], image.get("Size", 0))
+        if _is_untagged(tags):
+            items.append(GarbageItem("dangling", endpoint, image["Id"][7:19], image["Id"], size))
+            continue
+        for category, matches in [
+            ("runtimes", lambda t: _runtime(t) in known),
+            ("snapshots", lambda t: t.startswith(SNAPSHOT_REPOSITORY_PREFIX)),
+        ]:
+            garbage = [t for t in tags if matches(t) and _runtime(t) not in referenced]
+            if not garbage:
+                continue
+            # the space is only freed when the last tag goes
+            items.append(GarbageItem(
+                category=category,
+                endpoint=endpoint,
+                name=", ".join(garbage),
+                ref=image["Id"],
+                size=size if len(garbage) == len(tags) else 0,
+                tags=garbage
+            ))
+            break
+    # ---
+    return items
+
+
+def _dir_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                size += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return size
+
+
+def stale_descriptors() -> List[GarbageItem]:
+    from aavm import aavmconfig
+    # leaf directories without a valid runtime descriptor (e.g., interrupted fetches)
+    runtimes_dir = os.path.join(aavmconfig.path, "runtimes")
+    items = []
+    for root, dirs, _ in os.walk(runtimes_dir):
+        if dirs or root == runtimes_dir:
+            continue
+        try:
+            AAVMRuntime.from_disk(root)
+            continue
+        except (AAVMException, KeyError, ValueError, TypeError, OSError):
+            pass
+        name = os.path.relpath(root, runtimes_dir)
+        items.append(GarbageItem("descriptors", None, name, root, _dir_size(root)))
+    return items
+
+
+def find_garbage(endpoints: List[Machine], workers: int = 8) -> \
+        Tuple[List[GarbageItem], Dict[str, str]]:
+    runtimes = get_known_runtimes()
+    errors: Dict[str, str] = {}
+
+    def _scan(endpoint: Machine) -> List[GarbageItem]:
+        try:
+            return scan_endpoint(endpoint, runtimes)
+        except (APIError, RequestException, OSError) as e:
+            errors[endpoint.name] = str(e)
+            return []
+
+    items = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(endpoints)))) as pool:
+        for found in pool.map(_scan, endpoints):
+            items.extend(found)
+    items.extend(stale_descriptors())
+    order = list(GC_CATEGORIES)
+    items.sort(key=lambda i: (order.index(i.category), i.location, i.name))
+    # ---
+    return items, errors
+
+
+def _collect(item: GarbageItem):
+    try:
+        if item.category == "containers":
+            # never forced, a container that was started in the meantime stays
+            get_client(item.endpoint).api.remove_container(item.ref, v=True)
+        elif item.category == "descriptors":
+            # out of the way first, so that nobody reads a half-deleted directory
+            trash = f"{item.ref}.gc-{os.getpid()}"
+            os.rename(item.ref, trash)
+            shutil.rmtree(trash)
+        elif item.tags:
+            api = get_client(item.endpoint).api
+            for tag in item.tags:
+                api.remove_image(tag)
+        else:
+            get_client(item.endpoint).api.remove_image(item.ref)
+    except NotFound:
+        pass
+    except (APIError, RequestException, OSError) as e:
+        item.error = str(e)
+
+
+def collect_garbage(items: List[GarbageItem], workers: int = 8):
+    # containers go first, they might be holding on to the images
+    for category in GC_CATEGORIES:
+        batch = [i for i in items if i.category == category]
+        if not batch:
+            continue
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batch)))) as pool:
+            list(pool.map(_collect, batch))
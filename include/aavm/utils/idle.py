@@ -0,0 +1,98 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from docker.errors import APIError, NotFound
+
+from aavm.cli import aavmlogger
+from aavm.types import AAVMMachine
+from aavm.utils.stats import cpu_percent
+
+# (cpu usage in percentage, number of active exec sessions)
+IdleSample = Tuple[float, int]
+
+
+def sample_machine(machine: AAVMMachine) -> Optional[IdleSample]:
+    container = machine.container
+    if container is None:
+        return None
+    try:
+        # refresh the container's state (this also refreshes the list of exec sessions)
+        container.reload()
+        if container.status != "running":
+            return None
+        stats = container.stats(stream=False)
+        # count exec sessions that are still running
+        execs = 0
+        for exec_id in container.attrs.get("ExecIDs", None) or []:
+            try:
+                if container.client.api.exec_inspect(exec_id)["Running"]:
+                    execs += 1
+            except NotFound:
+                pass
+    except (APIError, NotFound) as e:
+        aavmlogger.debug(f"Machine '{machine.name}' could not be sampled, "
+                         f"the error reads:\n{str(e)}")
+        return None
+    # ---
+    return cpu_percent(stats), execs
+
+
+def wake_machine(machine: AAVMMachine, trigger: str) -> bool:
+    container = machine.container
+    if container is None or container.status != "paused":
+        return False
+    aavmlogger.info(f"Machine '{machine.name}' is paused, resuming it "
+                    f"(trigger: {trigger}).")
+    container.unpause()
+    container.reload()
+    return True
+
+
+class IdleWatcher:
+
+    def __init__(self, workers: int = 8):
+        self._workers = workers
+        # when each machine was first seen idle
+        self._idle_since: Dict[str, float] = {}
+
+    def step(self, machines: List[AAVMMachine]):
+        # only consider machines with an idle policy
+        machines = [m for m in machines if m.settings.idle is not None and not m.hibernated]
+        if not machines:
+            return
+        # sample all the machines in batches
+        with ThreadPoolExecutor(max_workers=self._workers) as pool:
+            samples = list(pool.map(sample_machine, machines))
+        now = time.time()
+        for machine, sample in zip(machines, samples):
+            if sample is None:
+                self._idle_since.pop(machine.name, None)
+                continue
+            policy = machine.settings.idle
+            cpu, execs = sample
+            aavmlogger.debug(f"Machine '{machine.name}': cpu={cpu:.2f}%, execs={execs}")
+            # busy machine
+            if cpu >= policy.cpu or execs > 0:
+                self._idle_since.pop(machine.name, None)
+                continue
+            # idle machine
+            since = self._idle_since.setdefault(machine.name, now)
+            idle_mins = (now - since) / 60.0
+            if idle_mins < policy.after:
+                continue
+            # the policy is met
+            aavmlogger.info(f"Machine '{machine.name}' has been idle for {idle_mins:.1f} "
+                            f"minutes (cpu={cpu:.2f}% < {policy.cpu}%, execs={execs}), "
+                            f"applying action '{policy.action}'...")
+            try:
+                if policy.action == "pause":
+                    machine.container.pause()
+                else:
+                    machine.container.stop()
+            except APIError as e:
+                aavmlogger.error(f"Machine '{machine.name}' could not be suspended, "
+                                 f"the error reads:\n{str(e)}")
+                continue
+            self._idle_since.pop(machine.name, None)
+            aavmlogger.info(f"Machine '{machine.name}' suspended (action: {policy.action}).")
@@ -0,0 +1,104 @@
+import queue
+import sys
+import threading
+from typing import List, Optional, Tuple, BinaryIO
+
+from docker.errors import DockerException
+from requests import RequestException
+from termcolor import colored
+
+from aavm.cli import aavmlogger
+from aavm.types import AAVMMachine
+from aavm.utils.docker import container_logs, STDOUT, STDERR
+
+# maximum number of chunks waiting to be printed, readers block (and so does the daemon)
+# when the terminal cannot keep up
+LOGS_QUEUE_SIZE = 256
+_COLORS = ["cyan", "green", "yellow", "magenta", "blue", "red"]
+
+# (machine name, stream, data), None data marks the end of a machine's stream
+LogChunk = Tuple[str, int, Optional[bytes]]
+
+
+class LogStream(threading.Thread):
+
+    def __init__(self, machine: AAVMMachine, out: queue.Queue, follow: bool = False,
+                 tail: Optional[int] = None, since: Optional[float] = None,
+                 timestamps: bool = False):
+        super(LogStream, self).__init__(daemon=True)
+        self.machine = machine
+        self._out = out
+        self._params = {"follow": follow, "timestamps": timestamps, "tail": tail, "since": since}
+
+    def run(self):
+        try:
+            self._stream()
+        except (DockerException, RequestException) as e:
+            aavmlogger.debug(f"The logs of machine '{self.machine.name}' could not be "
+                             f"streamed, the error reads:\n{str(e)}")
+        finally:
+            self._out.put((self.machine.name, STDOUT, None))
+
+    def _stream(self):
+        container = self.machine.container
+        if container is None:
+            aavmlogger.warning(f"Machine '{self.machine.name}' has no container, no logs.")
+            return
+        tty = container.attrs.get("Config", {}).get("Tty", False)
+        for stream, chunk in container_logs(container.client, container.id, tty=tty,
+                                            **self._params):
+            self._out.put((self.machine.name, stream, chunk))
+
+
+class LogPrinter:
+
+    def __init__(self, names: List[str], prefix: bool = True,
+                 stdout: Optional[BinaryIO] = None, stderr: Optional[BinaryIO] = None):
+        width = max(len(n) for n in names) if names else 0
+        self._prefixes = {
+            name: colored(f"{name.ljust(width)} | ", _COLORS[i % len(_COLORS)]).encode("utf-8")
+            for i, name in enumerate(names)
+        } if prefix else {}
+        self._stdout = stdout or sys.stdout.buffer
+        self._stderr = stderr or sys.stderr.buffer
+        # whether the next chunk of each (machine, stream) starts a new line
+        self._line_start = {}
+
+    def write(self, name: str, stream: int, data: bytes):
+        out = self._stderr if stream == STDERR else self._stdout
+        prefix = self._prefixes.get(name, None)
+        if prefix is None:
+            out.write(data)
+            out.flush()
+            return
+        key = (name, stream)
+        view = memoryview(data)
+        start, size = 0, len(data)
+        while start < size:
+            end = data.find(b"\n", start)
+            end = size if end < 0 else end + 1
+            if self._line_start.get(key, True):
+                out.write(prefix)
+            out.write(view[start:end])
+            self._line_start[key] = data[end - 1] == 10
+            start = end
+        out.flush()
+
+
+def stream_logs(machines: List[AAVMMachine], follow: bool = False, tail: Optional[int] = None,
+                since: Optional[float] = None, timestamps: bool = False,
+                prefix: Optional[bool] = None):
+    # the output of multiple machines is interleaved and prefixed with the machine name
+    prefix = len(machines) > 1 if prefix is None else prefix
+    chunks: queue.Queue = queue.Queue(maxsize=LOGS_QUEUE_SIZE)
+    printer = LogPrinter([m.name for m in machines], prefix=prefix)
+    streams = [LogStream(m, chunks, follow, tail, since, timestamps) for m in machines]
+    for stream in streams:
+        stream.start()
+    running = len(streams)
+    while running > 0:
+        name, stream, data = chunks.get()
+        if data is None:
+            running -= 1
+            continue
+        printer.write(name, stream, data)
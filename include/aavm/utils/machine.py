@@ -1,12 +1,17 @@
+import fnmatch
 import glob
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, List
+
+from docker.errors import APIError
 
 from aavm.cli import aavmlogger
 from aavm.exceptions import AAVMException
 from aavm.types import AAVMMachine, AAVMContainer
 from aavm.utils.misc import aavm_label
+from cpk.types import Machine
 
 
 def load_machines(path: str) -> Dict[str, AAVMMachine]:
@@ -25,3 +30,44 @@ def load_machines(path: str) -> Dict[str, AAVMMachine]:
         machines[machine_name] = machine
     # ---
     return machines
+
+
+def select_machines(patterns: List[str]) -> List[AAVMMachine]:
+    from aavm import aavmconfig
+    # machine names or shell-style patterns (e.g., 'build-*'), in the order given
+    selected = []
+    for pattern in patterns:
+        matches = [m for n, m in aavmconfig.machines.items() if fnmatch.fnmatchcase(n, pattern)]
+        if not matches:
+            raise AAVMException(f"No machines match '{pattern}'.")
+        selected.extend(m for m in matches if m not in selected)
+    return selected
+
+
+def select_endpoints(patterns: List[str]) -> List[Machine]:
+    from cpk import cpkconfig
+    # CPK machine names or shell-style patterns (e.g., 'lab-*'), in the order given
+    selected = []
+    for pattern in patterns:
+        matches = [m for n, m in cpkconfig.machines.items() if fnmatch.fnmatchcase(n, pattern)]
+        if not matches:
+            raise AAVMException(f"No CPK machines match '{pattern}'.")
+        selected.extend(m for m in matches if m not in selected)
+    return selected
+
+
+def remove_machines(machines: List[AAVMMachine], timeout: int = 2, force: bool = False,
+                    workers: int = 16) -> Dict[str, Optional[str]]:
+    # tears the machines down concurrently, returns the error (if any) for each machine
+
+    def _remove(machine: AAVMMachine) -> Optional[str]:
+        try:
+            machine.remove(timeout=timeout, force=force)
+        except (AAVMException, APIError, OSError) as e:
+            return str(e)
+        return None
+
+    if not machines:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(machines)))) as pool:
+        return dict(zip([m.name for m in machines], pool.map(_remove, machines)))
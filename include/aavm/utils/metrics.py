@@ -0,0 +1,167 @@
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Optional, Iterator
+
+from aavm.cli import aavmlogger
+
+# Prometheus-style histogram buckets (seconds)
+HISTOGRAM_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+Labels = Dict[str, str]
+LabelsKey = Tuple[Tuple[str, str], ...]
+
+
+def labels_key(labels: Labels) -> LabelsKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+
+    def __init__(self, buckets: Optional[List[int]] = None, total: float = 0.0, count: int = 0):
+        self.buckets = buckets or [0] * len(HISTOGRAM_BUCKETS)
+        self.sum = total
+        self.count = count
+
+    def observe(self, value: float):
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other: 'Histogram'):
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def serialize(self) -> dict:
+        return {"buckets": self.buckets, "sum": self.sum, "count": self.count}
+
+    @classmethod
+    def deserialize(cls, data: dict) -> 'Histogram':
+        return Histogram(list(data["buckets"]), data["sum"], data["count"])
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[LabelsKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelsKey, Histogram]] = {}
+
+    def inc(self, name: str, labels: Labels, value: float = 1.0):
+        series = self.counters.setdefault(name, {})
+        key = labels_key(labels)
+        series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: Labels, value: float):
+        series = self.histograms.setdefault(name, {})
+        series.setdefault(labels_key(labels), Histogram()).observe(value)
+
+    def merge(self, other: 'MetricsRegistry'):
+        for name, series in other.counters.items():
+            for key, value in series.items():
+                self.inc(name, dict(key), value)
+        for name, series in other.histograms.items():
+            for key, histogram in series.items():
+                self.histograms.setdefault(name, {}).setdefault(key, Histogram()).merge(histogram)
+
+    def serialize(self) -> dict:
+        return {
+            "counters": {
+                name: [{"labels": dict(k), "value": v} for k, v in series.items()]
+                for name, series in self.counters.items()
+            },
+            "histograms": {
+                name: [{"labels": dict(k), **h.serialize()} for k, h in series.items()]
+                for name, series in self.histograms.items()
+            }
+        }
+
+    @classmethod
+    def deserialize(cls, data: dict) -> 'MetricsRegistry':
+        registry = MetricsRegistry()
+        for name, series in data.get("counters", {}).items():
+            for entry in series:
+                registry.inc(name, entry["labels"], entry["value"])
+        for name, series in data.get("histograms", {}).items():
+            for entry in series:
+                registry.histograms.setdefault(name, {})[labels_key(entry["labels"])] = \
+                    Histogram.deserialize(entry)
+        return registry
+
+
+# metrics journal, shared by all the aavm processes (CLI commands, background pulls, ...)
+
+def metrics_enabled() -> bool:
+    from aavm import aavmconfig
+    # noinspection PyBroadException
+    try:
+        return aavmconfig.settings.metrics
+    except Exception as e:
+        aavmlogger.debug(f"Settings could not be read, metrics are off, the error reads:\n"
+                         f"{str(e)}")
+        return False
+
+
+def _journal_path() -> str:
+    from aavm import aavmconfig
+    return os.path.join(aavmconfig.path, "metrics.json")
+
+
+@contextmanager
+def _locked_journal() -> Iterator[MetricsRegistry]:
+    path = _journal_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            registry = read_journal()
+            yield registry
+            tmp = f"{path}.tmp"
+            with open(tmp, "wt") as fout:
+                json.dump(registry.serialize(), fout)
+            os.replace(tmp, path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def read_journal() -> MetricsRegistry:
+    path = _journal_path()
+    if not os.path.isfile(path):
+        return MetricsRegistry()
+    try:
+        with open(path, "rt") as fin:
+            return MetricsRegistry.deserialize(json.load(fin))
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        aavmlogger.warning(f"The metrics journal '{path}' is corrupted and will be reset, "
+                           f"the error reads:\n{str(e)}")
+        return MetricsRegistry()
+
+
+def record(counters: Optional[Dict[str, Tuple[Labels, float]]] = None,
+           observations: Optional[Dict[str, Tuple[Labels, float]]] = None):
+    # records counters and observations (if metrics are enabled) with a single journal update
+    if not metrics_enabled():
+        return
+    # noinspection PyBroadException
+    try:
+        with _locked_journal() as registry:
+            for name, (labels, value) in (counters or {}).items():
+                registry.inc(name, labels, value)
+            for name, (labels, value) in (observations or {}).items():
+                registry.observe(name, labels, value)
+    except Exception as e:
+        # metrics must never break a command
+        aavmlogger.debug(f"Metrics could not be recorded, the error reads:\n{str(e)}")
+
+
+@contextmanager
+def timed(name: str, labels: Labels):
+    stime = time.time()
+    try:
+        yield
+    finally:
+        record(observations={name: (labels, time.time() - stime)})
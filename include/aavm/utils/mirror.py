@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import Optional
+
+import requests
+from docker import DockerClient
+from docker.errors import NotFound
+
+from aavm.cli import aavmlogger
+from aavm.constants import AAVM_RUNTIMES_INDEX_URL, AAVM_RUNTIMES_INDEX_VERSION
+from aavm.utils.misc import aavm_label, ThreadingHTTPServer
+
+DEFAULT_REGISTRY = "docker.io"
+REGISTRY_IMAGE = "registry:2"
+REGISTRY_CONTAINER_NAME = "aavm-registry"
+REGISTRY_VOLUME_NAME = "aavm-registry"
+REGISTRY_UPSTREAM = "https://registry-1.docker.io"
+# seconds the upstream runtimes index is cached for by the index stand-in
+INDEX_CACHE_TTL = 600
+
+
+def split_registry(image: str):
+    # 'lab.local:5000/org/repo:tag' -> ('lab.local:5000', 'org/repo:tag')
+    head, sep, rest = image.partition("/")
+    if sep and ("." in head or ":" in head or head == "localhost"):
+        return head, rest
+    return DEFAULT_REGISTRY, image
+
+
+def mirror_image(image: str, mirror: str) -> Optional[str]:
+    # a pull-through cache mirrors a single upstream, Docker Hub, other registries are not
+    # rewritten
+    registry, path = split_registry(image)
+    if registry not in [DEFAULT_REGISTRY, "index.docker.io", "registry-1.docker.io"]:
+        return None
+    if "/" not in path:
+        path = f"library/{path}"
+    return f"{mirror.rstrip('/')}/{path}"
+
+
+def get_index_url() -> str:
+    from aavm import aavmconfig
+    return aavmconfig.settings.runtimes_index or AAVM_RUNTIMES_INDEX_URL
+
+
+# registry
+
+def get_registry(client: DockerClient):
+    try:
+        return client.containers.get(REGISTRY_CONTAINER_NAME)
+    except NotFound:
+        return None
+
+
+def start_registry(client: DockerClient, port: int, upstream: str = REGISTRY_UPSTREAM):
+    container = get_registry(client)
+    if container is None:
+        aavmlogger.info(f"Creating registry mirror '{REGISTRY_CONTAINER_NAME}' "
+                        f"(upstream: {upstream})...")
+        container = client.containers.create(
+            image=REGISTRY_IMAGE,
+            name=REGISTRY_CONTAINER_NAME,
+            environment={"REGISTRY_PROXY_REMOTEURL": upstream},
+            ports={"5000/tcp": port},
+            volumes={REGISTRY_VOLUME_NAME: {"bind": "/var/lib/registry", "mode": "rw"}},
+            restart_policy={"Name": "unless-stopped"},
+            labels={aavm_label("registry"): "1"},
+            detach=True
+        )
+    if container.status != "running":
+        container.start()
+    return container
+
+
+def stop_registry(client: DockerClient, purge: bool = False) -> bool:
+    container = get_registry(client)
+    if container is None:
+        return False
+    container.remove(force=True)
+    # the cache is kept unless explicitly purged
+    if purge:
+        try:
+            client.volumes.get(REGISTRY_VOLUME_NAME).remove()
+        except NotFound:
+            pass
+    return True
+
+
+# runtimes index
+
+class IndexCache:
+    # the upstream runtimes index, cached on disk so that it can be served while offline
+
+    def __init__(self, ttl: float = INDEX_CACHE_TTL, url: str = AAVM_RUNTIMES_INDEX_URL):
+        from aavm import aavmconfig
+        self._ttl = ttl
+        self._url = url
+        self._path = os.path.join(aavmconfig.path, "cache", "index",
+                                  f"{AAVM_RUNTIMES_INDEX_VERSION}.json")
+        self._lock = threading.Lock()
+
+    def _read(self) -> Optional[bytes]:
+        try:
+            with open(self._path, "rb") as fin:
+                return fin.read()
+        except FileNotFoundError:
+            return None
+
+    def content(self) -> Optional[bytes]:
+        with self._lock:
+            cached = self._read()
+            fresh = cached is not None and \
+                time.time() - os.path.getmtime(self._path) < self._ttl
+            if fresh:
+                return cached
+            try:
+                aavmlogger.debug(f"GET: {self._url}")
+                res = requests.get(self._url, timeout=10)
+                res.raise_for_status()
+                content = json.dumps(res.json(), indent=4).encode("utf-8")
+            except (requests.RequestException, ValueError) as e:
+                if cached is not None:
+                    aavmlogger.warning(f"The upstream runtimes index could not be fetched, "
+                                       f"serving the cached copy. The error reads:\n{str(e)}")
+                return cached
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            with open(f"{self._path}.tmp", "wb") as fout:
+                fout.write(content)
+            os.replace(f"{self._path}.tmp", self._path)
+            return content
+
+
+def serve_index(cache: IndexCache, host: str, port: int):
+
+    class _Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split("?")[0] not in [f"/{AAVM_RUNTIMES_INDEX_VERSION}.json", "/"]:
+                self.send_error(404)
+                return
+            body = cache.content()
+            if body is None:
+                self.send_error(503, "The runtimes index is not available")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            aavmlogger.debug(f"{self.address_string()} - {fmt % args}")
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
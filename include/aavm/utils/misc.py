@@ -1,6 +1,12 @@
 import ipaddress
+import os
+import re
+import socket
 import subprocess
-from typing import Union
+import sys
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Union, List, Optional
 
 import docker
 import yaml
@@ -8,6 +14,13 @@ from docker.errors import ContainerError, ImageNotFound, APIError
 
 from aavm.constants import CANONICAL_ARCH, CONTAINER_LABEL_DOMAIN, BUILD_COMPATIBILITY_MAP
 
+try:
+    from http.server import ThreadingHTTPServer
+except ImportError:
+    # Python < 3.7
+    class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
 
 def run_cmd(cmd):
     cmd = " ".join(cmd)
@@ -15,6 +28,28 @@ def run_cmd(cmd):
     return list(filter(lambda line: len(line) > 0, lines))
 
 
+def run_detached(args: List[str], machine=None):
+    import aavm
+    from cpk.machine import FromEnvMachine
+    # run an aavm command in a new session so that it outlives the current process
+    cmd = [sys.executable, "-m", "aavm.cli.main", *args]
+    if machine is not None and not isinstance(machine, FromEnvMachine):
+        cmd += ["-H", machine.name]
+    # make sure the child process can import this same copy of aavm
+    env = dict(os.environ)
+    include_dir = os.path.dirname(os.path.dirname(os.path.abspath(aavm.__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [include_dir, env.get("PYTHONPATH")]))
+    return subprocess.Popen(
+        cmd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+        close_fds=True
+    )
+
+
 def assert_canonical_arch(arch):
     if arch not in CANONICAL_ARCH.values():
         raise ValueError(
@@ -40,6 +75,31 @@ def aavm_label(key, value=None):
     return label
 
 
+def aavm_owner() -> str:
+    from aavm import aavmconfig
+    # identifies this config directory, endpoints can be shared by many hosts and users
+    return f"{socket.gethostname()}:{os.path.abspath(aavmconfig.path)}"
+
+
+def parse_cpuset(value: str) -> List[int]:
+    cpus = set()
+    for part in filter(None, value.split(",")):
+        start, _, end = part.partition("-")
+        cpus.update(range(int(start), int(end or start) + 1))
+    return sorted(cpus)
+
+
+def compile_cpuset(cpus: List[int]) -> str:
+    # compact a list of cores into the cpuset syntax, e.g., [0, 1, 2, 5] -> "0-2,5"
+    parts = []
+    for cpu in sorted(set(cpus)):
+        if parts and parts[-1][1] == cpu - 1:
+            parts[-1][1] = cpu
+        else:
+            parts.append([cpu, cpu])
+    return ",".join(f"{a}-{b}" if a != b else str(a) for a, b in parts)
+
+
 def sanitize_hostname(hostname: str) -> str:
     try:
         ipaddress.ip_address(hostname)
@@ -58,6 +118,12 @@ def parse_configurations(config_file: str) -> dict:
         return configurations_content["configurations"]
 
 
+def needs_emulation(machine_arch: str, arch: Optional[str]) -> bool:
+    # images with no arch are assumed to be multi-arch (docker picks the right one)
+    compatible = BUILD_COMPATIBILITY_MAP.get(machine_arch, [machine_arch])
+    return arch is not None and arch not in compatible
+
+
 def configure_binfmt(machine_arch: str, arch: str, epoint: docker.DockerClient, logger):
     compatible_archs = BUILD_COMPATIBILITY_MAP[machine_arch]
     if arch not in compatible_archs:
@@ -108,6 +174,16 @@ def human_time(time_secs: Union[int, float], compact: bool = False):
     return ", ".join(parts)
 
 
+def parse_duration(value: str) -> float:
+    # e.g., 90, 90s, 15m, 12h, 7d, 2w
+    units = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    match = re.match(r"^\s*([0-9]+(\.[0-9]+)?)\s*([smhdw]?)\s*$", str(value).lower())
+    if not match:
+        raise ValueError(f"Invalid duration '{value}', use a number optionally followed by "
+                         f"one of the units s, m, h, d, w (e.g., 12h, 7d).")
+    return float(match.group(1)) * units[match.group(3)]
+
+
 def ask_confirmation(logger, message, default="y", question="Do you confirm?", choices=None):
     binary_question = False
     if choices is None:
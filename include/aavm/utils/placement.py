@@ -0,0 +1,122 @@
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional
+
+from docker.errors import DockerException
+from requests import RequestException
+
+from aavm.cli import aavmlogger
+from aavm.constants import BUILD_COMPATIBILITY_MAP, CANONICAL_ARCH
+from aavm.exceptions import AAVMException
+from aavm.types import AAVMMachine
+from aavm.utils.capacity import get_info
+from cpk import cpkconfig
+from cpk.types import Machine
+
+PLACEMENT_POLICIES = ["pinned", "spread", "binpack"]
+
+
+@dataclasses.dataclass
+class HostCapacity:
+    machine: Machine
+    arch: str
+    ncpus: int
+    memory: int
+    reserved_cpus: float = 0.0
+    reserved_memory: int = 0
+
+    @property
+    def free_cpus(self) -> float:
+        return self.ncpus - self.reserved_cpus
+
+    @property
+    def free_memory(self) -> int:
+        return self.memory - self.reserved_memory
+
+    @property
+    def free(self) -> float:
+        # fraction of the host that is still free (average of CPU and memory)
+        return (self.free_cpus / max(1, self.ncpus) + self.free_memory / max(1, self.memory)) / 2
+
+
+def machine_demand(machine: AAVMMachine) -> Tuple[float, int]:
+    # CPUs and memory (in bytes) the machine is entitled to
+    resources = machine.settings.resources
+    cpus = 0.0
+    if machine.settings.cpuset is not None:
+        cpus = float(len(machine.settings.cpuset.cpus))
+    elif resources.cpu_quota is not None:
+        cpus = resources.cpu_quota / (resources.cpu_period or 100000)
+    return cpus, resources.mem_limit or 0
+
+
+def reserved_on(cpk_machine: Machine, exclude: Optional[str] = None) -> Tuple[float, int]:
+    from aavm import aavmconfig
+    cpus, memory = 0.0, 0
+    for machine in aavmconfig.machines.values():
+        if machine.name == exclude or machine.machine != cpk_machine:
+            continue
+        machine_cpus, machine_memory = machine_demand(machine)
+        cpus += machine_cpus
+        memory += machine_memory
+    return cpus, memory
+
+
+def candidate_machines(current: Optional[Machine] = None) -> List[Machine]:
+    machines = list(cpkconfig.machines.values())
+    if current is not None and current not in machines:
+        machines.append(current)
+    return machines
+
+
+def gather_capacity(machines: List[Machine], exclude: Optional[str] = None,
+                    workers: int = 8) -> List[HostCapacity]:
+
+    def _capacity(machine: Machine) -> Optional[HostCapacity]:
+        try:
+            info = get_info(machine)
+        except (DockerException, RequestException, OSError) as e:
+            aavmlogger.warning(f"CPK machine '{machine.name}' is not reachable, "
+                               f"the error reads:\n{str(e)}")
+            return None
+        cpus, memory = reserved_on(machine, exclude=exclude)
+        return HostCapacity(
+            machine=machine,
+            arch=CANONICAL_ARCH.get(info["Architecture"], info["Architecture"]),
+            ncpus=info["NCPU"],
+            memory=info["MemTotal"],
+            reserved_cpus=cpus,
+            reserved_memory=memory
+        )
+
+    # query all the endpoints concurrently
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(machines)))) as pool:
+        return [c for c in pool.map(_capacity, machines) if c is not None]
+
+
+def place(machine: AAVMMachine, hosts: List[HostCapacity], policy: str) -> HostCapacity:
+    arch = machine.runtime.image.arch
+    cpus, memory = machine_demand(machine)
+    # prefer hosts with a native architecture for the runtime
+    candidates = [h for h in hosts if h.arch == arch]
+    if not candidates:
+        candidates = [h for h in hosts if arch in BUILD_COMPATIBILITY_MAP.get(h.arch, [])]
+    if not candidates:
+        raise AAVMException(f"None of the CPK machines can run the architecture '{arch}' "
+                            f"of the runtime '{machine.runtime.image.compile()}'.")
+    # keep only hosts with enough room
+    fitting = [h for h in candidates if h.free_cpus >= cpus and h.free_memory >= memory]
+    if not fitting:
+        raise AAVMException(f"None of the CPK machines has {cpus:.2f} CPUs and {memory} bytes "
+                            f"of memory available for machine '{machine.name}'.")
+    # spread: the emptiest host, binpack: the fullest host that fits
+    if policy == "spread":
+        host = max(fitting, key=lambda h: h.free)
+    elif policy == "binpack":
+        host = min(fitting, key=lambda h: h.free)
+    else:
+        raise ValueError(f"Placement policy '{policy}' cannot be used to pick a host.")
+    aavmlogger.debug(f"Placement ({policy}): machine '{machine.name}' -> "
+                     f"'{host.machine.name}' ({host.free_cpus:.2f} CPUs and "
+                     f"{host.free_memory} bytes free).")
+    return host
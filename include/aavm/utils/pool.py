@@ -0,0 +1,123 @@
+import copy
+import fcntl
+import os
+import uuid
+from contextlib import contextmanager
+from typing import List, Optional, Iterator
+
+from docker import DockerClient
+from docker.errors import APIError, NotFound
+from docker.models.containers import Container
+
+from aavm.cli import aavmlogger
+from aavm.types import AAVMRuntime, AAVMMachine
+from aavm.utils.docker import merge_container_configs
+from aavm.utils.misc import aavm_label, run_detached, compile_cpuset
+from cpk.types import Machine
+
+# claimed containers are renamed after their machine, only these are still in the pool
+POOL_CONTAINER_PREFIX = "aavm-pool-"
+
+
+def pool_label(runtime: AAVMRuntime) -> str:
+    return aavm_label("pool.runtime", runtime.image.compile(allow_defaults=True))
+
+
+def pool_size(runtime: AAVMRuntime) -> int:
+    from aavm import aavmconfig
+    return aavmconfig.settings.pools.get(runtime.image.compile(allow_defaults=True), 0)
+
+
+def list_pool(client: DockerClient, runtime: AAVMRuntime) -> List[Container]:
+    # only containers that were never started (nor claimed) are available, claimed containers
+    # keep the pool label (labels are immutable) but not the pool name
+    containers = client.containers.list(
+        all=True,
+        filters={"label": pool_label(runtime), "status": "created",
+                 "name": POOL_CONTAINER_PREFIX}
+    )
+    # the name filter matches anywhere in the name
+    return [c for c in containers if c.name.startswith(POOL_CONTAINER_PREFIX)]
+
+
+@contextmanager
+def _locked_pool(machine: Machine, runtime: AAVMRuntime) -> Iterator[None]:
+    from aavm import aavmconfig
+    # one filler at a time per pool, concurrent refills would overfill it
+    path = os.path.join(aavmconfig.path, "pools", machine.name,
+                        f"{runtime.image.compile(allow_defaults=True)}.lock")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def fill_pool(machine: Machine, runtime: AAVMRuntime, size: int) -> int:
+    with _locked_pool(machine, runtime):
+        return _fill_pool(machine, runtime, size)
+
+
+def _fill_pool(machine: Machine, runtime: AAVMRuntime, size: int) -> int:
+    client = machine.get_client()
+    pool = list_pool(client, runtime)
+    # drain excess containers
+    for container in pool[size:]:
+        aavmlogger.debug(f"Removing pool container '{container.name}'...")
+        container.remove()
+    # create missing containers with the runtime's base configuration
+    created = 0
+    for _ in range(size - len(pool)):
+        container_cfg = merge_container_configs(copy.deepcopy(runtime.configuration))
+        container_cfg["image"] = runtime.image.compile()
+        container_cfg["name"] = f"{POOL_CONTAINER_PREFIX}{uuid.uuid4().hex[:12]}"
+        container_cfg["labels"] = {
+            aavm_label("pool.runtime"): runtime.image.compile(allow_defaults=True)
+        }
+        aavmlogger.debug(f"Creating pool container '{container_cfg['name']}'...")
+        client.containers.create(**container_cfg)
+        created += 1
+    # ---
+    return created
+
+
+def claim_pool_container(machine: AAVMMachine) -> Optional[Container]:
+    # pool containers only carry the runtime's configuration, resources can be updated later
+    # only if Docker supports changing them on an existing container
+    if machine.configuration or machine.links.image is not None or \
+            not machine.settings.resources.updatable:
+        return None
+    client = machine.machine.get_client()
+    for container in list_pool(client, machine.runtime):
+        # renaming by the old name is atomic on the daemon, if somebody else claimed this
+        # container first, its pool name does not exist anymore and we move on
+        try:
+            client.api.rename(container.name, machine.container_name)
+        except (NotFound, APIError) as e:
+            aavmlogger.debug(f"Pool container '{container.name}' could not be claimed, "
+                             f"the error reads:\n{str(e)}")
+            continue
+        aavmlogger.debug(f"Pool container '{container.name}' claimed by machine "
+                         f"'{machine.name}'.")
+        # NOTE: Docker labels are immutable, claimed containers keep the pool label
+        #       and are associated to the machine by name and ID, losing the pool name
+        #       takes them out of the pool (see list_pool)
+        container = client.containers.get(machine.container_name)
+        # apply the machine's resources and its cpuset allocation (as make_container does)
+        update = machine.settings.resources.update_config()
+        if machine.settings.cpuset is not None:
+            update["cpuset_cpus"] = compile_cpuset(machine.settings.cpuset.cpus)
+            update["cpuset_mems"] = compile_cpuset(machine.settings.cpuset.mems)
+        if update:
+            container.update(**update)
+        return container
+    # ---
+    return None
+
+
+def refill_pool_in_background(machine: Machine, runtime: AAVMRuntime):
+    runtime_name = runtime.image.compile(allow_defaults=True)
+    aavmlogger.debug(f"Refilling pool of runtime '{runtime_name}' in the background...")
+    run_detached(["runtime", "pool", runtime_name], machine=machine)
@@ -0,0 +1,176 @@
+import dataclasses
+import json
+import os
+import time
+from typing import Optional
+
+from docker.errors import ImageNotFound, APIError
+from requests import RequestException
+
+from aavm.cli import aavmlogger
+from aavm.types import AAVMRuntime
+from aavm.utils.bandwidth import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from aavm.utils.docker import pull_image, get_client
+from aavm.utils.misc import run_detached
+from aavm.utils.progress_bar import ProgressBar
+from cpk.types import Machine
+
+# a pull that did not report any progress for this long is considered dead
+PULL_STALE_AFTER = 120
+# records are rewritten at most this often while pulling (seconds)
+PULL_RECORD_INTERVAL = 1.0
+
+
+@dataclasses.dataclass
+class PullRecord:
+    endpoint: str
+    image: str
+    status: str = "queued"
+    progress: float = 0.0
+    pid: Optional[int] = None
+    background: bool = False
+    started: float = dataclasses.field(default_factory=time.time)
+    updated: float = dataclasses.field(default_factory=time.time)
+    error: Optional[str] = None
+
+    @property
+    def path(self) -> str:
+        return pull_record_path(self.endpoint, self.image)
+
+    @property
+    def in_flight(self) -> bool:
+        if self.status not in ["queued", "pulling"]:
+            return False
+        if time.time() - self.updated > PULL_STALE_AFTER:
+            return False
+        # the worker died without updating the record
+        if self.pid is not None:
+            try:
+                os.kill(self.pid, 0)
+            except ProcessLookupError:
+                return False
+            except PermissionError:
+                pass
+        return True
+
+    def serialize(self) -> dict:
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def deserialize(cls, data: dict) -> 'PullRecord':
+        return PullRecord(**data)
+
+    def to_disk(self):
+        self.updated = time.time()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # atomic, readers never see a half-written record
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wt") as fout:
+            json.dump(self.serialize(), fout, indent=4)
+        os.replace(tmp, self.path)
+
+    @classmethod
+    def from_disk(cls, endpoint: str, image: str) -> Optional['PullRecord']:
+        try:
+            with open(pull_record_path(endpoint, image), "rt") as fin:
+                return cls.deserialize(json.load(fin))
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return None
+
+
+def pull_record_path(endpoint: str, image: str) -> str:
+    from aavm import aavmconfig
+    return os.path.join(aavmconfig.path, "pulls", endpoint, f"{image}.json")
+
+
+def is_downloaded(machine: Machine, runtime: AAVMRuntime) -> bool:
+    try:
+        get_client(machine).images.get(runtime.image.compile(allow_defaults=True))
+        return True
+    except ImageNotFound:
+        return False
+
+
+def pull_with_record(machine: Machine, image: str, progress: bool = True,
+                     background: bool = False):
+    # pulls an image and keeps a record of it on disk for others to wait on
+    record = PullRecord(endpoint=machine.name, image=image, status="pulling",
+                        pid=os.getpid(), background=background)
+    record.to_disk()
+    last = [0.0]
+    wanted = f"{record.path}.wanted"
+
+    # background pulls get ahead in the queue as soon as someone is waiting for them
+    def _priority() -> int:
+        if not background or os.path.exists(wanted):
+            return PRIORITY_INTERACTIVE
+        return PRIORITY_BACKGROUND
+
+    def _progress(percentage: float):
+        record.progress = percentage
+        if time.time() - last[0] >= PULL_RECORD_INTERVAL:
+            last[0] = time.time()
+            record.to_disk()
+
+    try:
+        pull_image(machine, image, progress=progress, callback=_progress, priority=_priority)
+    except (APIError, RequestException) as e:
+        record.status, record.error = "failed", str(e)
+        record.to_disk()
+        raise
+    finally:
+        if os.path.exists(wanted):
+            os.remove(wanted)
+    record.status, record.progress = "done", 100.0
+    record.to_disk()
+
+
+def prefetch_in_background(machine: Machine, runtime: AAVMRuntime) -> bool:
+    image = runtime.image.compile(allow_defaults=True)
+    record = PullRecord.from_disk(machine.name, image)
+    if record is not None and record.in_flight:
+        return False
+    if is_downloaded(machine, runtime):
+        return False
+    aavmlogger.info(f"Downloading runtime '{image}' in the background...")
+    # queued before the worker exists, so that whoever comes next knows it is coming
+    record = PullRecord(endpoint=machine.name, image=image, background=True)
+    record.to_disk()
+    try:
+        # the variant was chosen by the caller, the worker must not switch to the native one
+        worker = run_detached(["runtime", "pull", "--background", "--emulate", image],
+                              machine=machine)
+    except OSError as e:
+        record.status, record.error = "failed", str(e)
+        record.to_disk()
+        raise
+    # the worker might have picked it up already, its own record wins
+    current = PullRecord.from_disk(machine.name, image)
+    if current is not None and current.status == "queued" and current.pid is None:
+        current.pid = worker.pid
+        current.to_disk()
+    return True
+
+
+def wait_for_pull(machine: Machine, runtime: AAVMRuntime, progress: bool = True,
+                  interval: float = 1.0) -> Optional[PullRecord]:
+    # waits for an in-flight pull of the runtime (if any), returns its last record, or None
+    # when there was nothing to wait for
+    image = runtime.image.compile(allow_defaults=True)
+    record = PullRecord.from_disk(machine.name, image)
+    if record is None or not record.in_flight:
+        return None
+    aavmlogger.info(f"Runtime '{image}' is being downloaded, waiting for it...")
+    if record.background:
+        # tell the background worker someone is waiting
+        with open(f"{record.path}.wanted", "w"):
+            pass
+    pbar = ProgressBar() if progress else None
+    while record is not None and record.in_flight:
+        if pbar is not None:
+            pbar.update(record.progress)
+        time.sleep(interval)
+        record = PullRecord.from_disk(machine.name, image)
+    if pbar is not None:
+        pbar.done()
+    return record
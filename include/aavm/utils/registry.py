@@ -0,0 +1,148 @@
+import dataclasses
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Dict
+
+import requests
+from docker import DockerClient
+from docker.errors import NotFound
+
+from aavm.exceptions import AAVMException
+from aavm.types import AAVMRuntime
+from aavm.utils.mirror import split_registry, mirror_image, DEFAULT_REGISTRY
+
+REGISTRY_TIMEOUT = 10
+DOCKER_HUB_ENDPOINT = "registry-1.docker.io"
+# manifests we accept, lists/indices first, a tag's digest is whatever the tag points to
+MANIFEST_MEDIA_TYPES = [
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+]
+
+# anonymous pull tokens, by (realm, service, scope)
+_tokens: Dict[Tuple[str, str, str], str] = {}
+_tokens_lock = threading.Lock()
+
+
+@dataclasses.dataclass
+class UpdateCheck:
+    image: str
+    # digests of the local image, the published one and where the latter comes from
+    local: List[str]
+    remote: Optional[str] = None
+    source: str = "registry"
+    error: Optional[str] = None
+
+    @property
+    def outdated(self) -> Optional[bool]:
+        if not self.local or self.remote is None:
+            return None
+        return self.remote not in self.local
+
+
+def parse_reference(image: str) -> Tuple[str, str, str]:
+    # 'org/repo:tag' -> ('registry-1.docker.io', 'org/repo', 'tag')
+    registry, path = split_registry(image)
+    if registry in [DEFAULT_REGISTRY, "index.docker.io"]:
+        registry = DOCKER_HUB_ENDPOINT
+        if "/" not in path:
+            path = f"library/{path}"
+    tag = "latest"
+    if ":" in path.rsplit("/", 1)[-1]:
+        path, tag = path.rsplit(":", 1)
+    return registry, path, tag
+
+
+def _scheme(registry: str) -> str:
+    from aavm import aavmconfig
+    # local registries and the mirror (e.g., 'aavm runtime serve') speak plain HTTP
+    hostname = registry.split(":")[0]
+    plain = hostname in ["localhost", "127.0.0.1"] or \
+        registry == aavmconfig.settings.registry_mirror
+    return "http" if plain else "https"
+
+
+def _token(challenge: str, scope: str) -> str:
+    # e.g., Bearer realm="https://auth.docker.io/token",service="registry.docker.io"
+    params = dict(re.findall(r'(\w+)="([^"]*)"', challenge))
+    if "realm" not in params:
+        raise AAVMException(f"Unsupported registry authentication challenge '{challenge}'.")
+    key = (params["realm"], params.get("service", ""), params.get("scope", scope))
+    with _tokens_lock:
+        if key in _tokens:
+            return _tokens[key]
+    res = requests.get(key[0], params={"service": key[1], "scope": key[2]},
+                       timeout=REGISTRY_TIMEOUT)
+    res.raise_for_status()
+    data = res.json()
+    token = data.get("token") or data.get("access_token")
+    if not token:
+        raise AAVMException(f"The registry at '{key[0]}' did not return a token.")
+    with _tokens_lock:
+        _tokens[key] = token
+    return token
+
+
+def remote_digest(image: str) -> str:
+    # a HEAD request on the manifest, nothing is downloaded
+    registry, path, tag = parse_reference(image)
+    url = f"{_scheme(registry)}://{registry}/v2/{path}/manifests/{tag}"
+    headers = {"Accept": ", ".join(MANIFEST_MEDIA_TYPES)}
+    res = requests.head(url, headers=headers, timeout=REGISTRY_TIMEOUT)
+    challenge = res.headers.get("WWW-Authenticate", "")
+    if res.status_code == 401 and challenge.lower().startswith("bearer"):
+        headers["Authorization"] = f"Bearer {_token(challenge, f'repository:{path}:pull')}"
+        res = requests.head(url, headers=headers, timeout=REGISTRY_TIMEOUT)
+    if res.status_code == 404:
+        raise AAVMException(f"Image '{image}' not found on the registry '{registry}'.")
+    res.raise_for_status()
+    digest = res.headers.get("Docker-Content-Digest", None)
+    if not digest:
+        raise AAVMException(f"The registry '{registry}' did not return a digest for '{image}'.")
+    return digest
+
+
+def published_digest(image: str) -> str:
+    from aavm import aavmconfig
+    settings = aavmconfig.settings
+    mirrored = mirror_image(image, settings.registry_mirror) \
+        if settings.registry_mirror else None
+    if mirrored is not None:
+        try:
+            return remote_digest(mirrored)
+        except (requests.RequestException, AAVMException):
+            if not settings.registry_fallback:
+                raise
+    return remote_digest(image)
+
+
+def local_digests(client: DockerClient, image: str) -> List[str]:
+    try:
+        info = client.api.inspect_image(image)
+    except NotFound:
+        return []
+    # the same content can be known under several repositories (e.g., the mirror's)
+    return sorted({d.split("@", 1)[1] for d in info.get("RepoDigests", None) or [] if "@" in d})
+
+
+def check_updates(client: DockerClient, runtimes: List[AAVMRuntime],
+                  workers: int = 8) -> Dict[str, UpdateCheck]:
+
+    def _check(runtime: AAVMRuntime) -> UpdateCheck:
+        image = runtime.image.compile()
+        check = UpdateCheck(image=image, local=local_digests(client, image))
+        try:
+            check.remote = published_digest(image)
+        except (requests.RequestException, AAVMException) as e:
+            check.error = str(e)
+            # the digest published in the index is better than nothing
+            if runtime.digest is not None:
+                check.remote, check.source = runtime.digest, "index"
+        return check
+
+    # all the HEAD requests are issued concurrently
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(runtimes)))) as pool:
+        return {c.image: c for c in pool.map(_check, runtimes)}
@@ -0,0 +1,71 @@
+import re
+from typing import Dict, Any
+
+from aavm.constants import RESOURCE_PROFILES
+from aavm.exceptions import AAVMException
+from aavm.types import MachineResources
+from aavm.utils.misc import parse_cpuset
+
+SIZE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+
+
+def parse_size(value: str) -> int:
+    match = re.match(r"^\s*([0-9]+(\.[0-9]+)?)\s*([kmgt]?)i?b?\s*$", str(value).lower())
+    if not match:
+        raise AAVMException(f"Invalid size '{value}', use a number optionally followed by one "
+                            f"of the units k, m, g, t (e.g., 512m, 4g).")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(3)])
+
+
+def get_profiles() -> Dict[str, Dict[str, Any]]:
+    from aavm import aavmconfig
+    return {**RESOURCE_PROFILES, **aavmconfig.settings.profiles}
+
+
+def get_profile(name: str) -> MachineResources:
+    profiles = get_profiles()
+    if name not in profiles:
+        raise AAVMException(f"Resource profile '{name}' not found. "
+                            f"Available profiles are: {', '.join(sorted(profiles))}.")
+    try:
+        return MachineResources.deserialize(profiles[name])
+    except TypeError as e:
+        raise AAVMException(f"Resource profile '{name}' is not valid. Error reads: {e}")
+
+
+def validate_resources(resources: MachineResources, info: Dict[str, Any]):
+    ncpus = info["NCPU"]
+    mem_total = info["MemTotal"]
+    # cpu
+    if resources.cpu_quota is not None:
+        period = resources.cpu_period or 100000
+        cpus = resources.cpu_quota / period
+        if cpus > ncpus:
+            raise AAVMException(f"Requested {cpus:.2f} CPUs but the host only has {ncpus}.")
+    for field in ["cpuset_cpus", "cpuset_mems"]:
+        value = getattr(resources, field)
+        if value is None:
+            continue
+        cores = parse_cpuset(value)
+        if field == "cpuset_cpus" and cores and cores[-1] >= ncpus:
+            raise AAVMException(f"CPU set '{value}' is out of range, the host has CPUs "
+                                f"0-{ncpus - 1}.")
+    # memory
+    if resources.mem_limit is not None and resources.mem_limit > mem_total:
+        raise AAVMException(f"Requested a memory limit of {resources.mem_limit} bytes but the "
+                            f"host only has {mem_total} bytes.")
+    if resources.memswap_limit not in [None, -1]:
+        if resources.mem_limit is None:
+            raise AAVMException("A swap limit can only be set together with a memory limit.")
+        if resources.memswap_limit < resources.mem_limit:
+            raise AAVMException("The swap limit (memory + swap) must be larger than or equal to "
+                                "the memory limit.")
+    # tmpfs and shm live in memory
+    in_memory = (resources.shm_size or 0) + sum(resources.tmpfs.values())
+    if in_memory > (resources.mem_limit or mem_total):
+        raise AAVMException("The sizes of shm and tmpfs mounts exceed the memory available "
+                            "to the machine.")
+    # ulimits
+    for name, (soft, hard) in resources.ulimits.items():
+        if soft > hard:
+            raise AAVMException(f"The soft limit of ulimit '{name}' exceeds its hard limit.")
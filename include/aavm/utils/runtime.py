@@ -14,8 +14,9 @@ from aavm.schemas import get_index_schema
 from cpk.types import Machine
 
 from aavm.cli import aavmlogger
-from aavm.constants import AAVM_RUNTIMES_INDEX_URL, AAVM_RUNTIMES_INDEX_VERSION
+from aavm.constants import AAVM_RUNTIMES_INDEX_VERSION
 from aavm.types import AAVMRuntime
+from aavm.utils.mirror import get_index_url
 
 
 def fetch_remote_runtimes(check_downloaded: bool = False, machine: Optional[Machine] = None) -> \
@@ -24,7 +25,7 @@ def fetch_remote_runtimes(check_downloaded: bool = False, machine: Optional[Mach
     if check_downloaded and not machine:
         raise ValueError("You need to provide a machine to check whether a runtime is downloaded")
     # get list of runtimes available
-    index_url = AAVM_RUNTIMES_INDEX_URL
+    index_url = get_index_url()
     aavmlogger.debug(f"GET: {index_url}")
     runtimes: List[Dict[str, Any]] = requests.get(index_url).json()
     # validate data against its declared schema
@@ -39,7 +40,10 @@ def fetch_remote_runtimes(check_downloaded: bool = False, machine: Optional[Mach
         for arch in runtime["image"]["arch"]:
             data = copy.deepcopy(runtime)
             data["image"]["arch"] = arch
+            digests = data["image"].pop("digests", {})
             r = AAVMRuntime.deserialize(data)
+            # digest published for this architecture (if any)
+            r.digest = digests.get(arch, None)
             # add configuration as well
             r.configuration = data["configuration"]
             # mark this runtime as official (it is coming from the index after all)
@@ -0,0 +1,120 @@
+import threading
+import time
+from typing import Dict, Any, Tuple, Optional
+
+from docker.errors import DockerException
+from requests import RequestException
+
+from aavm.cli import aavmlogger
+
+Stats = Dict[str, Any]
+
+
+def cpu_percent(stats: Stats) -> float:
+    cpu = stats.get("cpu_stats", {})
+    precpu = stats.get("precpu_stats", {})
+    # compute deltas between the current and the previous sample
+    cpu_delta = cpu.get("cpu_usage", {}).get("total_usage", 0) - \
+        precpu.get("cpu_usage", {}).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+    if cpu_delta <= 0 or system_delta <= 0:
+        return 0.0
+    # number of CPUs available to the container
+    ncpus = cpu.get("online_cpus", None) or \
+        len(cpu.get("cpu_usage", {}).get("percpu_usage", None) or [None])
+    # ---
+    return (cpu_delta / system_delta) * ncpus * 100.0
+
+
+def memory_usage(stats: Stats) -> Tuple[int, int]:
+    memory = stats.get("memory_stats", {})
+    usage = memory.get("usage", 0)
+    # page cache is not memory the machine is really using (same as `docker stats`)
+    details = memory.get("stats", {})
+    usage -= details.get("inactive_file", details.get("total_inactive_file", 0))
+    return max(0, usage), memory.get("limit", 0)
+
+
+def network_bytes(stats: Stats) -> Tuple[int, int]:
+    networks = (stats.get("networks", None) or {}).values()
+    return sum(n.get("rx_bytes", 0) for n in networks), \
+        sum(n.get("tx_bytes", 0) for n in networks)
+
+
+def block_bytes(stats: Stats) -> Tuple[int, int]:
+    blkio = stats.get("blkio_stats", None) or {}
+    entries = blkio.get("io_service_bytes_recursive", None) or []
+    read = sum(e.get("value", 0) for e in entries if e.get("op", "").lower() == "read")
+    write = sum(e.get("value", 0) for e in entries if e.get("op", "").lower() == "write")
+    return read, write
+
+
+class StatsStream(threading.Thread):
+
+    def __init__(self, name: str, runtime: str, container):
+        super(StatsStream, self).__init__(daemon=True)
+        self.machine = name
+        self.runtime = runtime
+        self._container = container
+        self._lock = threading.Lock()
+        self._sample: Optional[Stats] = None
+        self._previous: Optional[Tuple[float, int, int, int, int]] = None
+        self.alive = True
+
+    @property
+    def sample(self) -> Optional[Stats]:
+        with self._lock:
+            return self._sample
+
+    @property
+    def ready(self) -> bool:
+        # rates need (at least) two samples
+        sample = self.sample
+        return bool(sample is not None and sample["rates"]) or not self.alive
+
+    def run(self):
+        # one streaming connection per container, docker pushes a new sample every second
+        try:
+            for stats in self._container.client.api.stats(self._container.id, stream=True,
+                                                          decode=True):
+                self._update(stats)
+        except (DockerException, RequestException, ValueError) as e:
+            # the container went away (or the daemon did), the sample stays as it was
+            aavmlogger.debug(f"Stats stream of machine '{self.machine}' ended, "
+                             f"the error reads:\n{str(e)}")
+        finally:
+            self.alive = False
+
+    def _update(self, stats: Stats):
+        now = time.monotonic()
+        memory, limit = memory_usage(stats)
+        rx, tx = network_bytes(stats)
+        read, write = block_bytes(stats)
+        sample = {
+            "name": self.machine,
+            "runtime": self.runtime,
+            "cpu": cpu_percent(stats),
+            "memory": memory,
+            "memory_limit": limit,
+            "memory_percent": (memory / limit * 100.0) if limit else 0.0,
+            "pids": stats.get("pids_stats", {}).get("current", 0),
+            "net_rx": 0.0,
+            "net_tx": 0.0,
+            "block_read": 0.0,
+            "block_write": 0.0,
+            "rates": False
+        }
+        # compute rates incrementally from the previous sample
+        if self._previous is not None:
+            ptime, prx, ptx, pread, pwrite = self._previous
+            elapsed = max(now - ptime, 1e-3)
+            sample.update({
+                "net_rx": max(0, rx - prx) / elapsed,
+                "net_tx": max(0, tx - ptx) / elapsed,
+                "block_read": max(0, read - pread) / elapsed,
+                "block_write": max(0, write - pwrite) / elapsed,
+                "rates": True
+            })
+        self._previous = (now, rx, tx, read, write)
+        with self._lock:
+            self._sample = sample
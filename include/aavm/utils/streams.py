@@ -0,0 +1,201 @@
+import io
+import queue
+import threading
+from typing import Iterator, Callable, List, BinaryIO, Optional
+
+# size of the chunks moved around and number of chunks buffered per consumer
+STREAM_CHUNK_SIZE = 256 * 1024
+STREAM_QUEUE_SIZE = 16
+
+_END = object()
+
+
+class ChunkWriter(io.RawIOBase):
+    # file-like object that hands whatever is written to it over in fixed-size chunks
+
+    def __init__(self, emit: Callable[[bytes], None], chunk_size: int = STREAM_CHUNK_SIZE):
+        super(ChunkWriter, self).__init__()
+        self._emit = emit
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        if len(self._buffer) >= self._chunk_size:
+            self._emit(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def flush(self):
+        if self._buffer:
+            self._emit(bytes(self._buffer))
+            self._buffer.clear()
+
+    def close(self):
+        if not self.closed:
+            self.flush()
+        super(ChunkWriter, self).close()
+
+
+class IteratorReader(io.RawIOBase):
+    # file-like object reading from an iterator of chunks
+
+    def __init__(self, chunks: Iterator[bytes]):
+        super(IteratorReader, self).__init__()
+        self._chunks = iter(chunks)
+        self._chunk = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not len(self._chunk):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._chunk = memoryview(chunk)
+        n = min(len(buffer), len(self._chunk))
+        buffer[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        return n
+
+
+def produce(writer: Callable[[BinaryIO], None]) -> Iterator[bytes]:
+    # runs `writer` in a thread and yields what it writes, the bounded queue keeps the
+    # writer at most a few chunks ahead of the consumer
+    chunks: queue.Queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    errors = []
+    stopped = threading.Event()
+
+    def _emit(chunk):
+        # the consumer went away, stop writing
+        while not stopped.is_set():
+            try:
+                chunks.put(chunk, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise BrokenPipeError("The consumer of the stream went away.")
+
+    def _run():
+        # noinspection PyBroadException
+        try:
+            with ChunkWriter(_emit) as fout:
+                writer(fout)
+        except BaseException as e:
+            errors.append(e)
+        # noinspection PyBroadException
+        try:
+            _emit(_END)
+        except BaseException:
+            pass
+
+    threading.Thread(target=_run, daemon=True).start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is _END:
+                break
+            yield chunk
+    finally:
+        stopped.set()
+    if errors:
+        raise errors[0]
+
+
+class Tee:
+    # fans a single stream of chunks out to multiple consumers, each consumer has its own
+    # bounded queue so that memory is bounded and the slowest consumer sets the pace
+
+    def __init__(self, source: Iterator[bytes], consumers: int):
+        self._source = source
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+                                           for _ in range(consumers)]
+        self._dead = [False] * consumers
+        self.error: Optional[BaseException] = None
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        # noinspection PyBroadException
+        try:
+            for chunk in self._source:
+                if all(self._dead):
+                    break
+                for i in range(len(self._queues)):
+                    self._put(i, chunk)
+        except BaseException as e:
+            self.error = e
+        for i in range(len(self._queues)):
+            self._put(i, _END)
+
+    def _put(self, i: int, item):
+        # consumers that gave up do not block the others
+        while not self._dead[i]:
+            try:
+                self._queues[i].put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def close(self, i: int):
+        # consumers must be closed when done (or when they fail before reading)
+        self._dead[i] = True
+
+    def consumer(self, i: int) -> Iterator[bytes]:
+        try:
+            while True:
+                chunk = self._queues[i].get()
+                if chunk is _END:
+                    break
+                yield chunk
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.close(i)
+
+
+class Pipe:
+    # connects a writer (any thread) to an iterator of chunks through a bounded queue, once
+    # the reading side is abandoned whatever is written is dropped instead of blocking
+
+    def __init__(self, chunk_size: int = STREAM_CHUNK_SIZE):
+        self._queue: queue.Queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self._abandoned = threading.Event()
+        self.writer = ChunkWriter(self._put, chunk_size=chunk_size)
+
+    @property
+    def abandoned(self) -> bool:
+        return self._abandoned.is_set()
+
+    def _put(self, item):
+        while not self._abandoned.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def write(self, data):
+        if not self._abandoned.is_set():
+            self.writer.write(data)
+
+    def close(self):
+        # end of stream
+        self.writer.close()
+        self._put(_END)
+
+    def abandon(self):
+        self._abandoned.set()
+
+    def reader(self) -> Iterator[bytes]:
+        try:
+            while True:
+                chunk = self._queue.get()
+                if chunk is _END:
+                    break
+                yield chunk
+        finally:
+            self.abandon()
@@ -0,0 +1,197 @@
+import dataclasses
+import hashlib
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Set, Tuple, Optional, BinaryIO
+
+from docker import DockerClient
+from docker.errors import APIError, NotFound
+
+from aavm.exceptions import AAVMException
+from aavm.utils.bandwidth import shaped
+from aavm.utils.docker import get_client, tag_image, save_images
+from aavm.utils.streams import IteratorReader, Pipe, STREAM_CHUNK_SIZE
+from cpk.types import Machine
+
+# archives written by engines older than 25 name layers after their v1 ID, those layers are
+# spooled (one at a time) and hashed to find out their diff ID
+SPOOL_MAX_MEMORY = 64 * 1024 ** 2
+
+
+@dataclasses.dataclass
+class SyncResult:
+    machine: str
+    images: List[str] = dataclasses.field(default_factory=list)
+    # bytes of layers sent and bytes of layers the target already had
+    sent: int = 0
+    skipped: int = 0
+    duration: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclasses.dataclass
+class _Target:
+    machine: Machine
+    result: SyncResult
+    # diff IDs of the layers to send
+    needed: Set[str]
+    pipe: Optional[Pipe] = None
+
+
+def chain_ids(diff_ids: List[str]) -> List[str]:
+    # a layer can only be reused on top of the very same parents, docker tracks it by chain ID
+    chains = []
+    for diff_id in diff_ids:
+        if chains:
+            diff_id = "sha256:" + hashlib.sha256(f"{chains[-1]} {diff_id}".encode()).hexdigest()
+        chains.append(diff_id)
+    return chains
+
+
+def image_layers(client: DockerClient, images: List[str]) -> Dict[str, Tuple[str, List[str]]]:
+    # image -> (image ID, diff IDs)
+    layers = {}
+    for image in images:
+        info = client.api.inspect_image(image)
+        layers[image] = (info["Id"], info["RootFS"].get("Layers", []))
+    return layers
+
+
+def endpoint_layers(client: DockerClient, workers: int = 8) -> Tuple[Set[str], Set[str]]:
+    # IDs of the images and chain IDs of the layers present on an endpoint
+    api = client.api
+    ids = {image["Id"] for image in api.images()}
+
+    def _chains(image_id: str) -> List[str]:
+        try:
+            return chain_ids(api.inspect_image(image_id)["RootFS"].get("Layers", []))
+        except NotFound:
+            return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(ids)))) as pool:
+        chains = {c for image_chains in pool.map(_chains, ids) for c in image_chains}
+    return ids, chains
+
+
+def _load(target: _Target):
+    api = get_client(target.machine).api
+    try:
+        # every target is a transfer of its own
+        for status in api.load_image(shaped(target.pipe.reader())) or []:
+            if "error" in status:
+                raise AAVMException(status["error"])
+    except (APIError, AAVMException, OSError) as e:
+        target.result.error = target.result.error or str(e)
+    finally:
+        target.pipe.abandon()
+
+
+def _layer_diff_id(member: tarfile.TarInfo, diff_ids: Set[str]) -> Optional[str]:
+    # archives written by engines 25+ store layers as 'blobs/sha256/<diff ID>'
+    if member.isfile() and member.name.startswith("blobs/sha256/"):
+        diff_id = "sha256:" + member.name.rsplit("/", 1)[-1]
+        return diff_id if diff_id in diff_ids else None
+    return None
+
+
+def _spool(fin: BinaryIO) -> Tuple[str, BinaryIO]:
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fin.read(STREAM_CHUNK_SIZE), b""):
+        digest.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return f"sha256:{digest.hexdigest()}", spool
+
+
+def _forward(member: tarfile.TarInfo, fin: Optional[BinaryIO], pipes: List[Pipe]):
+    # writes the same member to many archives, reading it only once
+    header = member.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+    for pipe in pipes:
+        pipe.write(header)
+    if fin is None or member.size <= 0:
+        return
+    for chunk in iter(lambda: fin.read(STREAM_CHUNK_SIZE), b""):
+        for pipe in pipes:
+            pipe.write(chunk)
+    padding = -member.size % tarfile.BLOCKSIZE
+    for pipe in pipes:
+        pipe.write(tarfile.NUL * padding)
+
+
+def sync_images(source: Machine, targets: List[Machine], images: List[str],
+                workers: int = 8) -> List[SyncResult]:
+    stime = time.time()
+    source_client = get_client(source)
+    layers = image_layers(source_client, images)
+
+    # find out what each target is missing
+    def _plan(machine: Machine) -> _Target:
+        target = _Target(machine=machine, result=SyncResult(machine=machine.name), needed=set())
+        try:
+            client = get_client(machine)
+            ids, chains = endpoint_layers(client)
+            for image, (image_id, diff_ids) in layers.items():
+                # the image is there (maybe under another name)
+                if image_id in ids:
+                    tag_image(client, image_id, image)
+                    continue
+                target.result.images.append(image)
+                target.needed.update(d for d, c in zip(diff_ids, chain_ids(diff_ids))
+                                     if c not in chains)
+        except (APIError, OSError) as e:
+            target.result.error = str(e)
+        return target
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(targets)))) as pool:
+        plans = list(pool.map(_plan, targets))
+    active = [t for t in plans if t.result.error is None and t.result.images]
+    if active:
+        # a single save stream from the source, re-packed and loaded by all targets at once
+        wanted = sorted({image for t in active for image in t.result.images})
+        diff_ids = {d for image in wanted for d in layers[image][1]}
+        for target in active:
+            target.pipe = Pipe()
+        with ThreadPoolExecutor(max_workers=len(active)) as pool:
+            loads = [pool.submit(_load, target) for target in active]
+            try:
+                chunks = save_images(source_client, wanted)
+                with tarfile.open(fileobj=IteratorReader(chunks), mode="r|") as tin:
+                    for member in tin:
+                        fin = tin.extractfile(member) if member.isfile() else None
+                        diff_id = _layer_diff_id(member, diff_ids)
+                        spooled = diff_id is None and member.isfile() and \
+                            member.name.endswith("/layer.tar")
+                        if spooled:
+                            diff_id, fin = _spool(fin)
+                        recipients = []
+                        for target in active:
+                            if target.pipe.abandoned:
+                                continue
+                            if diff_id is not None and diff_id not in target.needed:
+                                target.result.skipped += member.size
+                                continue
+                            if diff_id is not None:
+                                target.result.sent += member.size
+                            recipients.append(target.pipe)
+                        _forward(member, fin, recipients)
+                        if spooled:
+                            fin.close()
+                for target in active:
+                    target.pipe.write(tarfile.NUL * tarfile.BLOCKSIZE * 2)
+            except (APIError, tarfile.TarError, OSError) as e:
+                for target in active:
+                    target.result.error = target.result.error or \
+                        f"Reading from '{source.name}' failed: {str(e)}"
+                    target.pipe.abandon()
+            finally:
+                for target in active:
+                    target.pipe.close()
+            for load in loads:
+                load.result()
+    for target in plans:
+        target.result.duration = time.time() - stime
+    # ---
+    return [t.result for t in plans]
@@ -1,9 +1,13 @@
-from typing import List
+import os
+import time
+from typing import List, Optional
 
 import yaml
 from termcolor import colored
 
 from aavm.types import AAVMMachine, AAVMRuntime, ContainerConfiguration
+from aavm.utils.misc import human_size, human_time
+from aavm.utils.usage import UsageLog, usage_log_path, summarize
 
 Table = List[List[str]]
 
@@ -19,6 +23,50 @@ def table_machine(machine: AAVMMachine) -> Table:
     ]
 
 
+def table_resources(machine: AAVMMachine) -> Table:
+    sizes = ["mem_limit", "memswap_limit", "shm_size"]
+    table = [["Profile", machine.settings.profile or "(custom)"]]
+    for k, v in machine.settings.resources.defined().items():
+        field = k.title().replace("_", " ")
+        if k in sizes and v >= 0:
+            value = human_size(v)
+        elif k == "tmpfs":
+            value = "\n".join(f"{p}: {human_size(s)}" for p, s in v.items())
+        elif k == "ulimits":
+            value = "\n".join(f"{n}: {soft}:{hard}" for n, (soft, hard) in v.items())
+        else:
+            value = str(v)
+        table.append([field, value])
+    # make sure the table is not empty
+    if len(table) <= 1 and machine.settings.profile is None:
+        table = [["        (unlimited)        "]]
+    # ---
+    return table
+
+
+def table_usage(machine: AAVMMachine, since: Optional[float] = None) -> Optional[Table]:
+    path = usage_log_path(machine)
+    if not os.path.isfile(path):
+        return None
+    with UsageLog(path, create=False) as log:
+        ts, cpu, memory = log.read(since=since)
+    if not ts:
+        return None
+    fmt = time.strftime
+    table = [["", "Avg", "P50", "P90", "P99", "Max", "Peak at"]]
+    for label, values, human in [("CPU %", cpu, lambda v: f"{v:.2f}"),
+                                 ("Memory", memory, human_size)]:
+        stats = summarize(values)
+        peak = ts[values.index(stats["max"])]
+        table.append([label] + [human(stats[k]) for k in ["avg", "p50", "p90", "p99", "max"]] +
+                     [fmt("%Y-%m-%d %H:%M:%S", time.localtime(peak))])
+    table.append(["Samples", str(len(ts)), "", "", "", "",
+                  f"{human_time(ts[-1] - ts[0], compact=True)} since "
+                  f"{fmt('%Y-%m-%d %H:%M', time.localtime(ts[0]))}"])
+    # ---
+    return table
+
+
 def table_runtime(runtime: AAVMRuntime) -> Table:
     return [
         ["Description", runtime.description],
@@ -0,0 +1,177 @@
+import math
+import mmap
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Tuple, Dict
+
+from docker.errors import APIError, NotFound
+
+from aavm.cli import aavmlogger
+from aavm.exceptions import AAVMException
+from aavm.types import AAVMMachine
+from aavm.utils.stats import cpu_percent, memory_usage
+
+# file layout:
+#   header: magic (8s), version (I), capacity (I), head (I), count (I), padding up to 32 bytes
+#   body:   ts[capacity] (f64), cpu[capacity] (f32), memory[capacity] (u64)
+# columns are contiguous so that each one can be read back with a single memoryview cast
+USAGE_MAGIC = b"AAVMUSG1"
+USAGE_VERSION = 1
+USAGE_HEADER = struct.Struct("<8sIIII")
+USAGE_HEADER_SIZE = 32
+USAGE_RECORD_SIZE = 8 + 4 + 8
+# ~14 days at 10 seconds resolution (~2.4MB per machine)
+USAGE_DEFAULT_CAPACITY = 14 * 24 * 360
+
+# (timestamp, cpu usage in percentage, memory usage in bytes)
+UsageSample = Tuple[float, float, int]
+
+
+class UsageLog:
+
+    def __init__(self, path: str, capacity: int = USAGE_DEFAULT_CAPACITY, create: bool = True):
+        self._path = path
+        if not os.path.exists(path):
+            if not create:
+                raise FileNotFoundError(path)
+            self._create(path, capacity)
+        self._fd = os.open(path, os.O_RDWR if create else os.O_RDONLY)
+        access = mmap.ACCESS_WRITE if create else mmap.ACCESS_READ
+        self._mm = mmap.mmap(self._fd, 0, access=access)
+        magic, version, self.capacity, _, _ = USAGE_HEADER.unpack_from(self._mm, 0)
+        if magic != USAGE_MAGIC or version != USAGE_VERSION:
+            self.close()
+            raise AAVMException(f"File '{path}' is not a valid usage log.")
+        # offsets of the columns
+        self._ts_offset = USAGE_HEADER_SIZE
+        self._cpu_offset = self._ts_offset + 8 * self.capacity
+        self._mem_offset = self._cpu_offset + 4 * self.capacity
+
+    @staticmethod
+    def _create(path: str, capacity: int):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as fout:
+            header = USAGE_HEADER.pack(USAGE_MAGIC, USAGE_VERSION, capacity, 0, 0)
+            fout.write(header.ljust(USAGE_HEADER_SIZE, b"\0"))
+            fout.truncate(USAGE_HEADER_SIZE + capacity * USAGE_RECORD_SIZE)
+        os.replace(tmp, path)
+
+    @property
+    def head(self) -> int:
+        return USAGE_HEADER.unpack_from(self._mm, 0)[3]
+
+    @property
+    def count(self) -> int:
+        return USAGE_HEADER.unpack_from(self._mm, 0)[4]
+
+    def append(self, ts: float, cpu: float, memory: int):
+        head, count = self.head, self.count
+        struct.pack_into("<d", self._mm, self._ts_offset + 8 * head, ts)
+        struct.pack_into("<f", self._mm, self._cpu_offset + 4 * head, cpu)
+        struct.pack_into("<Q", self._mm, self._mem_offset + 8 * head, memory)
+        # the header is updated last, readers never see a partially written record
+        struct.pack_into("<II", self._mm, 16, (head + 1) % self.capacity,
+                         min(count + 1, self.capacity))
+
+    def read(self, since: Optional[float] = None) -> Tuple[List[float], List[float], List[int]]:
+        head, count = self.head, self.count
+        view = memoryview(self._mm)
+        try:
+            ts = view[self._ts_offset:self._cpu_offset].cast("d").tolist()
+            cpu = view[self._cpu_offset:self._mem_offset].cast("f").tolist()
+            mem = view[self._mem_offset:self._mem_offset + 8 * self.capacity].cast("Q").tolist()
+        finally:
+            view.release()
+        # unroll the ring, oldest sample first
+        start = (head - count) % self.capacity
+        ts, cpu, mem = [(c[start:] + c[:start])[:count] for c in (ts, cpu, mem)]
+        # samples are in chronological order, drop the old ones
+        if since is not None:
+            first = _bisect(ts, since)
+            ts, cpu, mem = ts[first:], cpu[first:], mem[first:]
+        return ts, cpu, mem
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _bisect(values: List[float], value: float) -> int:
+    lo, hi = 0, len(values)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if values[mid] < value:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def usage_log_path(machine: AAVMMachine) -> str:
+    return os.path.join(machine.path, "usage.bin")
+
+
+def percentile(values: List[float], q: float) -> float:
+    # `values` must be sorted, nearest-rank method
+    if not values:
+        return 0.0
+    return values[max(0, min(len(values) - 1, int(math.ceil(q / 100.0 * len(values))) - 1))]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "avg": (sum(ordered) / len(ordered)) if ordered else 0.0,
+        "p50": percentile(ordered, 50),
+        "p90": percentile(ordered, 90),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+def sample_usage(machine: AAVMMachine) -> Optional[Tuple[float, int]]:
+    container = machine.container
+    if container is None or container.status != "running":
+        return None
+    try:
+        stats = container.stats(stream=False)
+    except (APIError, NotFound) as e:
+        aavmlogger.debug(f"Machine '{machine.name}' could not be sampled, "
+                         f"the error reads:\n{str(e)}")
+        return None
+    return cpu_percent(stats), memory_usage(stats)[0]
+
+
+class UsageSampler:
+
+    def __init__(self, workers: int = 8, capacity: int = USAGE_DEFAULT_CAPACITY):
+        self._workers = workers
+        self._capacity = capacity
+        # keep the logs open (mapped) across steps
+        self._logs: Dict[str, UsageLog] = {}
+
+    def step(self, machines: List[AAVMMachine], ts: float):
+        machines = [m for m in machines if m.links.container is not None and not m.hibernated]
+        if not machines:
+            return
+        with ThreadPoolExecutor(max_workers=self._workers) as pool:
+            samples = list(pool.map(sample_usage, machines))
+        for machine, sample in zip(machines, samples):
+            if sample is None:
+                continue
+            if machine.name not in self._logs:
+                self._logs[machine.name] = UsageLog(usage_log_path(machine), self._capacity)
+            self._logs[machine.name].append(ts, *sample)
+
+    def close(self):
+        for log in self._logs.values():
+            log.close()
+        self._logs.clear()
@@ -12,5 +12,6 @@ apt update
 apt install -y --no-install-recommends \
     docker-compose=${DOCKER_COMPOSE_VERSION}
 
-# clear apt lists
-rm -rf /var/lib/apt/list/*
+# clear apt cache and lists
+apt-get clean
+rm -rf /var/lib/apt/lists/*
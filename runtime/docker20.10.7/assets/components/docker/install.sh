@@ -21,5 +21,6 @@ apt install -y --no-install-recommends \
     dbus-user-session \
     docker.io=${DOCKER_VERSION}
 
-# clear apt lists
-rm -rf /var/lib/apt/list/*
+# clear apt cache and lists
+apt-get clean
+rm -rf /var/lib/apt/lists/*
@@ -13,8 +13,9 @@ apt update
 apt install -y --no-install-recommends \
     iproute2
 
-# clear apt lists
-rm -rf /var/lib/apt/list/*
+# clear apt cache and lists
+apt-get clean
+rm -rf /var/lib/apt/lists/*
 
 # find the URL for the rootlesskit library
 ROOTLESSKIT_URL=""
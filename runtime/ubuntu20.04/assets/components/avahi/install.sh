@@ -14,5 +14,6 @@ apt install -y --no-install-recommends \
     avahi-utils \
     avahi-daemon=${AVAHI_VERSION}
 
-# clear apt lists
-rm -rf /var/lib/apt/list/*
+# clear apt cache and lists
+apt-get clean
+rm -rf /var/lib/apt/lists/*
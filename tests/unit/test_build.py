@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'include'))
+
+from aavm.exceptions import AAVMException
+from aavm.utils import build
+from aavm.utils.build import RuntimeProject, dependency_graph, build_all
+
+
+def _project(name: str, base: str) -> RuntimeProject:
+    return RuntimeProject(name=name, path=f"/projects/{name}", image=f"aavm/{name}:latest",
+                          base=base)
+
+
+class TestDependencyGraph(unittest.TestCase):
+
+    def test_in_tree_bases(self):
+        graph = dependency_graph([
+            _project("base", "library/ubuntu:20.04"),
+            _project("ros", "aavm/base:latest"),
+            _project("desktop", "aavm/ros:latest"),
+        ])
+        self.assertEqual(graph, {"base": [], "ros": ["base"], "desktop": ["ros"]})
+
+    def test_cycle(self):
+        with self.assertRaises(AAVMException):
+            dependency_graph([
+                _project("a", "aavm/b:latest"),
+                _project("b", "aavm/a:latest"),
+            ])
+
+
+class TestBuildAll(unittest.TestCase):
+
+    def test_bases_first_and_pull_only_where_asked(self):
+        projects = [
+            _project("ros", "aavm/base:latest"),
+            _project("base", "library/ubuntu:20.04"),
+        ]
+        calls = []
+
+        def _build_node(project, arch, report, log_dir, extra):
+            calls.append((project.name, arch, extra))
+            report.status, report.duration = "done", 0.0
+
+        with tempfile.TemporaryDirectory() as log_dir, \
+                mock.patch.object(build, "build_node", _build_node):
+            reports = build_all(projects, ["amd64"], log_dir, workers=1, extra=["--push"],
+                                pull=["base"])
+        self.assertEqual(calls, [("base", "amd64", ["--push", "--pull"]),
+                                 ("ros", "amd64", ["--push"])])
+        self.assertTrue(all(r.status == "done" for r in reports))
+
+    def test_failed_base_skips_dependants(self):
+
+        def _build_node(project, arch, report, log_dir, extra):
+            report.status = "failed" if project.name == "base" else "done"
+
+        projects = [_project("base", "library/ubuntu:20.04"), _project("ros", "aavm/base:latest")]
+        with tempfile.TemporaryDirectory() as log_dir, \
+                mock.patch.object(build, "build_node", _build_node):
+            reports = {r.project: r for r in build_all(projects, ["amd64"], log_dir)}
+        self.assertEqual(reports["base"].status, "failed")
+        self.assertEqual(reports["ros"].status, "skipped")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'include'))
+
+from aavm.exceptions import AAVMException
+from aavm.types import CPUSetAllocation
+from aavm.utils.cpuset import HostTopology, allocate
+
+# 2 NUMA nodes, 4 physical cores each, 2 hardware threads per core (CPU n and n+8)
+_TOPOLOGY = "\n".join(
+    ["node 0 0-3,8-11", "node 1 4-7,12-15"] +
+    [f"cpu {c} {c % 8},{c % 8 + 8}" for c in range(16)]
+)
+
+
+def _cores(cpus):
+    return {frozenset({c % 8, c % 8 + 8}) for c in cpus}
+
+
+class TestAllocate(unittest.TestCase):
+
+    def setUp(self):
+        self.topology = HostTopology.parse(_TOPOLOGY, 16)
+
+    def test_exclusive_gets_whole_cores_on_one_node(self):
+        allocation = allocate(self.topology, {}, 4, "exclusive")
+        self.assertEqual(len(allocation.cpus), 4)
+        self.assertEqual(len(_cores(allocation.cpus)), 2)
+        self.assertEqual(len(allocation.mems), 1)
+
+    def test_exclusive_skips_cores_used_by_shared_machines(self):
+        shared = {"a": CPUSetAllocation(cpus=[0], mems=[0], policy="shared")}
+        allocation = allocate(self.topology, shared, 2, "exclusive")
+        self.assertNotIn(0, allocation.cpus)
+        self.assertNotIn(8, allocation.cpus)
+
+    def test_shared_keeps_off_exclusive_cores(self):
+        # the sibling (8) is not used by 'a' but it is not handed out either
+        exclusive = {"a": CPUSetAllocation(cpus=[0], mems=[0], policy="exclusive")}
+        allocation = allocate(self.topology, exclusive, 14, "shared")
+        self.assertFalse({0, 8}.intersection(allocation.cpus))
+
+    def test_spans_nodes_when_needed(self):
+        allocation = allocate(self.topology, {}, 10, "exclusive")
+        self.assertEqual(len(allocation.cpus), 10)
+        self.assertEqual(allocation.mems, [0, 1])
+
+    def test_too_many_cpus(self):
+        with self.assertRaises(AAVMException):
+            allocate(self.topology, {}, 17, "exclusive")
+        exclusive = {"a": CPUSetAllocation(cpus=list(range(8)), mems=[0, 1])}
+        with self.assertRaises(AAVMException):
+            allocate(self.topology, exclusive, 1, "exclusive")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'include'))
+
+from aavm.exceptions import AAVMException
+from aavm.utils import registry
+from aavm.utils.registry import UpdateCheck, parse_reference, remote_digest
+
+DIGEST = "sha256:" + "a" * 64
+TOKEN = "stub-token"
+
+
+class _StubRegistry(BaseHTTPRequestHandler):
+    # a registry that wants an anonymous bearer token for 'org/repo' and knows nothing else
+
+    token_requests = 0
+
+    def do_HEAD(self):
+        if self.path != "/v2/org/repo/manifests/1.0":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+            host, port = self.server.server_address
+            self.send_response(401)
+            self.send_header("WWW-Authenticate", f'Bearer realm="http://{host}:{port}/token",'
+                                                 f'service="stub"')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Docker-Content-Digest", DIGEST)
+        self.end_headers()
+
+    def do_GET(self):
+        if not self.path.startswith("/token"):
+            self.send_error(404)
+            return
+        _StubRegistry.token_requests += 1
+        body = json.dumps({"token": TOKEN}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+class TestParseReference(unittest.TestCase):
+
+    def test_official_image(self):
+        self.assertEqual(parse_reference("ubuntu"),
+                         ("registry-1.docker.io", "library/ubuntu", "latest"))
+
+    def test_docker_hub_image(self):
+        self.assertEqual(parse_reference("afdaniele/aavm:1.0"),
+                         ("registry-1.docker.io", "afdaniele/aavm", "1.0"))
+        self.assertEqual(parse_reference("docker.io/afdaniele/aavm:1.0"),
+                         ("registry-1.docker.io", "afdaniele/aavm", "1.0"))
+
+    def test_private_registry(self):
+        self.assertEqual(parse_reference("lab.local:5000/org/repo"),
+                         ("lab.local:5000", "org/repo", "latest"))
+        self.assertEqual(parse_reference("localhost/repo:tag"),
+                         ("localhost", "repo", "tag"))
+
+
+class TestUpdateCheck(unittest.TestCase):
+
+    def test_up_to_date(self):
+        self.assertFalse(UpdateCheck("img", local=[DIGEST, "sha256:b"], remote=DIGEST).outdated)
+
+    def test_outdated(self):
+        self.assertTrue(UpdateCheck("img", local=["sha256:b"], remote=DIGEST).outdated)
+
+    def test_unknown(self):
+        self.assertIsNone(UpdateCheck("img", local=[], remote=DIGEST).outdated)
+        self.assertIsNone(UpdateCheck("img", local=[DIGEST]).outdated)
+
+
+class TestRemoteDigest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), _StubRegistry)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.registry = f"127.0.0.1:{self.server.server_address[1]}"
+        _StubRegistry.token_requests = 0
+        registry._tokens.clear()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_token_handshake(self):
+        self.assertEqual(remote_digest(f"{self.registry}/org/repo:1.0"), DIGEST)
+        self.assertEqual(_StubRegistry.token_requests, 1)
+
+    def test_token_is_reused(self):
+        remote_digest(f"{self.registry}/org/repo:1.0")
+        remote_digest(f"{self.registry}/org/repo:1.0")
+        self.assertEqual(_StubRegistry.token_requests, 1)
+
+    def test_not_found(self):
+        with self.assertRaises(AAVMException):
+            remote_digest(f"{self.registry}/org/other:1.0")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import hashlib
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'include'))
+
+from aavm.utils.sync import chain_ids
+
+
+def _digest(data: str) -> str:
+    return "sha256:" + hashlib.sha256(data.encode()).hexdigest()
+
+
+class TestChainIDs(unittest.TestCase):
+
+    def test_empty(self):
+        self.assertEqual(chain_ids([]), [])
+
+    def test_bottom_layer(self):
+        # the chain ID of the bottom layer is its diff ID
+        self.assertEqual(chain_ids([_digest("a")]), [_digest("a")])
+
+    def test_chain(self):
+        a, b, c = _digest("a"), _digest("b"), _digest("c")
+        ab = _digest(f"{a} {b}")
+        self.assertEqual(chain_ids([a, b, c]), [a, ab, _digest(f"{ab} {c}")])
+
+    def test_depends_on_parents(self):
+        a, b, c = _digest("a"), _digest("b"), _digest("c")
+        self.assertNotEqual(chain_ids([a, c])[-1], chain_ids([b, c])[-1])
+        self.assertEqual(chain_ids([a, b, c])[:2], chain_ids([a, b]))
+
+
+if __name__ == '__main__':
+    unittest.main()
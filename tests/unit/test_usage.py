@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'include'))
+
+from aavm.exceptions import AAVMException
+from aavm.utils.usage import UsageLog, percentile
+
+
+class TestUsageLog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "machine", "usage.bin")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_and_read(self):
+        with UsageLog(self.path, capacity=8) as log:
+            for i in range(3):
+                log.append(100.0 + i, 10.0 * i, 1024 * i)
+            ts, cpu, mem = log.read()
+        self.assertEqual(ts, [100.0, 101.0, 102.0])
+        self.assertEqual(cpu, [0.0, 10.0, 20.0])
+        self.assertEqual(mem, [0, 1024, 2048])
+
+    def test_ring_keeps_the_newest_samples(self):
+        with UsageLog(self.path, capacity=4) as log:
+            for i in range(10):
+                log.append(float(i), 0.0, i)
+            ts, _, mem = log.read()
+        self.assertEqual(ts, [6.0, 7.0, 8.0, 9.0])
+        self.assertEqual(mem, [6, 7, 8, 9])
+
+    def test_read_since(self):
+        with UsageLog(self.path, capacity=4) as log:
+            for i in range(6):
+                log.append(float(i), 0.0, 0)
+            self.assertEqual(log.read(since=3.5)[0], [4.0, 5.0])
+
+    def test_persisted_and_read_only(self):
+        with UsageLog(self.path, capacity=4) as log:
+            log.append(1.0, 50.0, 10)
+        with UsageLog(self.path, create=False) as log:
+            self.assertEqual(log.capacity, 4)
+            self.assertEqual(log.read(), ([1.0], [50.0], [10]))
+
+    def test_missing_or_invalid(self):
+        with self.assertRaises(FileNotFoundError):
+            UsageLog(self.path, create=False)
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "wb") as fout:
+            fout.write(b"\0" * 64)
+        with self.assertRaises(AAVMException):
+            UsageLog(self.path)
+
+
+class TestPercentile(unittest.TestCase):
+
+    def test_nearest_rank(self):
+        values = [float(v) for v in range(1, 11)]
+        self.assertEqual(percentile(values, 50), 5.0)
+        self.assertEqual(percentile(values, 90), 9.0)
+        self.assertEqual(percentile(values, 100), 10.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()